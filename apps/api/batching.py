@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import deque
+import numpy as np
+
+class MicroBatcher:
+    """Coalesce concurrent predict calls into one batched call.
+
+    Requests arriving within `window_ms` of the first queued request (or until
+    `max_rows` rows are queued) share a single `fn(X, ctx)` call, run in the
+    default thread pool so the event loop stays free. Only requests with the
+    same `key` are coalesced; `ctx` (e.g. the model and quantile) is taken
+    from the first request of the batch.
+    """
+
+    def __init__(self, fn, window_ms: float = 3.0, max_rows: int = 4096, history: int = 1024):
+        self.fn = fn
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._pending = {}   # key -> list of (X, future, t_submit)
+        self._ctx = {}
+        self._rows = {}
+        self._timers = {}
+        self._tasks = set()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self._sizes = deque(maxlen=history)
+        self._waits = deque(maxlen=history)
+
+    async def submit(self, X: np.ndarray, key=None, ctx=None) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._ctx.setdefault(key, ctx)
+        self._pending.setdefault(key, []).append((X, fut, time.perf_counter()))
+        self._rows[key] = self._rows.get(key, 0) + len(X)
+        if self._rows[key] >= self.max_rows:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(key, [])
+        ctx = self._ctx.pop(key, None)
+        self._rows.pop(key, None)
+        if items:
+            task = asyncio.get_running_loop().create_task(self._run(ctx, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, ctx, items):
+        start = time.perf_counter()
+        sizes = [len(X) for X, _, _ in items]
+        self.batches += 1
+        self.requests += len(items)
+        self.rows += sum(sizes)
+        self._sizes.append(sum(sizes))
+        self._waits.extend(start - t for _, _, t in items)
+        try:
+            X = np.concatenate([X for X, _, _ in items]) if len(items) > 1 else items[0][0]
+            preds = await asyncio.get_running_loop().run_in_executor(None, self.fn, X, ctx)
+            parts = np.split(np.asarray(preds), np.cumsum(sizes)[:-1])
+        except Exception as e:
+            for _, fut, _ in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut, _), p in zip(items, parts):
+            if not fut.done():
+                fut.set_result(p)
+
+    def stats(self) -> dict:
+        sizes = np.asarray(self._sizes, dtype=float)
+        waits = np.asarray(self._waits, dtype=float) * 1000
+        pct = lambda a, q: float(np.percentile(a, q)) if len(a) else 0.0
+        return {
+            "window_ms": self.window * 1000, "max_rows": self.max_rows,
+            "batches": self.batches, "requests": self.requests, "rows": self.rows,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "batch_rows_p50": pct(sizes, 50), "batch_rows_p99": pct(sizes, 99),
+            "queue_wait_ms_p50": pct(waits, 50), "queue_wait_ms_p99": pct(waits, 99),
+        }
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+_M1, _M2 = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB)
+
+def _mix(z):
+    # splitmix64 finalizer, elementwise on uint64 (wraps)
+    z = (z ^ (z >> np.uint64(30))) * _M1
+    z = (z ^ (z >> np.uint64(27))) * _M2
+    return z ^ (z >> np.uint64(31))
+
+def _str_hashes(values) -> np.ndarray:
+    # one blake2b per distinct string
+    codes, uniq = pd.factorize(values if isinstance(values, pd.Series) else np.asarray(values, dtype=object))
+    h = np.array([int.from_bytes(hashlib.blake2b(str(u).encode(), digest_size=8).digest(), "little") for u in uniq],
+                 dtype=np.uint64)
+    return h[codes]
+
+def row_keys(X, key_cols=(), quantile=None) -> list:
+    """128-bit key per row, as an int64 pair, from the feature matrix `X`, string key columns and the quantile.
+
+    Vectorized over rows and columns: every value is mixed with a per-column
+    seed and the mixed columns are summed, in two independent lanes.
+    """
+    if not len(X):
+        return []
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    # one bit pattern for NaN and for +-0.0
+    X = np.where(np.isnan(X), np.nan, X) + 0.0
+    q = np.full((len(X), 1), np.nan if quantile is None else float(quantile))
+    cols = [X.view(np.uint64), q.view(np.uint64)] + [_str_hashes(k)[:, None] for k in key_cols]
+    M = np.hstack(cols)
+    col = np.arange(1, M.shape[1] + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        h1 = _mix((_mix(M ^ (col * _M1)) * (col * np.uint64(2) + np.uint64(1))).sum(axis=1, dtype=np.uint64))
+        h2 = _mix((_mix(M ^ (col * _M2)) * (col * np.uint64(6) + np.uint64(5))).sum(axis=1, dtype=np.uint64) ^ _M1)
+    return list(zip(h1.view(np.int64).tolist(), h2.view(np.int64).tolist()))
+
+def request_key(payload, quantile=None) -> str:
+    return hashlib.sha256(json.dumps([payload, quantile], sort_keys=True, default=str).encode()).hexdigest()
+
+class ForecastCache:
+    """Forecasts per row for the live model: bounded in-memory LRU, optional SQLite tier on disk.
+
+    Rows are keyed by a hash of everything the model sees for them (series keys,
+    feature values) and the quantile, so a row is only reused when its inputs
+    are identical. `/forecast` payloads are also memoized whole (`max_requests`),
+    which skips feature building too. Entries belong to the model object passed
+    to `set_model`: calls made with any other model bypass the cache, so a
+    request still running on a swapped-out model neither reads nor writes it.
+    `set_model` empties the memory tiers. The disk tier is keyed by
+    `model_key` (the artifact digest), so a restart on the same artifact starts
+    warm, and rows of other artifacts are deleted on swap.
+    """
+
+    def __init__(self, max_rows: int = 100_000, max_requests: int = 256, disk_path: str | None = None):
+        self.rows = LRUCache(max_rows) if max_rows > 0 else None
+        self.requests = LRUCache(max_requests) if max_requests > 0 else None
+        self._lock = threading.Lock()
+        self._model, self.model_key = None, None
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS forecasts (model TEXT, k1 INTEGER, k2 INTEGER, value REAL,"
+                             " PRIMARY KEY (model, k1, k2)) WITHOUT ROWID")
+        self.counts = dict.fromkeys(("hits", "disk_hits", "misses", "request_hits", "request_misses",
+                                     "invalidations"), 0)
+
+    @property
+    def enabled(self):
+        return self.rows is not None or self._db is not None
+
+    def set_model(self, model, model_key: str):
+        with self._lock:
+            self._model, self.model_key = model, model_key
+            for tier in (self.rows, self.requests):
+                if tier is not None:
+                    tier.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM forecasts WHERE model != ?", (model_key,))
+            self.counts["invalidations"] += 1
+
+    # -- whole /forecast responses ----------------------------------------------
+    def get_request(self, model, key):
+        with self._lock:
+            if self.requests is None or model is not self._model:
+                return None
+            hit = self.requests.get(key)
+            self.counts["request_hits" if hit is not None else "request_misses"] += 1
+            return hit
+
+    def put_request(self, model, key, response):
+        with self._lock:
+            if self.requests is not None and model is self._model:
+                self.requests[key] = response
+
+    # -- rows ----------------------------------------------------------------------
+    def get_rows(self, model, keys: list):
+        """(values, found): cached forecasts of `keys`, memory tier first, then disk."""
+        n = len(keys)
+        out = np.full(n, np.nan)
+        found = np.zeros(n, dtype=bool)
+        if not self.enabled or model is not self._model:
+            return out, found
+        with self._lock:
+            if self.rows is not None:
+                get = self.rows.get
+                for i, k in enumerate(keys):
+                    v = get(k)
+                    if v is not None:
+                        out[i] = v
+                        found[i] = True
+            hits = int(found.sum())
+            if self._db is not None and hits < n:
+                for i, v in self._disk_get([(i, keys[i]) for i in np.flatnonzero(~found)]):
+                    out[i] = v
+                    found[i] = True
+                    if self.rows is not None:
+                        self.rows[keys[i]] = v
+            self.counts["hits"] += hits
+            self.counts["disk_hits"] += int(found.sum()) - hits
+            self.counts["misses"] += n - int(found.sum())
+        return out, found
+
+    def _disk_get(self, pending, chunk=500):
+        # caller holds the lock
+        for s in range(0, len(pending), chunk):
+            part = pending[s:s + chunk]
+            want = {k: i for i, k in part}
+            q = f"SELECT k1, k2, value FROM forecasts WHERE model = ? AND k1 IN ({','.join('?' * len(part))})"
+            for k1, k2, v in self._db.execute(q, [self.model_key] + [k[0] for _, k in part]):
+                i = want.get((k1, k2))
+                # SQLite stores NaN as NULL; those rows are recomputed
+                if i is not None and v is not None:
+                    yield i, v
+
+    def put_rows(self, model, keys: list, values):
+        values = np.asarray(values, dtype=np.float64).tolist()
+        with self._lock:
+            if model is not self._model:
+                return
+            if self.rows is not None:
+                for k, v in zip(keys, values):
+                    self.rows[k] = v
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?)",
+                                     [(self.model_key, k[0], k[1], v) for k, v in zip(keys, values)])
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counts)
+            c["rows"] = len(self.rows) if self.rows is not None else 0
+            c["requests"] = len(self.requests) if self.requests is not None else 0
+            c["model_key"] = self.model_key
+        looked_up = c["hits"] + c["disk_hits"] + c["misses"]
+        c["hit_rate"] = (c["hits"] + c["disk_hits"]) / looked_up if looked_up else 0.0
+        return c
@@ -0,0 +1,225 @@
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from quantumflow_core.progress import PROGRESS_ENV, read_progress
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+ACTIVE = ("queued", "running", "cancelling")
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    cmd: List[str]
+    work_dir: str
+    state: str = "queued"
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    returncode: Optional[int] = None
+    error: Optional[str] = None
+    swapped: bool = False   # on_success ran (training jobs: the new model is live)
+    cancel_requested: bool = False
+    cancel_at: Optional[float] = None
+    env: dict = field(default_factory=dict)
+
+    @property
+    def log_path(self):
+        return os.path.join(self.work_dir, "job.log")
+
+    @property
+    def progress_path(self):
+        return os.path.join(self.work_dir, "progress.json")
+
+    def progress(self) -> dict:
+        # written by the job process (progress.write_progress); missing until its first report
+        p = read_progress(self.progress_path)
+        return p if p is not None else {"stage": self.state, "fraction": 1.0 if self.state == "succeeded" else 0.0}
+
+    def log_tail(self, lines: int = 20) -> List[str]:
+        try:
+            with open(self.log_path, "r", encoding="utf-8", errors="replace") as f:
+                return [l.rstrip("\n") for l in deque(f, maxlen=lines)]
+        except OSError:
+            return []
+
+    def to_dict(self, log_lines: int = 0) -> dict:
+        d = {k: getattr(self, k) for k in ("id", "key", "state", "submitted", "started", "finished",
+                                            "returncode", "error", "swapped")}
+        d["progress"] = self.progress()
+        if log_lines:
+            d["log_tail"] = self.log_tail(log_lines)
+        return d
+
+class JobQueue:
+    """Background subprocess jobs: FIFO queue, `workers` run at once, single flight per key.
+
+    `submit(key, cmd)` returns the queued or running job for `key` if there is
+    one, so concurrent submits for the same config share a single run. Jobs run
+    in their own process group (their worker pools die with them on cancel) and
+    get QF_PROGRESS_FILE for `progress.write_progress`. `on_success(job)` runs in the
+    worker thread after a job exits 0, e.g. to hot-swap the new model. `cancel`
+    only sends SIGTERM; the job's worker thread sends SIGKILL after
+    `kill_grace_s` and records the final state.
+    """
+
+    def __init__(self, root: str, workers: int = 1, on_success: Callable[[Job], None] | None = None,
+                 history: int = 100, kill_grace_s: float = 10.0, poll_s: float = 0.5):
+        self.root = root
+        self.workers = max(1, int(workers))
+        self.on_success = on_success
+        self.history = history
+        self.kill_grace_s = kill_grace_s
+        self.poll_s = poll_s
+        self._jobs = OrderedDict()
+        self._active = {}   # key -> job id (queued or running)
+        self._procs = {}
+        self._queue = deque()
+        self._cv = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        with self._cv:
+            self._stopping = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, name=f"qf-job-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def shutdown(self, cancel_running: bool = True):
+        with self._cv:
+            self._stopping = True
+            ids = [j.id for j in self._jobs.values() if j.state not in TERMINAL]
+            self._cv.notify_all()
+        if cancel_running:
+            for job_id in ids:
+                self.cancel(job_id)
+            # the worker threads escalate to SIGKILL and record the cancelled state
+            for t in self._threads:
+                t.join(self.kill_grace_s + 2 * self.poll_s)
+
+    def submit(self, key: str, cmd: List[str], env: dict | None = None):
+        """(job, created): the new job, or the queued/running one for `key`."""
+        with self._cv:
+            active = self._active.get(key)
+            if active is not None:
+                return self._jobs[active], False
+            job_id = uuid.uuid4().hex[:12]
+            job = Job(id=job_id, key=key, cmd=list(cmd), work_dir=os.path.join(self.root, job_id), env=dict(env or {}))
+            os.makedirs(job.work_dir, exist_ok=True)
+            self._jobs[job_id] = job
+            self._active[key] = job_id
+            self._queue.append(job_id)
+            self._trim()
+            self._cv.notify()
+            return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job, or SIGTERM a running one and return it as "cancelling".
+
+        Never blocks: the job's worker thread sends SIGKILL if the process is
+        still alive after `kill_grace_s` and then marks the job cancelled.
+        """
+        with self._cv:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in TERMINAL or job.cancel_requested:
+                return job
+            job.cancel_requested, job.cancel_at = True, time.time()
+            if job.state == "queued":
+                self._finish(job, "cancelled")
+                return job
+            job.state = "cancelling"
+            proc = self._procs.get(job_id)
+        if proc is not None and proc.poll() is None:
+            self._signal(proc, signal.SIGTERM)
+        return job
+
+    def _wait(self, job, proc):
+        # poll so a cancel that outlives the grace period is escalated here, not in the request
+        killed = False
+        while True:
+            try:
+                return proc.wait(self.poll_s)
+            except subprocess.TimeoutExpired:
+                if job.cancel_requested and not killed and time.time() - job.cancel_at >= self.kill_grace_s:
+                    self._signal(proc, signal.SIGKILL)
+                    killed = True
+
+    @staticmethod
+    def _signal(proc, sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _finish(self, job, state, returncode=None, error=None):
+        # caller holds the lock
+        job.state, job.returncode, job.error, job.finished = state, returncode, error, time.time()
+        if self._active.get(job.key) == job.id:
+            del self._active[job.key]
+        self._procs.pop(job.id, None)
+
+    def _trim(self):
+        # keep the last `history` finished jobs
+        done = [k for k, j in self._jobs.items() if j.state in TERMINAL]
+        for k in done[:max(0, len(self._jobs) - self.history)]:
+            shutil.rmtree(self._jobs.pop(k).work_dir, ignore_errors=True)
+
+    def _next(self):
+        with self._cv:
+            while not self._stopping:
+                while self._queue:
+                    job = self._jobs.get(self._queue.popleft())
+                    if job is not None and job.state == "queued":
+                        return job
+                self._cv.wait()
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            try:
+                with open(job.log_path, "ab") as log, self._cv:
+                    if job.cancel_requested:
+                        continue
+                    env = {**os.environ, **job.env, PROGRESS_ENV: job.progress_path}
+                    proc = subprocess.Popen(job.cmd, stdout=log, stderr=subprocess.STDOUT, env=env,
+                                            start_new_session=True)
+                    self._procs[job.id] = proc
+                    job.state, job.started = "running", time.time()
+                rc = self._wait(job, proc)
+            except Exception as e:
+                with self._cv:
+                    self._finish(job, "failed", error=f"could not start job: {e}")
+                continue
+            if rc == 0 and not job.cancel_requested and self.on_success is not None:
+                try:
+                    self.on_success(job)
+                    job.swapped = True
+                except Exception as e:
+                    job.error = f"job succeeded but on_success failed: {e}"
+            with self._cv:
+                if job.cancel_requested:
+                    self._finish(job, "cancelled", rc)
+                elif rc == 0:
+                    self._finish(job, "succeeded", rc, job.error)
+                else:
+                    self._finish(job, "failed", rc, f"exit code {rc}")
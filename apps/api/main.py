@@ -1,22 +1,137 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
+import numpy as np
 import pandas as pd
-import joblib, os, subprocess
+import os, sys, json, hashlib, threading
 
-from quantumflow_core import prepare_features
-from quantumflow_core.models import TrainedModel, predict
-from quantumflow_core.inventory import IndentPolicy, recommend_order
+from quantumflow_core import prepare_features, load_config, read_csv
+from quantumflow_core.models import TrainedModel, ShardedModel, predict, predict_array
+from quantumflow_core.inventory import IndentPolicy, recommend_order, load_planning_table, plan_orders_frame
+from quantumflow_core.bom import load_bom, explode_demand
+from quantumflow_core.feature_store import FeatureStore
+from quantumflow_core.artifacts import load_model as load_artifact, artifact_digest, copy_model
+from quantumflow_core.inference import with_backend
+from quantumflow_core.serving import SeriesStateTable, to_days, feature_matrix
+from quantumflow_core.validation import SALES_VALIDATOR
+from quantumflow_core.instrumentation import render_prometheus
+from starlette.concurrency import run_in_threadpool
+from .batching import MicroBatcher
+from .cache import ForecastCache, row_keys, request_key
+from .jobs import JobQueue, TERMINAL, ACTIVE
+from .metrics import LatencyMiddleware, REQUEST_LATENCY
 
-app = FastAPI(title="Quantumflow API", version="1.1.0")
-
-MODEL_PATH = os.environ.get("QF_MODEL_PATH", "artifacts/model.joblib")
+# native artifact directory (save_model) or a joblib pickle
+MODEL_PATH = os.environ.get("QF_MODEL_PATH", "artifacts/model")
 _model: Optional[TrainedModel] = None
+_state: Optional[SeriesStateTable] = None
+# coalesce concurrent /forecast/fast calls; QF_BATCH_WINDOW_MS=0 disables batching
+BATCH_WINDOW_MS = float(os.environ.get("QF_BATCH_WINDOW_MS", "3"))
+BATCH_MAX_ROWS = int(os.environ.get("QF_BATCH_MAX_ROWS", "4096"))
+# batches are keyed by (model, quantile) so a model swap never mixes feature layouts
+_batcher = MicroBatcher(lambda X, ctx: predict_array(ctx[0], X, quantile=ctx[1]), window_ms=BATCH_WINDOW_MS, max_rows=BATCH_MAX_ROWS)
+# list element types of the columnar payload are checked by pydantic; this reports bad dates
+_FAST_VALIDATOR = SALES_VALIDATOR.subset(["Date"])
+# background training: one run per config at a time, QF_TRAIN_WORKERS configs in parallel
+JOBS_DIR = os.environ.get("QF_JOBS_DIR", "artifacts/jobs")
+# a joblib MODEL_PATH is legacy; trained models are published as a native artifact directory
+LIVE_MODEL_DIR = MODEL_PATH if not MODEL_PATH.endswith(".joblib") else "artifacts/model"
+_swap_lock = threading.Lock()
+# forecast cache: rows (0 disables) and whole /forecast payloads in memory, optional SQLite file shared by workers
+_cache = ForecastCache(max_rows=int(os.environ.get("QF_FORECAST_CACHE_ROWS", "100000")),
+                       max_requests=int(os.environ.get("QF_FORECAST_CACHE_REQUESTS", "256")),
+                       disk_path=os.environ.get("QF_FORECAST_CACHE_DB") or None)
+
+def _load_state() -> Optional[SeriesStateTable]:
+    # per-series target tail for /forecast/fast: feature store state, else raw sales history
+    try:
+        cfg = load_config()
+    except Exception:
+        return None
+    store_dir = cfg.get("feature_store_dir")
+    if store_dir and os.path.exists(os.path.join(store_dir, "manifest.json")):
+        return FeatureStore(store_dir).serving_state()
+    sales_path = os.path.join(cfg.get("data_dir", "data"), "sales.csv")
+    if os.path.exists(sales_path):
+        return SeriesStateTable.from_tail(read_csv(sales_path))
+    return None
+
+def _load_model(path: str = MODEL_PATH):
+    # artifact + optional flat tree backend (config inference_backend)
+    try:
+        cfg = load_config()
+    except Exception:
+        cfg = {}
+    return with_backend(load_artifact(path), cfg)
+
+def _model_key(path: str = MODEL_PATH) -> str:
+    # artifact bytes + inference backend (flat and native predictions may differ in the last bits)
+    try:
+        backend = load_config().get("inference_backend", "native")
+    except Exception:
+        backend = "native"
+    return f"{artifact_digest(path)}:{backend}"
+
+def _swap_in(path: str = MODEL_PATH, publish_from: Optional[str] = None):
+    """Load model + serving state off the request path, then publish them.
+
+    Requests take their own reference to `_model` / `_state` when they start,
+    so in-flight calls finish on the old objects while new calls see the new ones.
+    `publish_from` is first copied to `path` under the same lock, so the live
+    model and the artifact on disk always come from the same run.
+    """
+    global _model, _state
+    with _swap_lock:
+        if publish_from is not None:
+            copy_model(publish_from, path)
+        model, state, key = _load_model(path), _load_state(), _model_key(path)
+        _model, _state = model, state
+        # cached forecasts of the previous model are dropped
+        _cache.set_model(model, key)
+    return model
+
+def _train_dir(cfg_key: str) -> str:
+    # one output directory per config: runs of different configs never write the same files
+    slug = hashlib.blake2b(cfg_key.encode(), digest_size=6).hexdigest()
+    return os.path.join(JOBS_DIR, "models", f"{os.path.splitext(os.path.basename(cfg_key))[0]}-{slug}", "model")
+
+def _on_trained(job):
+    _swap_in(LIVE_MODEL_DIR, publish_from=job.env["QF_TRAINED_MODEL"])
+
+_jobs = JobQueue(JOBS_DIR, workers=int(os.environ.get("QF_TRAIN_WORKERS", "1")), on_success=_on_trained)
+
+@asynccontextmanager
+async def lifespan(app):
+    # load model and serving state once so requests never pay for it
+    global _model, _state
+    if _model is None and os.path.exists(MODEL_PATH):
+        _model = _load_model()
+        _cache.set_model(_model, _model_key())
+    _state = _load_state()
+    _jobs.start()
+    yield
+    _jobs.shutdown()
+
+app = FastAPI(title="Quantumflow API", version="1.1.0", lifespan=lifespan)
+app.add_middleware(LatencyMiddleware)
+
+class TrainRequest(BaseModel):
+    # config YAML for pipelines/train.py; default QF_CONFIG or configs/dev.yaml
+    config: Optional[str] = None
 
 class ForecastRequest(BaseModel):
     rows: List[Dict]
     quantile: Optional[float] = None
 
+class ColumnarForecastRequest(BaseModel):
+    SKU_ID: List[str]
+    Sales_Channel: List[str]
+    Date: List[str]
+    Promo_Flag: Optional[List[int]] = None
+    quantile: Optional[float] = None
+
 class IndentRequest(BaseModel):
     daily_mean_demand: float = Field(ge=0)
     daily_std_demand: float = Field(ge=0)
@@ -29,40 +144,222 @@ class IndentRequest(BaseModel):
 
 @app.get("/health")
 def health():
-    return {"status":"ok", "model_loaded": _model is not None}
+    return {"status":"ok", "model_loaded": _model is not None, "series_loaded": len(_state) if _state is not None else 0}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: per-route latency histograms, stage timers and process gauges (this worker only)."""
+    b = _batcher.stats()
+    extra = {"qf_model_loaded": _model is not None, "qf_series_loaded": len(_state) if _state is not None else 0,
+             "qf_batcher_batches": b["batches"], "qf_batcher_requests": b["requests"],
+             "qf_train_jobs_active": sum(j.state in ACTIVE for j in _jobs.list())}
+    c = _cache.stats()
+    extra.update({f"qf_forecast_cache_{k}": c[k] for k in ("hits", "disk_hits", "misses", "request_hits",
+                                                           "request_misses", "invalidations", "rows")})
+    return Response(render_prometheus([REQUEST_LATENCY], extra=extra), media_type="text/plain; version=0.0.4")
 
 @app.post("/load")
 def load_model():
-    global _model
     if not os.path.exists(MODEL_PATH):
         raise HTTPException(404, f"Model not found at {MODEL_PATH}")
-    _model = joblib.load(MODEL_PATH)
-    return {"loaded": True, "model": getattr(_model, "name", "unknown")}
+    model = _swap_in()
+    return {"loaded": True, "model": getattr(model, "name", "unknown")}
 
-@app.post("/train")
-def train_model():
-    try:
-        subprocess.run(["python","pipelines/train.py"], check=True)
-        return {"trained": True}
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(500, f"Training failed: {e}")
+@app.post("/train", status_code=202)
+def train_model(response: Response, req: Optional[TrainRequest] = None):
+    """Queue a training run; returns the job (200 with the existing job if this config is already queued/running).
+
+    Each config trains into its own directory; on success the artifact is
+    copied to the live model directory and swapped in. Poll /train/jobs/{id}.
+    """
+    cfg = (req.config if req else None) or os.environ.get("QF_CONFIG", "configs/dev.yaml")
+    if not os.path.exists(cfg):
+        raise HTTPException(404, f"Config not found at {cfg}")
+    key = os.path.abspath(cfg)
+    model_dir = _train_dir(key)
+    job, created = _jobs.submit(key, [sys.executable, "-m", "pipelines.train", "--cfg", cfg,
+                                      "--model-dir", model_dir], env={"QF_TRAINED_MODEL": model_dir})
+    if not created:
+        response.status_code = 200
+    return dict(job.to_dict(), deduplicated=not created)
+
+@app.get("/train/jobs")
+def train_jobs():
+    return {"jobs": [j.to_dict() for j in _jobs.list()]}
+
+@app.get("/train/jobs/{job_id}")
+def train_job(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"No job {job_id}")
+    return job.to_dict(log_lines=20)
+
+@app.post("/train/jobs/{job_id}/cancel")
+def cancel_train_job(job_id: str, response: Response):
+    """Cancel a job: 200 once a queued job is cancelled, 202 while a running one is stopping."""
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"No job {job_id}")
+    if job.state in TERMINAL:
+        raise HTTPException(409, f"Job {job_id} already {job.state}")
+    job = _jobs.cancel(job_id)
+    if job.state == "cancelling":
+        response.status_code = 202
+    return job.to_dict()
 
 @app.post("/forecast")
 def forecast(req: ForecastRequest):
-    global _model
-    if _model is None:
+    model = _model
+    if model is None:
         if not os.path.exists(MODEL_PATH):
             raise HTTPException(503, "Model not loaded. POST /load first or train a model.")
-        _model = joblib.load(MODEL_PATH)
+        model = _swap_in()
+    # a repeated payload is answered from the cache without building features
+    rkey = request_key(req.rows, req.quantile)
+    hit = _cache.get_request(model, rkey)
+    if hit is not None:
+        return hit
     df = pd.DataFrame(req.rows)
+    report = SALES_VALIDATOR.validate(df)
+    if not report.ok:
+        raise HTTPException(422, report.to_dict())
     feats = prepare_features(df)
-    preds = predict(_model, feats, quantile=req.quantile)
+    n = len(feats)
+    # cache keys: everything the model sees for a row (sharded models also route on the series keys)
+    keys = row_keys(feats[model.features].to_numpy(dtype=np.float64), [feats["SKU_ID"], feats["Sales_Channel"]],
+                    req.quantile) if _cache.enabled else None
+    preds, found = _cache.get_rows(model, keys) if keys is not None else (np.empty(n), np.zeros(n, dtype=bool))
+    miss = np.flatnonzero(~found)
+    if len(miss):
+        preds[miss] = predict(model, feats.iloc[miss] if len(miss) < n else feats, quantile=req.quantile)
+        if keys is not None:
+            _cache.put_rows(model, [keys[i] for i in miss], preds[miss])
     out = feats[["Date","SKU_ID","Sales_Channel"]].copy()
     out["forecast"] = preds
-    return {"rows": out.to_dict(orient="records")}
+    resp = {"rows": out.to_dict(orient="records")}
+    _cache.put_request(model, rkey, resp)
+    return resp
+
+@app.post("/forecast/fast")
+async def forecast_fast(req: ColumnarForecastRequest):
+    """Columnar forecast rows; lags/rolls come from the in-memory series state, not the payload."""
+    # one reference each for the whole request; a hot swap only affects later requests
+    model, state = _model, _state
+    if model is None:
+        raise HTTPException(503, "Model not loaded. POST /load first or train a model.")
+    if state is None:
+        raise HTTPException(503, "Series state not loaded; need a feature store or sales history.")
+    n = len(req.SKU_ID)
+    if len(req.Sales_Channel) != n or len(req.Date) != n or (req.Promo_Flag is not None and len(req.Promo_Flag) != n):
+        raise HTTPException(422, "SKU_ID, Sales_Channel, Date and Promo_Flag must have equal lengths")
+    try:
+        days = to_days(req.Date)
+    except ValueError:
+        raise HTTPException(422, _FAST_VALIDATOR.validate({"Date": req.Date}).to_dict())
+    sid = state.lookup(req.SKU_ID, req.Sales_Channel)
+    cols = state.features(sid, days, req.Promo_Flag)
+    X = feature_matrix(cols, model.features)
+    keys = row_keys(X, [req.SKU_ID, req.Sales_Channel], req.quantile) if _cache.enabled else None
+    preds, found = _cache.get_rows(model, keys) if keys is not None else (np.empty(n), np.zeros(n, dtype=bool))
+    miss = np.flatnonzero(~found)
+    if len(miss):
+        Xm = X[miss] if len(miss) < n else X
+        if isinstance(model, ShardedModel):
+            df = pd.DataFrame(Xm, columns=model.features).assign(SKU_ID=np.asarray(req.SKU_ID)[miss],
+                                                                 Sales_Channel=np.asarray(req.Sales_Channel)[miss])
+            preds[miss] = await run_in_threadpool(predict, model, df, req.quantile)
+        elif BATCH_WINDOW_MS > 0:
+            preds[miss] = await _batcher.submit(Xm, key=(id(model), req.quantile), ctx=(model, req.quantile))
+        else:
+            preds[miss] = await run_in_threadpool(predict_array, model, Xm, req.quantile)
+        if keys is not None:
+            _cache.put_rows(model, [keys[i] for i in miss], preds[miss])
+    return {"SKU_ID": req.SKU_ID, "Sales_Channel": req.Sales_Channel, "Date": req.Date,
+            "forecast": np.asarray(preds, dtype=float).tolist(), "known_series": (sid >= 0).tolist()}
+
+@app.get("/forecast/cache")
+def cache_stats():
+    """Forecast cache counters: row hits (memory / disk) and misses, whole-payload hits, entries."""
+    return _cache.stats()
+
+@app.get("/forecast/batching")
+def batching_stats():
+    """Micro-batcher metrics: batch size and queue wait percentiles over recent batches."""
+    return _batcher.stats()
+
+class IndentBatchRequest(BaseModel):
+    # columnar: one entry per SKU; optional columns override leadtime.csv per SKU
+    SKU_ID: List[str]
+    daily_mean_demand: List[float]
+    daily_std_demand: List[float]
+    on_hand: List[float]
+    lead_time_days: Optional[List[Optional[int]]] = None
+    moq: Optional[List[Optional[int]]] = None
+    multiple: Optional[List[Optional[int]]] = None
+    shelf_life_days: Optional[List[Optional[int]]] = None
+    service_level: float = Field(default=0.9, gt=0, le=0.999)
+    chunk_rows: int = Field(default=5000, gt=0)
+    explode_bom: bool = False   # add component demand from bom.csv; components not listed have on_hand 0
+
+_planning: Optional[pd.DataFrame] = None
+_bom = None
+
+def _planning_table() -> Optional[pd.DataFrame]:
+    # per-SKU lead time / MOQ / multiple / shelf life from the data dir, loaded once
+    global _planning
+    if _planning is None:
+        lt_path = os.path.join(load_config().get("data_dir", "data"), "leadtime.csv")
+        if os.path.exists(lt_path):
+            _planning = load_planning_table(lt_path)
+    return _planning
+
+def _bom_graph():
+    global _bom
+    if _bom is None:
+        path = os.path.join(load_config().get("data_dir", "data"), "bom.csv")
+        if not os.path.exists(path):
+            raise HTTPException(422, "explode_bom needs bom.csv in the data dir")
+        try:
+            _bom = load_bom(path)
+        except ValueError as e:
+            raise HTTPException(422, f"bom.csv: {e}")
+    return _bom
 
 @app.post("/indent")
 def indent(req: IndentRequest):
     policy = IndentPolicy(service_level=req.service_level, moq=req.moq, multiple=req.multiple, shelf_life_days=req.shelf_life_days)
     rec = recommend_order(req.daily_mean_demand, req.daily_std_demand, req.lead_time_days, req.on_hand, policy)
     return rec
+
+@app.post("/indent/batch")
+def indent_batch(req: IndentBatchRequest):
+    """Plan every SKU in one vectorized pass; streams NDJSON, one line per SKU."""
+    n = len(req.SKU_ID)
+    cols = {"SKU_ID": req.SKU_ID, "daily_mean_demand": req.daily_mean_demand,
+            "daily_std_demand": req.daily_std_demand, "on_hand": req.on_hand}
+    for field, col in (("lead_time_days", "Lead_Time_Days"), ("moq", "MOQ"),
+                       ("multiple", "Order_Multiple"), ("shelf_life_days", "Shelf_Life_Days")):
+        if getattr(req, field) is not None:
+            cols[col] = getattr(req, field)
+    if any(len(v) != n for v in cols.values()):
+        raise HTTPException(422, "All columns must have one entry per SKU_ID")
+    demand = pd.DataFrame(cols)
+    for c in ("Lead_Time_Days", "MOQ", "Order_Multiple", "Shelf_Life_Days"):
+        if c in demand.columns:
+            demand[c] = demand[c].astype(float)
+    if req.explode_bom:
+        demand = explode_demand(_bom_graph(), demand)
+        demand["on_hand"] = demand["on_hand"].fillna(0.0)
+    try:
+        plan = plan_orders_frame(demand, _planning_table(), service_level=req.service_level)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    if req.explode_bom:
+        plan["daily_mean_demand"] = demand["daily_mean_demand"].to_numpy()
+        plan["bom_level"] = demand["bom_level"].to_numpy()
+
+    def stream():
+        for start in range(0, len(plan), req.chunk_rows):
+            chunk = plan.iloc[start:start + req.chunk_rows]
+            yield "".join(json.dumps(r) + "\n" for r in chunk.to_dict(orient="records"))
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,34 @@
+import time
+from quantumflow_core.instrumentation import Histogram
+
+REQUEST_LATENCY = Histogram("qf_http_request_duration_seconds", "API request latency by route, until the last body byte")
+
+class LatencyMiddleware:
+    """Plain ASGI middleware feeding `REQUEST_LATENCY`, labelled by route template (not raw path)."""
+
+    def __init__(self, app, histogram: Histogram = REQUEST_LATENCY):
+        self.app = app
+        self.histogram = histogram
+        self._paths = None
+
+    def _route(self, scope):
+        # the router puts the matched endpoint in the scope; map it back to its path template
+        if self._paths is None:
+            self._paths = {getattr(r, "endpoint", None): r.path for r in scope["app"].routes}
+        return self._paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.histogram.observe(time.perf_counter() - t0, method=scope["method"], route=self._route(scope),
+                                   status=status[0])
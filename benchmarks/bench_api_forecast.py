@@ -0,0 +1,81 @@
+"""Load-test /forecast (payload history + prepare_features) against /forecast/fast.
+
+    python -m benchmarks.bench_api_forecast --requests 300 --series 6
+    python -m benchmarks.bench_api_forecast --requests 300 --cache   # repeated queries served from the forecast cache
+
+The forecast cache is off unless --cache; with it, the payloads are sent
+twice and the second pass (what a refreshing dashboard sends) is reported too.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from quantumflow_core import prepare_features, select_and_train
+
+def _percentiles(lat):
+    lat = np.asarray(lat) * 1000
+    return {"p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99)), "mean_ms": float(lat.mean())}
+
+def _run(client, url, payloads, concurrency):
+    def call(p):
+        t0 = time.perf_counter()
+        r = client.post(url, json=p)
+        r.raise_for_status()
+        return time.perf_counter() - t0
+    with ThreadPoolExecutor(concurrency) as ex:
+        return list(ex.map(call, payloads))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--series", type=int, default=6, help="series per request")
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--cache", action="store_true", help="enable the forecast cache and replay the payloads")
+    ap.add_argument("--model", default=None, help="existing model.joblib (default: train one on data/sales.csv)")
+    args = ap.parse_args(argv)
+
+    sales = pd.read_csv("data/sales.csv")
+    model_path = args.model
+    if model_path is None:
+        model_path = os.path.join(tempfile.mkdtemp(), "model.joblib")
+        joblib.dump(select_and_train(prepare_features(sales)), model_path)
+    os.environ["QF_MODEL_PATH"] = model_path
+    if not args.cache:
+        os.environ["QF_FORECAST_CACHE_ROWS"] = os.environ["QF_FORECAST_CACHE_REQUESTS"] = "0"
+    from fastapi.testclient import TestClient
+    from apps.api.main import app
+
+    rng = np.random.default_rng(0)
+    keys = sales[["SKU_ID","Sales_Channel"]].drop_duplicates().to_numpy()
+    last = sales["Date"].max()
+    hist = sales.sort_values("Date").groupby(["SKU_ID","Sales_Channel"]).tail(30)
+    legacy, fast = [], []
+    for _ in range(args.requests):
+        pick = keys[rng.integers(0, len(keys), args.series)]
+        sel = hist.merge(pd.DataFrame(pick, columns=["SKU_ID","Sales_Channel"]), on=["SKU_ID","Sales_Channel"])
+        legacy.append({"rows": sel.to_dict(orient="records")})
+        nxt = (pd.Timestamp(last) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        fast.append({"SKU_ID": pick[:, 0].tolist(), "Sales_Channel": pick[:, 1].tolist(), "Date": [nxt] * len(pick)})
+
+    res = {}
+    with TestClient(app) as client:
+        for name, url, payloads in (("legacy /forecast", "/forecast", legacy), ("/forecast/fast", "/forecast/fast", fast)):
+            # warm-up; with the cache on, the first 10 payloads are then already cached
+            _run(client, url, payloads[:10], 1)
+            passes = [name] + ([f"{name} (repeat)"] if args.cache else [])
+            for label in passes:
+                res[label] = r = _percentiles(_run(client, url, payloads, args.concurrency))
+                print(f"{label:<28s} p50={r['p50_ms']:8.2f}ms  p99={r['p99_ms']:8.2f}ms  mean={r['mean_ms']:8.2f}ms")
+        res["batching"] = client.get("/forecast/batching").json()
+        print("micro-batching:", res["batching"])
+        if args.cache:
+            res["cache"] = client.get("/forecast/cache").json()
+            print("forecast cache:", res["cache"])
+    return res
+
+if __name__ == "__main__":
+    main()
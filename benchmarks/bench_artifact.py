@@ -0,0 +1,100 @@
+"""Cold start and per-worker memory: joblib pickle vs native artifact + mmap state.
+
+    python -m benchmarks.bench_artifact --skus 20000 --workers 4
+
+Each case starts `--workers` fresh interpreters at once (like uvicorn workers);
+each loads the model and series state, predicts one batch, then reports load
+time, RSS and PSS (shared pages split between the processes that map them).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = {
+    "joblib pickle + state from parquet": "joblib",
+    "native artifact (lazy) + mmap state": "native",
+}
+
+def _mem_mb():
+    out = {}
+    for fname, keys in (("/proc/self/status", ("VmRSS",)), ("/proc/self/smaps_rollup", ("Pss",))):
+        try:
+            with open(fname) as f:
+                for line in f:
+                    k = line.split(":")[0]
+                    if k in keys:
+                        out[k] = int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return out
+
+def _worker(case, root):
+    import numpy as np
+    import pandas as pd
+    from quantumflow_core.serving import SeriesStateTable, feature_matrix
+    from quantumflow_core.models import predict_array
+    t0 = time.perf_counter()
+    if case == "joblib":
+        import joblib
+        model = joblib.load(os.path.join(root, "model.joblib"))
+        state = SeriesStateTable.from_tail(pd.read_parquet(os.path.join(root, "tail.parquet")))
+    else:
+        from quantumflow_core.artifacts import load_model
+        model = load_model(os.path.join(root, "model"))
+        state = SeriesStateTable.load(os.path.join(root, "state"))
+    load_s = time.perf_counter() - t0
+    sid = np.arange(len(state))
+    t0 = time.perf_counter()
+    X = feature_matrix(state.features(sid, state.last_day + 1), model.features)
+    predict_array(model, X[:1000])
+    first_s = time.perf_counter() - t0
+    time.sleep(2.0)  # let the other workers map the same files before measuring PSS
+    return dict(load_s=load_s, first_predict_s=first_s, **_mem_mb())
+
+def _prepare(root, skus, days):
+    import joblib
+    from quantumflow_core.features import prepare_features
+    from quantumflow_core.models import select_and_train
+    from quantumflow_core.serving import SeriesStateTable
+    from quantumflow_core.artifacts import save_model
+    from .synthetic import SyntheticConfig, generate_sales, sku_names
+    sales = generate_sales(SyntheticConfig(n_skus=skus, n_channels=2, n_days=days))
+    model = select_and_train(prepare_features(sales[sales["SKU_ID"].isin(sku_names(min(skus, 500)))]))
+    joblib.dump(model, os.path.join(root, "model.joblib"))
+    save_model(model, os.path.join(root, "model"))
+    tail = sales.groupby(["SKU_ID", "Sales_Channel"]).tail(28)
+    tail.to_parquet(os.path.join(root, "tail.parquet"), index=False)
+    SeriesStateTable.from_tail(tail).save(os.path.join(root, "state"))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=20000)
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--root", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.case:
+        print(json.dumps(_worker(args.case, args.root)))
+        return
+
+    root = tempfile.mkdtemp()
+    _prepare(root, args.skus, args.days)
+    size = lambda p: (os.path.getsize(p) if os.path.isfile(p) else
+                      sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(p) for f in fs)) / 2**20
+    print(f"model.joblib {size(os.path.join(root, 'model.joblib')):.1f} MB, model/ {size(os.path.join(root, 'model')):.1f} MB, "
+          f"state/ {size(os.path.join(root, 'state')):.1f} MB ({args.skus * 2:,} series)")
+    print(f"{'case':<38s} {'load s':>7s} {'1st pred s':>10s} {'RSS MB':>7s} {'PSS MB':>7s}")
+    for label, case in CASES.items():
+        procs = [subprocess.Popen([sys.executable, "-m", "benchmarks.bench_artifact", "--case", case, "--root", root],
+                                  stdout=subprocess.PIPE, text=True) for _ in range(args.workers)]
+        rows = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        avg = lambda k: sum(r.get(k, float("nan")) for r in rows) / len(rows)
+        print(f"{label:<38s} {avg('load_s'):7.2f} {avg('first_predict_s'):10.3f} {avg('VmRSS'):7.0f} {avg('Pss'):7.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Date handling of the feature pipeline: per-row pandas parsing vs day-number lookup tables.
+
+    python -m benchmarks.bench_dates --skus 6850 --days 365     # ~5M rows
+
+For Date as strings (CSV) and as datetime64 (typed ingestion), times the
+previous calendar, holiday and weather-join code, which parsed Date in each
+step and merged weather on Python `date` objects, against parsing Date into
+int32 day numbers once and broadcasting per-distinct-day tables. Outputs are
+checked to be equal.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from quantumflow_core.dates import day_numbers, calendar_columns
+from quantumflow_core.external_factors import is_holiday, holiday_flags, weather_columns, weather_flags
+from .common import timer
+from .synthetic import SyntheticConfig, generate_sales
+
+def legacy_calendar(df, date_col="Date"):
+    d = pd.to_datetime(df[date_col])
+    return {"dayofweek": d.dt.dayofweek.to_numpy(), "weekofyear": d.dt.isocalendar().week.astype(int).to_numpy(),
+            "month": d.dt.month.to_numpy(), "quarter": d.dt.quarter.to_numpy()}
+
+def legacy_holiday_flags(df, country_code="US", date_col="Date", country_col=None):
+    days = pd.to_datetime(df[date_col]).values.astype("datetime64[D]")
+    if country_col and country_col in df.columns:
+        countries = df[country_col].fillna(country_code).astype(str).values
+        flag = np.zeros(len(df), dtype=bool)
+        for c in np.unique(countries):
+            m = countries == c
+            flag[m] = is_holiday(days[m], c)
+    else:
+        flag = is_holiday(days, country_code)
+    return flag.astype(int)
+
+def legacy_weather(df, w):
+    w = w.copy()
+    w["Date"] = pd.to_datetime(w["Date"]).dt.date
+    df2 = df.copy()
+    df2["Date"] = pd.to_datetime(df2["Date"]).dt.date
+    out = df2.merge(w, on="Date", how="left")
+    out["is_rain"] = out["precip_mm"].fillna(0) > 0.5
+    out["temp_avg"] = out[["temp_max", "temp_min"]].astype(float).mean(axis=1)
+    out["is_cold"] = out["temp_avg"] < 10
+    out["is_hot"] = out["temp_avg"] > 30
+    return out
+
+def new_pipeline(df, w):
+    days = day_numbers(df["Date"])
+    cal = calendar_columns(days)
+    hol = holiday_flags(df, country_col="country", days=days)
+    cols = weather_columns(w, days)
+    return days, cal, hol, {**cols, **weather_flags(cols)}
+
+def _weather(days, seed=0):
+    # one archive row per day, some values missing
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(str(np.datetime64(int(days.min()), "D")), str(np.datetime64(int(days.max()), "D")))
+    n = len(dates)
+    w = pd.DataFrame({"Date": dates, "temp_max": rng.normal(22, 9, n), "temp_min": rng.normal(12, 7, n),
+                      "precip_mm": rng.exponential(1.0, n), "weathercode": rng.integers(0, 80, n).astype(float)})
+    w.loc[rng.random(n) < 0.05, "temp_min"] = np.nan
+    return w
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=6850)
+    ap.add_argument("--days", type=int, default=365)
+    args = ap.parse_args(argv)
+
+    typed = generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days))
+    typed["country"] = np.array(["US", "GB", "IN", None], dtype=object)[np.arange(len(typed)) % 4]
+    # the same rows with dates as read from CSV, before load_sales types them
+    sales = typed.assign(Date=typed["Date"].dt.strftime("%Y-%m-%d"))
+    w = _weather(day_numbers(typed["Date"]))
+    print(f"{len(sales):,} rows, {args.days} distinct dates")
+    for label, df in (("str Date", sales), ("datetime64 Date", typed)):
+        r = {}
+        with timer(f"[{label}] legacy calendar", r):
+            cal_old = legacy_calendar(df)
+        with timer(f"[{label}] legacy holidays", r):
+            hol_old = legacy_holiday_flags(df, country_col="country")
+        with timer(f"[{label}] legacy weather merge", r):
+            w_old = legacy_weather(df, w)
+        legacy = sum(r.values())
+        with timer(f"[{label}] day numbers + tables", r):
+            days, cal, hol, weather = new_pipeline(df, w)
+        new = r[f"[{label}] day numbers + tables"]
+        print(f"[{label}] {legacy:.2f}s -> {new:.2f}s ({legacy / new:.1f}x)")
+        for k, v in cal_old.items():
+            assert np.array_equal(v, cal[k]) and v.dtype == cal[k].dtype, k
+        assert np.array_equal(hol_old, hol)
+        for k, v in weather.items():
+            assert np.array_equal(w_old[k].to_numpy(), v, equal_nan=v.dtype.kind == "f"), k
+        del cal_old, hol_old, w_old
+    print(f"Date column: {sales['Date'].memory_usage(deep=True) / 2**20:.0f} MB as str objects, "
+          f"{typed['Date'].memory_usage() / 2**20:.0f} MB as datetime64, {days.nbytes / 2**20:.0f} MB as int32 days")
+
+if __name__ == "__main__":
+    main()
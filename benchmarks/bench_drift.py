@@ -0,0 +1,71 @@
+"""Weekly drift check: full reload of both windows vs incremental sketches.
+
+    python -m benchmarks.bench_drift --skus 5000 --days 365 --new-days 7
+
+The full path re-reads the whole history each run and computes PSI/KS per
+channel from the raw rows (the data prep a full Evidently run needs, without
+the report itself). The sketch path reads the file in chunks but only bins
+rows past the watermark, then scores from the saved sketches.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from quantumflow_core.drift import DriftMonitor, iter_frames, psi_from_counts, ks_from_counts
+from .synthetic import SyntheticConfig, generate_sales
+
+def _full(path, reference_end, edges):
+    df = pd.read_csv(path, parse_dates=["Date"])
+    ref, cur = df[df["Date"] <= reference_end], df[df["Date"] > reference_end]
+    out = {}
+    for ch, r in ref.groupby("Sales_Channel"):
+        c = cur[cur["Sales_Channel"] == ch]
+        hr = np.bincount(np.searchsorted(edges, r["Sales_Quantity"].to_numpy(), side="right"), minlength=len(edges) + 1)
+        hc = np.bincount(np.searchsorted(edges, c["Sales_Quantity"].to_numpy(), side="right"), minlength=len(edges) + 1)
+        out[ch] = (psi_from_counts(hr, hc), ks_from_counts(hr, hc))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--new-days", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    root = tempfile.mkdtemp()
+    sales = generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days))
+    dates = np.sort(sales["Date"].unique())
+    ref_end, cur_end = pd.Timestamp(dates[-2 * args.new_days - 1]), pd.Timestamp(dates[-args.new_days - 1])
+    path = os.path.join(root, "sales.csv")
+    sales[sales["Date"] <= ref_end].to_csv(path, index=False)
+    mon = DriftMonitor.fit(lambda: iter_frames(path), features=["Sales_Quantity"], segment_by=["Sales_Channel"])
+    sales[sales["Date"] <= cur_end].to_csv(path, index=False)
+    mon.update(iter_frames(path))
+    mon.save(os.path.join(root, "state"))
+    sales.to_csv(path, index=False)   # one more week lands
+    print(f"{len(sales):,} rows, {os.path.getsize(path) / 2**20:.0f} MB CSV; reference through {ref_end}")
+
+    t0 = time.perf_counter()
+    full = _full(path, ref_end, mon.edges[0])
+    full_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    m = DriftMonitor.load(os.path.join(root, "state"))
+    m.update(iter_frames(path))
+    scores = m.scores()
+    m.save(os.path.join(root, "state"))
+    sketch_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    DriftMonitor.load(os.path.join(root, "state")).scores()
+    score_s = time.perf_counter() - t0
+
+    for ch, (psi, ks) in full.items():
+        row = scores[scores["Sales_Channel"] == ch].iloc[0]
+        print(f"{ch:<8s} PSI full {psi:.4f} sketch {row['psi']:.4f}   KS full {ks:.4f} sketch {row['ks']:.4f}")
+    print(f"{'full reload + PSI/KS':<36s} {full_s:8.2f}s")
+    print(f"{'sketch update (new rows) + score':<36s} {sketch_s:8.2f}s")
+    print(f"{'score from saved sketches only':<36s} {score_s:8.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Throughput of the recursive horizon forecaster (series x horizon days / s).
+
+    python -m benchmarks.bench_horizon --skus 5000 --horizons 7 30 90
+"""
+import argparse
+import time
+import lightgbm as lgb
+from quantumflow_core.features import prepare_features
+from quantumflow_core.models import TrainedModel, FEATURES_BASE
+from quantumflow_core.serving import SeriesStateTable
+from quantumflow_core.forecasting import forecast_horizon
+from .synthetic import SyntheticConfig, generate_sales, sku_names
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--days", type=int, default=120)
+    ap.add_argument("--horizons", type=int, nargs="+", default=[7, 30, 90])
+    ap.add_argument("--quantiles", type=float, nargs="*", default=[])
+    args = ap.parse_args(argv)
+
+    sales = generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days))
+    # small model: the benchmark measures feature building + batched calls, not model quality
+    train = prepare_features(sales[sales["SKU_ID"].isin(sku_names(min(args.skus, 500)))])
+    X, y = train[FEATURES_BASE].values, train["Sales_Quantity"].values
+    params = dict(n_estimators=200, num_leaves=31, learning_rate=0.05, verbose=-1)
+    model = lgb.LGBMRegressor(**params).fit(X, y)
+    qm = {q: lgb.LGBMRegressor(objective="quantile", alpha=q, **params).fit(X, y) for q in args.quantiles}
+    trained = TrainedModel(name="lgbm", model=model, features=list(FEATURES_BASE), quantile_models=qm or None)
+
+    state = SeriesStateTable.from_tail(sales)
+    print(f"{len(state)} series, quantiles={args.quantiles or 'none'}")
+    for h in args.horizons:
+        t0 = time.perf_counter()
+        fc = forecast_horizon(trained, state, horizon=h, quantiles=args.quantiles)
+        dt = time.perf_counter() - t0
+        print(f"horizon {h:4d}: {dt:8.3f}s  {len(fc) / dt:12,.0f} series-days/s  ({dt / h * 1000:.1f} ms/step)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""HPO sweep: legacy per-trial refits vs fold-reusing, pruned tune_segments.
+
+    python -m benchmarks.bench_hpo --skus 200 --days 365 --trials 20 --segments 4
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import lightgbm as lgb
+import optuna
+from quantumflow_core.evaluation import blocked_cv_slices, rmse
+from quantumflow_core.features import prepare_features
+from quantumflow_core.hpo import tune_segments
+from quantumflow_core.models import FEATURES_BASE
+from .synthetic import SyntheticConfig, generate_sales
+
+def _legacy_objective(trial, X, y):
+    # previous pipelines/hpo.py: raw arrays per fit, every fold to the end
+    params = {
+        "n_estimators": trial.suggest_int("n_estimators", 100, 1000, step=50),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.2, log=True),
+        "max_depth": trial.suggest_int("max_depth", 3, 12),
+        "subsample": trial.suggest_float("subsample", 0.6, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+    }
+    scores = []
+    for tr, va in blocked_cv_slices(len(y), 3):
+        m = lgb.LGBMRegressor(verbose=-1, **params).fit(X[tr], y[tr])
+        scores.append(rmse(y[va], m.predict(X[va])))
+    return float(np.mean(scores))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=200)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--trials", type=int, default=20)
+    ap.add_argument("--segments", type=int, default=4, help="SKU segments tuned in one run")
+    ap.add_argument("--n-jobs", type=int, default=os.cpu_count())
+    args = ap.parse_args(argv)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    feats = prepare_features(generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days)))
+    feats["Segment"] = feats["SKU_ID"].astype(str).str[-6:].astype(int) % args.segments
+    print(f"{len(feats):,} feature rows, {args.segments} segments x {args.trials} trials, n_jobs={args.n_jobs}")
+
+    t0 = time.perf_counter()
+    for _, seg in feats.groupby("Segment"):
+        X, y = seg[FEATURES_BASE].values, seg["Sales_Quantity"].values
+        optuna.create_study(direction="minimize", sampler=optuna.samplers.TPESampler(seed=0)).optimize(
+            lambda t: _legacy_objective(t, X, y), n_trials=args.trials)
+    legacy = time.perf_counter() - t0
+    print(f"{'legacy (sequential, no pruning)':<36s} {legacy:8.1f}s")
+
+    storage = os.path.join(tempfile.mkdtemp(), "optuna.journal")
+    t0 = time.perf_counter()
+    res = tune_segments(feats, ["Segment"], n_trials=args.trials, n_jobs=args.n_jobs, storage=storage)
+    new = time.perf_counter() - t0
+    pruned = sum(r["pruned"] for r in res.values())
+    total = sum(r["pruned"] + r["trials"] for r in res.values())
+    print(f"{'tune_segments':<36s} {new:8.1f}s  ({pruned}/{total} trials pruned, speedup {legacy / new:.1f}x)")
+
+if __name__ == "__main__":
+    main()
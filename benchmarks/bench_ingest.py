@@ -0,0 +1,79 @@
+"""Load time and peak RSS of sales ingestion: pandas read_csv vs typed chunked load.
+
+    python -m benchmarks.bench_ingest --skus 5000 --days 365
+
+Each case runs in a fresh interpreter so peak RSS is per case.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from .synthetic import SyntheticConfig, generate_sales
+
+CASES = {
+    "read_csv (legacy)": "legacy",
+    "load_sales, in memory": "typed",
+    "load_sales -> parquet (first run)": "convert",
+    "load_sales, parquet reuse": "reuse",
+    "load_sales, ranged blob reads": "blob",
+}
+
+def _peak_rss_mb():
+    # VmHWM resets on exec; ru_maxrss would carry over the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run_case(case, csv, parquet, chunksize):
+    import pandas as pd
+    from quantumflow_core.io import read_csv, load_sales, LocalBlob
+    t0 = time.perf_counter()
+    if case == "legacy":
+        df = read_csv(csv)
+        df["Date"] = pd.to_datetime(df["Date"])
+    elif case == "typed":
+        df = load_sales(csv, chunksize=chunksize)
+    elif case in ("convert", "reuse"):
+        df = load_sales(csv, parquet_path=parquet, chunksize=chunksize)
+    else:
+        df = load_sales("gs://bench/sales.csv", blob=LocalBlob(csv), chunksize=chunksize)
+    dt = time.perf_counter() - t0
+    return {"seconds": dt, "rows": len(df), "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+            "peak_rss_mb": _peak_rss_mb()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--chunksize", type=int, default=500_000)
+    ap.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--csv", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--parquet", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.case:
+        print(json.dumps(_run_case(args.case, args.csv, args.parquet, args.chunksize)))
+        return
+
+    tmp = tempfile.mkdtemp()
+    csv, parquet = os.path.join(tmp, "sales.csv"), os.path.join(tmp, "sales.parquet")
+    generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days)).to_csv(csv, index=False)
+    print(f"{os.path.getsize(csv) / 2**20:.0f} MB csv, {args.skus * 2 * args.days:,} rows")
+    print(f"{'case':<36s} {'seconds':>8s} {'frame MB':>9s} {'peak RSS MB':>12s}")
+    for label, case in CASES.items():
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_ingest", "--case", case, "--csv", csv,
+                              "--parquet", parquet, "--chunksize", str(args.chunksize)],
+                             check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{label:<36s} {r['seconds']:8.2f} {r['frame_mb']:9.0f} {r['peak_rss_mb']:12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""prepare_features wall time and peak memory, single process vs partition-parallel.
+
+    python -m benchmarks.bench_prepare_features --skus 20000 --days 365 --workers 1 4 8
+
+Each case runs in a fresh interpreter. Memory is sampled every 20 ms over the
+process tree (the case process plus its workers): peak RSS double-counts pages
+shared after fork, peak PSS splits them between the processes that map them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def _tree_mem_mb():
+    me = os.getpid()
+    pids = [me]
+    for d in os.listdir("/proc"):
+        if d.isdigit():
+            try:
+                with open(f"/proc/{d}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == me:
+                        pids.append(int(d))
+            except (OSError, ValueError, IndexError):
+                pass
+    rss = pss = 0.0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    k, v = line.split(":", 1)
+                    if k == "Rss":
+                        rss += int(v.split()[0]) / 1024
+                    elif k == "Pss":
+                        pss += int(v.split()[0]) / 1024
+        except (OSError, ValueError):
+            pass
+    return rss, pss
+
+def _case(path, workers):
+    import pandas as pd
+    from quantumflow_core.features import prepare_features
+    sales = pd.read_parquet(path)
+    peak = {"rss": 0.0, "pss": 0.0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.02):
+            rss, pss = _tree_mem_mb()
+            peak["rss"], peak["pss"] = max(peak["rss"], rss), max(peak["pss"], pss)
+    base_rss, base_pss = _tree_mem_mb()
+    t = threading.Thread(target=sample, daemon=True)
+    t.start()
+    t0 = time.perf_counter()
+    out = prepare_features(sales, n_jobs=workers)
+    wall = time.perf_counter() - t0
+    stop.set()
+    t.join()
+    return dict(wall_s=wall, rows=len(out), base_rss=base_rss, peak_rss=peak["rss"], peak_pss=peak["pss"])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=20000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.case:
+        path, workers = args.case.rsplit(":", 1)
+        print(json.dumps(_case(path, int(workers))))
+        return
+
+    from .synthetic import SyntheticConfig, generate_sales
+    path = os.path.join(tempfile.mkdtemp(), "sales.parquet")
+    # typed like load_sales output: datetime Date, categorical keys, float32 target
+    sales = generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days))
+    sales.to_parquet(path, index=False)
+    del sales
+    print(f"{args.skus * 2:,} series x {args.days} days = {args.skus * 2 * args.days:,} rows, {os.cpu_count()} CPU(s)")
+    print(f"{'workers':>7s} {'wall s':>8s} {'input MB':>9s} {'peak RSS MB':>12s} {'peak PSS MB':>12s}")
+    for w in args.workers:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_prepare_features", "--case", f"{path}:{w}"],
+                             stdout=subprocess.PIPE, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{w:7d} {r['wall_s']:8.2f} {r['base_rss']:9.0f} {r['peak_rss']:12.0f} {r['peak_pss']:12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""End-to-end stage benchmarks on the seeded synthetic dataset, recorded to JSON for comparison across commits.
+
+    python -m benchmarks.bench_suite --skus 1000 --channels 3 --years 3
+    python -m benchmarks.bench_suite --skus 100000 --years 3 --train-skus 2000 --skip weather
+    python -m benchmarks.bench_suite --compare artifacts/benchmarks/<before>.json artifacts/benchmarks/<after>.json
+
+Stages: generate, prepare_features, select_and_train (on the first
+`--train-skus` SKUs; model selection cost grows with rows, not SKUs), predict
+and quantile predict over every feature row, batch_enrich_weather against a
+WeatherStore pre-filled with synthetic weather (no network), plan_orders_frame
+for all SKUs, recommend_order one SKU at a time for `--recommend-sample` SKUs,
+and explode_demand + component planning over the BOM. Each stage records
+wall time, rows, peak RSS and peak RSS above the RSS it started with; the
+library's own timed stages (RECORDER) are saved alongside. With one
+`--compare` file the run is compared to it; with two, no run is made.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from dataclasses import asdict
+import numpy as np
+import pandas as pd
+from quantumflow_core.instrumentation import RECORDER, rss_mb
+from . import synthetic
+
+PREFIX = "bench."
+SKIPPABLE = ("train", "weather", "planning")
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, timeout=30).stdout.strip()
+    except Exception:
+        return ""
+
+def environment() -> dict:
+    import lightgbm
+    return {"commit": _git("rev-parse", "HEAD"), "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": pd.Timestamp.now(tz="UTC").isoformat(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "numpy": np.__version__,
+            "pandas": pd.__version__, "lightgbm": lightgbm.__version__}
+
+class Suite:
+    """Runs stages under RECORDER and keeps per-stage RSS at entry."""
+
+    def __init__(self):
+        RECORDER.reset()
+        self.rss_start = {}
+        self.order = []
+
+    def stage(self, name, rows=None):
+        self.rss_start[name] = rss_mb()
+        self.order.append(name)
+        print(f"-- {name}", flush=True)
+        return RECORDER.stage(PREFIX + name, rows)
+
+    def results(self) -> dict:
+        snap = RECORDER.snapshot()
+        stages = {}
+        for name in self.order:
+            s = snap.get(PREFIX + name)
+            if s is None:
+                continue
+            stages[name] = {"seconds": s.seconds, "rows": s.rows, "rows_per_s": s.rows / s.seconds if s.seconds else 0.0,
+                            "peak_rss_mb": s.peak_rss_mb, "rss_start_mb": self.rss_start[name],
+                            "peak_delta_mb": max(0.0, s.peak_rss_mb - self.rss_start[name])}
+        inner = {k: asdict(v) for k, v in snap.items() if not k.startswith(PREFIX)}
+        return {"stages": stages, "library_stages": inner}
+
+def _daily_demand(sales, days=90):
+    # per-SKU mean / std of daily demand (channels summed) over the last `days`
+    recent = sales[sales["Date"] > sales["Date"].max() - pd.Timedelta(days=days)]
+    daily = recent.groupby(["SKU_ID", "Date"], observed=True)["Sales_Quantity"].sum()
+    g = daily.groupby(level=0, observed=True)
+    return pd.DataFrame({"SKU_ID": g.mean().index.astype(str), "daily_mean_demand": g.mean().to_numpy(np.float64),
+                         "daily_std_demand": g.std().fillna(0).to_numpy(np.float64)})
+
+def run(args) -> dict:
+    from quantumflow_core.features import prepare_features
+    from quantumflow_core.models import select_and_train, predict
+    from quantumflow_core.inventory import IndentPolicy, plan_orders_frame, recommend_order
+    from quantumflow_core.bom import BOMGraph, explode_demand
+    from quantumflow_core.external_factors import batch_enrich_weather
+    from quantumflow_core.weather_store import WeatherStore
+
+    cfg = synthetic.config_from_args(args)
+    suite = Suite()
+    with suite.stage("generate", rows=cfg.n_skus * cfg.n_channels * cfg.n_days):
+        data = synthetic.generate(cfg)
+    sales = data.sales
+    print(f"{len(sales):,} sales rows, {len(data.promos):,} promo days, {len(data.bom):,} BOM lines")
+
+    with suite.stage("prepare_features", rows=len(sales)):
+        feats = prepare_features(sales, promos=data.promos, n_jobs=args.n_jobs)
+    if "train" not in args.skip:
+        train_skus = data.locations["SKU_ID"].to_numpy()[:args.train_skus]
+        train = feats[feats["SKU_ID"].isin(train_skus)]
+        with suite.stage("select_and_train", rows=len(train)):
+            model = select_and_train(train, n_jobs=args.n_jobs)
+        del train
+        print(f"model: {model.name}")
+        with suite.stage("predict", rows=len(feats)):
+            predict(model, feats)
+        if model.quantile_models:
+            with suite.stage("predict_quantile", rows=len(feats)):
+                predict(model, feats, quantile=0.9)
+    del feats
+
+    if "weather" not in args.skip:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = WeatherStore(os.path.join(tmp, "weather"), args.grid)
+            with suite.stage("weather_store_fill") as s:
+                s.rows = synthetic.fill_weather_store(store, data)
+            path = os.path.join(tmp, "sku_locations.csv")
+            data.locations.to_csv(path, index=False)
+            with suite.stage("batch_enrich_weather", rows=len(sales)):
+                batch_enrich_weather(sales, path, cache_dir=store.root, grid_deg=args.grid)
+
+    if "planning" not in args.skip:
+        rng = np.random.default_rng(cfg.seed)
+        demand = _daily_demand(sales)
+        demand["on_hand"] = (demand["daily_mean_demand"] * rng.uniform(0, 20, len(demand))).round()
+        planning = data.leadtime
+        with suite.stage("plan_orders_frame", rows=len(demand)):
+            plan_orders_frame(demand, planning)
+        sample = demand.head(args.recommend_sample).merge(planning, on="SKU_ID")
+        with suite.stage("recommend_order", rows=len(sample)):
+            for r in sample.itertuples(index=False):
+                shelf = None if np.isnan(r.Shelf_Life_Days) else int(r.Shelf_Life_Days)
+                recommend_order(r.daily_mean_demand, r.daily_std_demand, r.Lead_Time_Days, r.on_hand,
+                                IndentPolicy(moq=int(r.MOQ), multiple=int(r.Order_Multiple), shelf_life_days=shelf))
+        with suite.stage("explode_demand", rows=len(data.bom)):
+            graph = BOMGraph.from_frame(data.bom)
+            exploded = explode_demand(graph, demand)
+            exploded["on_hand"] = exploded["on_hand"].fillna(0)
+            plan_orders_frame(exploded, planning)
+    return suite.results()
+
+def compare(old: dict, new: dict) -> str:
+    # peak MB is the stage's peak RSS above the RSS it started with
+    lines = [f"{'stage':<22s} {'old s':>9s} {'new s':>9s} {'ratio':>7s} {'old MB':>9s} {'new MB':>9s}"]
+    for name, n in new["stages"].items():
+        o = old["stages"].get(name)
+        if o is None:
+            lines.append(f"{name:<22s} {'-':>9s} {n['seconds']:9.3f} {'':>7s} {'-':>9s} {n['peak_delta_mb']:9.0f}")
+            continue
+        ratio = n["seconds"] / o["seconds"] if o["seconds"] else float("nan")
+        lines.append(f"{name:<22s} {o['seconds']:9.3f} {n['seconds']:9.3f} {ratio:6.2f}x "
+                     f"{o['peak_delta_mb']:9.0f} {n['peak_delta_mb']:9.0f}")
+    return "\n".join(lines)
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    synthetic.add_args(ap)
+    ap.add_argument("--train-skus", type=int, default=200)
+    ap.add_argument("--n-jobs", type=int, default=None)
+    ap.add_argument("--grid", type=float, default=0.1)
+    ap.add_argument("--recommend-sample", type=int, default=1000)
+    ap.add_argument("--skip", nargs="*", default=[], choices=SKIPPABLE)
+    ap.add_argument("--out", default=None, help="JSON path (default artifacts/benchmarks/suite-<time>-<commit>.json)")
+    ap.add_argument("--compare", nargs="*", default=[], metavar="JSON")
+    args = ap.parse_args(argv)
+    if len(args.compare) > 2:
+        ap.error("--compare takes one or two files")
+    if len(args.compare) == 2:
+        print(compare(_load(args.compare[0]), _load(args.compare[1])))
+        return
+
+    env = environment()
+    res = {"environment": env, "config": asdict(synthetic.config_from_args(args)),
+           "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")}, **run(args)}
+    out = args.out or os.path.join("artifacts", "benchmarks",
+                                   f"suite-{pd.Timestamp(env['timestamp']):%Y%m%dT%H%M%S}-{env['commit'][:8] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=2, default=str)
+    print()
+    print(RECORDER.summary())
+    if args.compare:
+        print()
+        print(compare(_load(args.compare[0]), res))
+    print(f"\nwrote {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Flat NumPy tree inference vs the native boosters, batch sizes 1 .. 100k.
+
+    python -m benchmarks.bench_tree_inference --sizes 1 10 100 1000 10000 100000
+
+Trains the usual model (LightGBM base + 4 quantile models, or XGBoost when
+--model xgb), then times per-call latency for the mean forecast and for the
+mean plus all quantiles: sklearn wrapper, native booster as loaded from a
+save_model artifact, the compiled flat forest, and predict_quantiles with
+the flat forest attached (flat up to `max_rows`, native above).
+"""
+import argparse
+import copy
+import tempfile
+import time
+import numpy as np
+import quantumflow_core.models as M
+from quantumflow_core.features import prepare_features
+from quantumflow_core.models import select_and_train, predict_quantiles
+from quantumflow_core.artifacts import save_model, load_model
+from quantumflow_core.inference import CompiledModel
+from .synthetic import SyntheticConfig, generate_sales
+
+def _per_call(fn, X, budget_s=1.0, max_reps=2000):
+    fn(X)
+    reps, t0 = 0, time.perf_counter()
+    while reps < max_reps and (reps == 0 or time.perf_counter() - t0 < budget_s):
+        fn(X)
+        reps += 1
+    return (time.perf_counter() - t0) / reps
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=300)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--model", choices=["lgbm", "xgb"], default="lgbm")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000])
+    args = ap.parse_args(argv)
+
+    if args.model == "lgbm":
+        M.HAS_XGB = False
+    else:
+        M.HAS_LGB = False
+    feats = prepare_features(generate_sales(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days)))
+    trained = select_and_train(feats)
+    root = tempfile.mkdtemp()
+    save_model(trained, root + "/model")
+    native = load_model(root + "/model", lazy=False)
+    t0 = time.perf_counter()
+    compiled = CompiledModel(native)
+    compile_s = time.perf_counter() - t0
+    flat = compiled.forest
+    auto = copy.copy(native)
+    auto.compiled = compiled
+    qs = [None] + sorted(trained.quantile_models or {})
+    print(f"{trained.name}: {len(qs)} output(s), {len(flat.roots)} trees, {flat.n_nodes:,} nodes, "
+          f"depth max {int(flat.tree_depth.max())} mean {flat.tree_depth.mean():.1f}, compiled in {compile_s:.2f}s")
+
+    rng = np.random.default_rng(0)
+    X_all = feats[trained.features].to_numpy(dtype=np.float64)
+    X_all = X_all[rng.integers(0, len(X_all), max(args.sizes))]
+    Xc = X_all[:10000]
+    ref = np.column_stack([native.model.predict(Xc)] + [native.quantile_models[q].predict(Xc) for q in qs[1:]])
+    got = compiled.predict(Xc, qs)
+    print(f"max |flat - native| over {len(Xc):,} rows x {len(qs)} outputs: {np.abs(got - ref).max():.2e}")
+
+    cases = {
+        "sklearn wrapper, mean": lambda X: trained.model.predict(X),
+        "native booster, mean": lambda X: native.model.predict(X),
+        "flat, mean": lambda X: compiled.predict(X),
+        "native booster, mean+quantiles": lambda X: predict_quantiles(native, X, qs),
+        "flat, mean+quantiles": lambda X: compiled.predict(X, qs),
+        f"auto (<= {compiled.max_rows} rows flat), m+q": lambda X: predict_quantiles(auto, X, qs),
+    }
+    print(f"{'case':<32s}" + "".join(f"{n:>12,d}" for n in args.sizes) + "   (ms per call)")
+    for label, fn in cases.items():
+        cells = [_per_call(fn, X_all[:n]) * 1e3 for n in args.sizes]
+        print(f"{label:<32s}" + "".join(f"{c:12.3f}" for c in cells))
+
+if __name__ == "__main__":
+    main()
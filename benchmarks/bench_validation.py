@@ -0,0 +1,72 @@
+"""Columnar SalesRow validation vs per-row pydantic.
+
+    python -m benchmarks.bench_validation --rows 1000000 --pydantic-rows 200000
+"""
+import argparse
+import time
+from typing import List
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
+from quantumflow_core.data_schemas import SalesRow
+from quantumflow_core.validation import SALES_VALIDATOR
+from .synthetic import SyntheticConfig, generate_sales
+
+def _per_row(records):
+    bad = 0
+    for r in records:
+        try:
+            SalesRow(**r)
+        except ValidationError:
+            bad += 1
+    return bad
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--pydantic-rows", type=int, default=200_000, help="rows for the (slow) per-row paths")
+    ap.add_argument("--bad-frac", type=float, default=0.001)
+    args = ap.parse_args(argv)
+
+    n_days = 365
+    typed = generate_sales(SyntheticConfig(n_skus=max(1, args.rows // (2 * n_days)), n_channels=2, n_days=n_days)).head(args.rows)
+    # the same rows as read from CSV: str dates and keys, float64 quantities
+    df = typed.astype({"SKU_ID": str, "Sales_Channel": str, "Sales_Quantity": "float64"})
+    df["Date"] = typed["Date"].dt.strftime("%Y-%m-%d")
+    rng = np.random.default_rng(1)
+    bad = rng.random(len(df)) < args.bad_frac
+    df.loc[bad, "Sales_Quantity"] = -1.0
+    print(f"{len(df):,} rows, {int(bad.sum())} invalid")
+
+    t0 = time.perf_counter()
+    report = SALES_VALIDATOR.validate(df)
+    col_s = time.perf_counter() - t0
+    assert report.n_invalid == int(bad.sum())
+    print(f"{'columnar validator':<28s} {col_s:8.3f}s {len(df) / col_s:14,.0f} rows/s")
+
+    # frames from load_sales arrive typed (datetime64 / category / float32)
+    typed = typed.assign(Sales_Quantity=df["Sales_Quantity"].astype("float32"))
+    t0 = time.perf_counter()
+    SALES_VALIDATOR.validate(typed)
+    typed_s = time.perf_counter() - t0
+    print(f"{'columnar, typed frame':<28s} {typed_s:8.3f}s {len(df) / typed_s:14,.0f} rows/s")
+
+    sub = df.head(args.pydantic_rows)
+    records = sub.to_dict(orient="records")
+    t0 = time.perf_counter()
+    n_bad = _per_row(records)
+    row_s = time.perf_counter() - t0
+    assert n_bad == int(bad[:len(sub)].sum())
+    print(f"{'pydantic per row':<28s} {row_s:8.3f}s {len(sub) / row_s:14,.0f} rows/s")
+
+    adapter = TypeAdapter(List[SalesRow])
+    t0 = time.perf_counter()
+    try:
+        adapter.validate_python(records)
+    except ValidationError:
+        pass
+    list_s = time.perf_counter() - t0
+    print(f"{'pydantic TypeAdapter(list)':<28s} {list_s:8.3f}s {len(sub) / list_s:14,.0f} rows/s")
+    print(f"speedup vs per row: {(row_s / len(sub)) / (col_s / len(df)):.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Weather enrichment: per-location merge + concat vs one WeatherStore index lookup.
+
+    python -m benchmarks.bench_weather_store --skus 6850 --days 365 --locations 400
+
+SKUs get coordinates jittered around `--locations` sites, as hand-entered
+coordinates are. The legacy path merges and derives flags per raw (lat, lon)
+group from in-memory weather frames, then concatenates. The store path
+snaps the coordinates to the grid, writes the same weather once, then
+enriches every row with one (location_id, day) lookup on the memory-mapped
+grid. No network is used.
+"""
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from quantumflow_core.dates import day_numbers
+from quantumflow_core.external_factors import _positions
+from quantumflow_core.weather_store import WeatherStore
+from .common import timer
+from .synthetic import SyntheticConfig, generate
+
+def _weather_frame(dates, rng):
+    n = len(dates)
+    return pd.DataFrame({"Date": dates, "temp_max": rng.normal(22, 9, n).round(1), "temp_min": rng.normal(12, 7, n).round(1),
+                         "precip_mm": rng.exponential(1.0, n).round(1), "weathercode": rng.integers(0, 80, n).astype(float)})
+
+def legacy_enrich(df, mapping, weather):
+    # previous batch_enrich_weather minus the fetches: merge per (lat, lon) group, flags per group, concat
+    df2 = df.copy()
+    df2["Date"] = pd.to_datetime(df2["Date"]).dt.date
+    merged = df2.merge(mapping, on="SKU_ID", how="left")
+    out = []
+    for (lat, lon), group in merged.groupby(["lat", "lon"], dropna=True):
+        w = weather[(lat, lon)].copy()
+        w["Date"] = pd.to_datetime(w["Date"]).dt.date
+        g2 = group.merge(w, on="Date", how="left")
+        g2["is_rain"] = g2["precip_mm"].fillna(0) > 0.5
+        g2["temp_avg"] = g2[["temp_max", "temp_min"]].astype(float).mean(axis=1)
+        g2["is_cold"] = g2["temp_avg"] < 10
+        g2["is_hot"] = g2["temp_avg"] > 30
+        out.append(g2)
+    return pd.concat(out, ignore_index=True)
+
+def store_enrich(df, mapping, store):
+    out = df.copy()
+    pos = _positions(out["SKU_ID"], pd.Index(mapping["SKU_ID"].astype(str)))
+    map_loc = store.location_ids(mapping["lat"], mapping["lon"])
+    loc = np.where(pos >= 0, map_loc[np.maximum(pos, 0)], -1)
+    for k, v in store.lookup(loc, day_numbers(out["Date"])).items():
+        out[k] = v
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=6850)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--locations", type=int, default=400)
+    ap.add_argument("--grid", type=float, default=0.1)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    data = generate(SyntheticConfig(n_skus=args.skus, n_channels=2, n_days=args.days, n_locations=args.locations))
+    sales, mapping = data.sales, data.locations[["SKU_ID", "lat", "lon"]]
+    dates = pd.date_range(sales["Date"].min(), sales["Date"].max())
+    raw = {k: _weather_frame(dates, rng) for k in mapping[["lat", "lon"]].drop_duplicates().itertuples(index=False)}
+
+    store = WeatherStore(tempfile.mkdtemp(), args.grid)
+    ids = store.location_ids(mapping["lat"], mapping["lon"], add=True)
+    first = pd.Series(range(len(mapping))).groupby(ids).first()
+    print(f"{len(sales):,} rows, {args.skus} SKUs: {len(raw)} distinct coordinates -> {len(store)} grid locations "
+          f"(fetches and cache entries before / after)")
+    with timer("store write (flags computed once)"):
+        # one site's weather per grid cell
+        store.write([(i, raw[tuple(mapping.loc[j, ["lat", "lon"]])]) for i, j in first.items()])
+    r = {}
+    with timer("legacy per-location merge + concat", r):
+        legacy_enrich(sales, mapping, raw)
+    with timer("store lookup", r):
+        out = store_enrich(sales, mapping, store)
+    print(f"speedup {r['legacy per-location merge + concat'] / r['store lookup']:.1f}x, "
+          f"{out['temp_max'].notna().mean():.1%} of rows with weather")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import time
+from contextlib import contextmanager
+
+@contextmanager
+def timer(label, results=None):
+    t0 = time.perf_counter()
+    yield
+    dt = time.perf_counter() - t0
+    if results is not None:
+        results[label] = dt
+    print(f"{label:<40s} {dt:10.3f}s")
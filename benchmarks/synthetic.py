@@ -0,0 +1,219 @@
+"""Seeded synthetic dataset in the shapes of `data/`: sales, promos, lead times, SKU locations and a BOM.
+
+    python -m benchmarks.synthetic --skus 100000 --channels 3 --years 3 --out data/synthetic
+
+Sales are daily Poisson demand per SKU x channel with a per-series level,
+trend, weekly and yearly seasonality and a promo lift; promos run for a few
+days at a time and lift every channel of the SKU. Sales come typed as
+`load_sales` returns them (datetime64 Date, categorical keys, float32
+quantity), about 17 bytes a row: 100k SKUs x 3 channels x 3 years is ~330M
+rows / ~5.5 GB. The same seed and sizes always give the same data.
+"""
+import argparse
+import os
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+
+CHANNELS = ("Online", "Retail", "Wholesale", "Distributor", "Marketplace")
+COUNTRIES = ("IN", "US", "GB")
+
+@dataclass
+class SyntheticConfig:
+    n_skus: int = 1000
+    n_channels: int = 3
+    n_days: int = 3 * 365
+    start: str = "2022-01-01"
+    seed: int = 0
+    promo_rate: float = 0.05       # share of SKU-days on promo
+    promo_days: int = 5            # length of one promo run
+    n_locations: int = 400         # sites SKU coordinates are scattered around
+    bom_levels: int = 3            # component levels below the SKUs
+    bom_fanout: int = 3            # components per parent
+    chunk_series: int = 20_000     # series generated per step (bounds temporaries)
+
+    @property
+    def channels(self):
+        if not 1 <= self.n_channels <= len(CHANNELS):
+            raise ValueError(f"n_channels must be 1..{len(CHANNELS)}")
+        return CHANNELS[:self.n_channels]
+
+@dataclass
+class SyntheticData:
+    config: SyntheticConfig
+    sales: pd.DataFrame       # Date, SKU_ID, Sales_Channel, Sales_Quantity
+    promos: pd.DataFrame      # Date, SKU_ID, Promo_Flag (promo days only)
+    leadtime: pd.DataFrame    # SKU_ID, Lead_Time_Days, Order_Multiple, MOQ, Shelf_Life_Days (SKUs and components)
+    locations: pd.DataFrame   # SKU_ID, lat, lon, country
+    bom: pd.DataFrame         # Parent_SKU, Component_SKU, Qty_Per
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.config.start, periods=self.config.n_days, freq="D")
+
+def sku_names(n) -> np.ndarray:
+    return np.array([f"SKU{i:06d}" for i in range(n)])
+
+def _promo_mask(rng, n_skus, n_days, rate, run, chunk):
+    # runs of `run` days starting at random days
+    mask = np.empty((n_skus, n_days), dtype=bool)
+    for s in range(0, n_skus, chunk):
+        c = np.cumsum(rng.random((min(chunk, n_skus - s), n_days)) < rate / run, axis=1, dtype=np.int32)
+        c[:, run:] -= c[:, :-run].copy()
+        mask[s:s + chunk] = c > 0
+    return mask
+
+def _sales(cfg, rng, skus, promo):
+    n_ch, n_days = cfg.n_channels, cfg.n_days
+    n_series = cfg.n_skus * n_ch
+    dates = pd.date_range(cfg.start, periods=n_days, freq="D")
+    t = np.arange(n_days)
+    weekly = 1.0 + 0.2 * np.sin(2 * np.pi * dates.dayofweek.values / 7)
+    yearly = 1.0 + 0.3 * np.sin(2 * np.pi * (dates.dayofyear.values - 80) / 365.25)
+    season = (weekly * yearly).astype(np.float32)
+    level = rng.gamma(2.0, 20.0, n_series).astype(np.float32)
+    trend = rng.normal(0.0, 0.2, n_series).astype(np.float32) / max(n_days, 1)
+    lift = rng.uniform(1.2, 2.0, cfg.n_skus).astype(np.float32)
+    qty = np.empty(n_series * n_days, dtype=np.float32)
+    for s in range(0, n_series, cfg.chunk_series):
+        e = min(s + cfg.chunk_series, n_series)
+        sku = np.arange(s, e) // n_ch
+        lam = level[s:e, None] * season[None, :] * (1.0 + trend[s:e, None] * t[None, :])
+        lam *= np.where(promo[sku], lift[sku, None], np.float32(1.0))
+        qty[s * n_days:e * n_days] = rng.poisson(np.maximum(lam, 0)).ravel()
+    code_dtype = np.int32 if cfg.n_skus > 32_000 else np.int16
+    return pd.DataFrame({
+        "Date": np.tile(dates.values, n_series),
+        "SKU_ID": pd.Categorical.from_codes(np.repeat(np.arange(cfg.n_skus, dtype=code_dtype), n_ch * n_days), skus),
+        "Sales_Channel": pd.Categorical.from_codes(np.tile(np.repeat(np.arange(n_ch, dtype=np.int8), n_days),
+                                                           cfg.n_skus), list(cfg.channels)),
+        "Sales_Quantity": qty,
+    })
+
+def _promos(cfg, skus, promo):
+    sku, day = np.nonzero(promo)
+    dates = pd.date_range(cfg.start, periods=cfg.n_days, freq="D")
+    return pd.DataFrame({"Date": dates.values[day], "SKU_ID": pd.Categorical.from_codes(sku, skus),
+                         "Promo_Flag": np.ones(len(sku), dtype=np.int8)})
+
+def _leadtime(cfg, rng, items):
+    n = len(items)
+    multiple = rng.choice([1, 6, 12, 24, 50, 100], n)
+    shelf = rng.choice([30.0, 90.0, 180.0, 365.0], n)
+    shelf[rng.random(n) < 0.7] = np.nan
+    return pd.DataFrame({"SKU_ID": items, "Lead_Time_Days": np.clip(rng.gamma(3.0, 3.0, n).round(), 1, 60).astype(int),
+                         "Order_Multiple": multiple, "MOQ": multiple * rng.integers(1, 5, n),
+                         "Shelf_Life_Days": shelf})
+
+def _locations(cfg, rng, skus):
+    sites = np.column_stack([rng.uniform(8, 35, cfg.n_locations), rng.uniform(68, 97, cfg.n_locations)])
+    site_country = rng.choice(COUNTRIES, cfg.n_locations, p=[0.8, 0.1, 0.1])
+    site = rng.integers(0, cfg.n_locations, cfg.n_skus)
+    # a few hundred metres of jitter, 4 decimals, as coordinates are usually entered
+    coords = (sites[site] + rng.normal(0, 0.002, (cfg.n_skus, 2))).round(4)
+    return pd.DataFrame({"SKU_ID": skus, "lat": coords[:, 0], "lon": coords[:, 1], "country": site_country[site]})
+
+def _bom(cfg, rng, skus):
+    # level 0 is the SKUs; each level below has half as many items, shared by several parents
+    sizes = [cfg.n_skus] + [max(1, cfg.n_skus >> (l + 1)) for l in range(cfg.bom_levels)]
+    names = [skus] + [np.array([f"C{l + 1}-{i:07d}" for i in range(n)]) for l, n in enumerate(sizes[1:])]
+    frames = []
+    for l in range(cfg.bom_levels):
+        parent = np.repeat(names[l], cfg.bom_fanout)
+        comp = names[l + 1][rng.integers(0, sizes[l + 1], len(parent))]
+        frames.append(pd.DataFrame({"Parent_SKU": parent, "Component_SKU": comp,
+                                    "Qty_Per": rng.integers(1, 5, len(parent)).astype(float)}))
+    if not frames:
+        return pd.DataFrame({"Parent_SKU": [], "Component_SKU": [], "Qty_Per": []})
+    # the same component drawn twice for one parent is one BOM line
+    return pd.concat(frames, ignore_index=True).drop_duplicates(["Parent_SKU", "Component_SKU"], ignore_index=True)
+
+def _streams(cfg):
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(cfg.seed).spawn(5)]
+
+def generate_sales(cfg: SyntheticConfig = None) -> pd.DataFrame:
+    """`generate(cfg).sales` without building the other tables."""
+    cfg = cfg or SyntheticConfig()
+    rng = _streams(cfg)
+    promo = _promo_mask(rng[0], cfg.n_skus, cfg.n_days, cfg.promo_rate, cfg.promo_days, cfg.chunk_series)
+    return _sales(cfg, rng[1], sku_names(cfg.n_skus), promo)
+
+def generate(cfg: SyntheticConfig = None) -> SyntheticData:
+    """Build every table of `cfg`. Each table draws from its own seeded stream,
+    so e.g. a different BOM shape leaves sales and promos unchanged."""
+    cfg = cfg or SyntheticConfig()
+    rng = _streams(cfg)
+    skus = sku_names(cfg.n_skus)
+    promo = _promo_mask(rng[0], cfg.n_skus, cfg.n_days, cfg.promo_rate, cfg.promo_days, cfg.chunk_series)
+    bom = _bom(cfg, rng[4], skus)
+    # purchased components need lead times too
+    parts = np.unique(np.concatenate([bom["Parent_SKU"].to_numpy(str), bom["Component_SKU"].to_numpy(str)]))
+    items = np.concatenate([skus, parts[~np.isin(parts, skus)]])
+    return SyntheticData(cfg, sales=_sales(cfg, rng[1], skus, promo), promos=_promos(cfg, skus, promo),
+                         leadtime=_leadtime(cfg, rng[2], items), locations=_locations(cfg, rng[3], skus), bom=bom)
+
+def synthetic_weather(dates, seed=0) -> pd.DataFrame:
+    """One location's daily archive (Date + WEATHER_COLS) with a yearly temperature cycle."""
+    rng = np.random.default_rng(seed)
+    n = len(dates)
+    temp = 24 + 8 * np.sin(2 * np.pi * (pd.DatetimeIndex(dates).dayofyear.values - 110) / 365.25)
+    return pd.DataFrame({"Date": dates, "temp_max": (temp + 5 + rng.normal(0, 3, n)).round(1),
+                         "temp_min": (temp - 5 + rng.normal(0, 3, n)).round(1),
+                         "precip_mm": (rng.exponential(2.0, n) * (rng.random(n) < 0.3)).round(1),
+                         "weathercode": rng.integers(0, 80, n).astype(float)})
+
+def fill_weather_store(store, data: SyntheticData) -> int:
+    """Write synthetic weather for every grid location of `data.locations` into `store`,
+    so enrichment finds no gaps and makes no requests. Returns the number of locations."""
+    ids = np.unique(store.location_ids(data.locations["lat"], data.locations["lon"], add=True))
+    dates = data.dates
+    store.write([(i, synthetic_weather(dates, seed=data.config.seed * 1_000_003 + int(i))) for i in ids])
+    return len(ids)
+
+def write(data: SyntheticData, out_dir: str, chunk_rows: int = 5_000_000) -> dict:
+    """CSV files named as in `data/`; sales are written in chunks. Returns {table: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name, df in (("promos", data.promos), ("leadtime", data.leadtime), ("sku_locations", data.locations),
+                     ("bom", data.bom)):
+        paths[name] = os.path.join(out_dir, f"{name}.csv")
+        df.to_csv(paths[name], index=False, date_format="%Y-%m-%d")
+    paths["sales"] = os.path.join(out_dir, "sales.csv")
+    for s in range(0, max(len(data.sales), 1), chunk_rows):
+        data.sales.iloc[s:s + chunk_rows].to_csv(paths["sales"], index=False, date_format="%Y-%m-%d",
+                                                 mode="w" if s == 0 else "a", header=s == 0)
+    return paths
+
+def add_args(ap: argparse.ArgumentParser):
+    d = SyntheticConfig()
+    ap.add_argument("--skus", type=int, default=d.n_skus)
+    ap.add_argument("--channels", type=int, default=d.n_channels)
+    ap.add_argument("--years", type=float, default=None, help="overrides --days")
+    ap.add_argument("--days", type=int, default=d.n_days)
+    ap.add_argument("--start", default=d.start)
+    ap.add_argument("--seed", type=int, default=d.seed)
+    ap.add_argument("--promo-rate", type=float, default=d.promo_rate)
+    ap.add_argument("--locations", type=int, default=d.n_locations)
+    ap.add_argument("--bom-levels", type=int, default=d.bom_levels)
+    ap.add_argument("--bom-fanout", type=int, default=d.bom_fanout)
+
+def config_from_args(args) -> SyntheticConfig:
+    days = int(round(args.years * 365)) if args.years else args.days
+    return SyntheticConfig(n_skus=args.skus, n_channels=args.channels, n_days=days, start=args.start, seed=args.seed,
+                           promo_rate=args.promo_rate, n_locations=args.locations, bom_levels=args.bom_levels,
+                           bom_fanout=args.bom_fanout)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    add_args(ap)
+    ap.add_argument("--out", default="data/synthetic")
+    args = ap.parse_args(argv)
+    cfg = config_from_args(args)
+    data = generate(cfg)
+    print(f"{len(data.sales):,} sales rows ({data.sales.memory_usage(deep=True).sum() / 2**20:,.0f} MB), "
+          f"{len(data.promos):,} promo days, {len(data.bom):,} BOM lines; config {asdict(cfg)}")
+    for name, path in write(data, args.out).items():
+        print(f"{name:<14s} {path}")
+
+if __name__ == "__main__":
+    main()
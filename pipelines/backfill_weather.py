@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 from quantumflow_core.external_factors import batch_enrich_weather
+from quantumflow_core.weather_backfill import backfill_weather, location_ranges
 from quantumflow_core.config import load_config
 
 def main(cfg_path="configs/dev.yaml"):
@@ -11,8 +12,22 @@ def main(cfg_path="configs/dev.yaml"):
     if not os.path.exists(sales_path):
         raise FileNotFoundError(sales_path)
     sales = pd.read_csv(sales_path)
+    cache_dir = os.path.join(data_dir, "weather_cache")
+    workers = cfg.get("weather_workers", 8)
+    rate = cfg.get("weather_rate_per_sec", 5.0)
+    grid = cfg.get("weather_grid_deg", 0.1)
     print("Starting batch weather backfill...")
-    enriched = batch_enrich_weather(sales, sku_location_map_path=sku_map, cache_dir=os.path.join(data_dir,"weather_cache"))
+    if os.path.exists(sku_map):
+        # resumable: locations already covered by the checkpoint are skipped on rerun
+        summary = backfill_weather(location_ranges(sales, pd.read_csv(sku_map)), cache_dir=cache_dir,
+                                   max_workers=workers, rate_per_sec=rate, grid_deg=grid,
+                                   checkpoint_path=os.path.join(cache_dir, "_checkpoint.json"))
+        print(f"Backfill: {summary['locations']} grid locations, {summary['done']} fetched, {summary['skipped']} already complete, "
+              f"{summary['incomplete']} with days not yet published, {len(summary['failed'])} failed, {summary['requests']} API requests")
+        for loc, err in summary["failed"].items():
+            print(f"  failed {loc}: {err}")
+    enriched = batch_enrich_weather(sales, sku_location_map_path=sku_map, cache_dir=cache_dir,
+                                    max_workers=workers, rate_per_sec=rate, grid_deg=grid)
     out_path = os.path.join(data_dir, "sales_enriched.parquet")
     enriched.to_parquet(out_path, index=False)
     print(f"Wrote enriched sales to {out_path}")
@@ -1,14 +1,25 @@
-import os, pandas as pd
-from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset, TargetDriftPreset
-from evidently import ColumnMapping
-from quantumflow_core import load_config, read_csv
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+import os, json, argparse, itertools, pandas as pd
+from quantumflow_core import load_config
+from quantumflow_core.drift import DriftMonitor, iter_frames, reservoir_sample
+
+try:
+    from evidently.report import Report
+    from evidently.metric_preset import DataDriftPreset, TargetDriftPreset
+    from evidently import ColumnMapping
+    HAS_EVIDENTLY = True
+except Exception:
+    HAS_EVIDENTLY = False
+
+try:
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
+    HAS_SLACK = True
+except Exception:
+    HAS_SLACK = False
 
 def send_slack(msg, webhook=None, token=None, channel='#general'):
-    # Simple slack notifier: prefer token+chat.postMessage for richer control
-    if token:
+    # Simple slack notifier: token+chat.postMessage when slack_sdk is installed, else a local stub that prints
+    if token and HAS_SLACK:
         client = WebClient(token=token)
         try:
             client.chat_postMessage(channel=channel, text=msg)
@@ -17,20 +28,121 @@ def send_slack(msg, webhook=None, token=None, channel='#general'):
     else:
         print('SLACK:', msg)
 
-def run_drift(ref_path, curr_path, output_html='drift_report.html', slack_token=None, slack_channel='#alerts'):
-    ref = pd.read_parquet(ref_path) if ref_path.endswith('.parquet') else pd.read_csv(ref_path)
-    curr = pd.read_parquet(curr_path) if curr_path.endswith('.parquet') else pd.read_csv(curr_path)
-    # Basic column mapping - assume same schema
-    col_mapping = ColumnMapping()
-    report = Report(metrics=[DataDriftPreset(), TargetDriftPreset()])
-    report.run(reference_data=ref, current_data=curr, column_mapping=col_mapping)
+def _window(frames, after, until, segment_by=None, segments=None):
+    # rows with after < Date <= until, optionally only from `segments`
+    for df in frames:
+        d = pd.to_datetime(df['Date'])
+        keep = pd.Series(True, index=df.index)
+        if after is not None:
+            keep &= d > pd.Timestamp(after)
+        if until is not None:
+            keep &= d <= pd.Timestamp(until)
+        if segments is not None:
+            keep &= pd.MultiIndex.from_frame(df[segment_by].astype(str)).isin(segments)
+        yield df[keep.to_numpy()]
+
+def _last_date(path):
+    last = None
+    for df in iter_frames(path, columns=['Date']):
+        if len(df):
+            d = pd.to_datetime(df['Date']).max().strftime('%Y-%m-%d')
+            last = d if last is None or d > last else last
+    return last
+
+def report_samples(ref_path, curr_path, mon, drifted, sample_rows=50_000):
+    """(reference, current) row samples of the drifted segments and columns, matching the sketches.
+
+    The reference is every row of `ref_path` plus, after `--rebase`, the rows of
+    `curr_path` folded in up to `reference_end`; the current window is
+    `reference_end` < Date <= `watermark` of `curr_path`.
+    """
+    seg = mon.segment_by
+    pooled = (drifted[seg] == 'ALL').all(axis=1).any() if seg else True
+    segments = None if pooled else list(drifted[seg].astype(str).itertuples(index=False, name=None))
+    columns = ['Date'] + seg + sorted(set(drifted['feature']))
+    # states saved before fit_end was recorded: the reference file ends at its own last Date
+    fit_end = mon.fit_end or _last_date(ref_path)
+    ref_frames = _window(iter_frames(ref_path, columns=columns), None, fit_end, seg, segments)
+    if mon.reference_end is not None and fit_end is not None and mon.reference_end > fit_end:
+        rebased = _window(iter_frames(curr_path, columns=columns), fit_end, mon.reference_end, seg, segments)
+        ref_frames = itertools.chain(ref_frames, rebased)
+    ref = reservoir_sample(ref_frames, sample_rows)
+    cur = reservoir_sample(_window(iter_frames(curr_path, columns=columns), mon.reference_end, mon.watermark, seg, segments),
+                           sample_rows)
+    return ref, cur
+
+def run_report(ref_path, curr_path, mon, drifted, output_html, sample_rows=50_000, target='Sales_Quantity'):
+    """Evidently report on sampled rows of the drifted segments and columns only."""
+    if not HAS_EVIDENTLY:
+        print('evidently not installed; skipping the HTML drift report')
+        return None
+    cols = sorted(set(drifted['feature']))
+    ref, cur = report_samples(ref_path, curr_path, mon, drifted, sample_rows)
+    if not len(ref) or not len(cur):
+        print(f'No {"reference" if not len(ref) else "current"} rows for the drifted segments; skipping the HTML drift report')
+        return None
+    metrics = [DataDriftPreset(columns=cols)] + ([TargetDriftPreset()] if target in cols else [])
+    mapping = ColumnMapping(target=target if target in cols else None,
+                            numerical_features=[c for c in cols if c != target])
+    report = Report(metrics=metrics)
+    report.run(reference_data=ref[cols], current_data=cur[cols], column_mapping=mapping)
     report.save_html(output_html)
-    send_slack(f'Drift report generated: {output_html}', token=slack_token, channel=slack_channel)
     return output_html
 
+def run_drift(ref_path, curr_path, output_html='drift_report.html', slack_token=None, slack_channel='#alerts',
+              cfg=None, rebase=False, rebuild=False):
+    """Update the drift sketches with new rows of `curr_path` and score them; report only on drift.
+
+    The first run (or `rebuild`) sketches `ref_path` as the reference window.
+    Scores go to <drift_state_dir>/scores.csv; the Evidently HTML report and
+    the Slack message are produced only when a segment/feature crosses
+    `drift_psi_threshold` or `drift_ks_threshold`. Returns the report path or None.
+    """
+    cfg = cfg or {}
+    state_dir = cfg.get('drift_state_dir', 'artifacts/drift')
+    chunk = cfg.get('ingest_chunk_rows', 500_000)
+    segment_by = cfg.get('drift_segment_by', ['Sales_Channel'])
+    if isinstance(segment_by, str):
+        segment_by = [segment_by]
+    if rebuild or not DriftMonitor.exists(state_dir):
+        mon = DriftMonitor.fit(lambda: iter_frames(ref_path, chunk), features=cfg.get('drift_features'),
+                               segment_by=segment_by, bins=cfg.get('drift_bins', 20))
+        print(f'Reference sketches built from {ref_path} through {mon.reference_end}')
+    else:
+        mon = DriftMonitor.load(state_dir)
+    before = mon.watermark
+    mon.update(iter_frames(curr_path, chunk))
+    scores = mon.scores(psi_threshold=cfg.get('drift_psi_threshold', 0.2), ks_threshold=cfg.get('drift_ks_threshold', 0.1),
+                        min_rows=cfg.get('drift_min_rows', 200))
+    os.makedirs(state_dir, exist_ok=True)
+    scores.to_csv(os.path.join(state_dir, 'scores.csv'), index=False)
+    drifted = scores[scores['drifted']]
+    print(f'Current window {mon.reference_end} .. {mon.watermark} (was {before}); '
+          f'{len(drifted)} of {len(scores)} segment/feature pairs drifted')
+    out = None
+    if mon.watermark == before:
+        print('No new rows since the last run; not reporting')
+    elif len(drifted):
+        out = run_report(ref_path, curr_path, mon, drifted, output_html, cfg.get('drift_report_rows', 50_000))
+        top = drifted.sort_values('psi', ascending=False).head(5)
+        lines = [f"{'/'.join(str(r[c]) for c in (mon.segment_by or ['segment']))} {r['feature']}: "
+                 f"PSI {r['psi']:.3f}, KS {r['ks']:.3f}" for _, r in top.iterrows()]
+        send_slack(f'Drift in {len(drifted)} segment/feature pairs' + (f', report: {out}' if out else '') + '\n'
+                   + '\n'.join(lines), token=slack_token, channel=slack_channel)
+    if rebase:
+        mon.rebase()
+    mon.save(state_dir)
+    return out
+
 if __name__ == '__main__':
-    cfg = load_config()
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cfg', default=None)
+    ap.add_argument('--rebase', action='store_true', help='fold the current window into the reference after scoring')
+    ap.add_argument('--rebuild', action='store_true', help='re-sketch the reference from scratch')
+    args = ap.parse_args()
+    cfg = load_config(args.cfg)
     data_dir = cfg.get('data_dir','data')
     ref = os.path.join(data_dir,'sales_enriched.parquet') if os.path.exists(os.path.join(data_dir,'sales_enriched.parquet')) else os.path.join(data_dir,'sales.csv')
     curr = os.path.join(data_dir,'sales_recent.csv') if os.path.exists(os.path.join(data_dir,'sales_recent.csv')) else ref
-    run_drift(ref, curr)
+    run_drift(ref, curr, cfg=cfg, slack_token=os.environ.get('SLACK_TOKEN'), slack_channel=cfg.get('slack_channel', '#alerts'),
+              rebase=args.rebase, rebuild=args.rebuild)
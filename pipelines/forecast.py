@@ -1,11 +1,46 @@
-import pandas as pd, numpy as np, os, joblib
-from quantumflow_core import prepare_features
-from pathlib import Path
-
-def main(horizon=30):
-    model = joblib.load("artifacts/model.joblib")
-    # For demo: assume we have future feature frame prepared elsewhere
-    print("Load your future feature frame and call predict(model, df_future)")
+import pandas as pd, numpy as np, os, shutil
+from quantumflow_core import load_config, read_csv, load_sales, ensure_columns
+from quantumflow_core.feature_store import FeatureStore, MANIFEST
+from quantumflow_core.models import ShardedModel
+from quantumflow_core.artifacts import load_model
+from quantumflow_core.inference import with_backend
+from quantumflow_core.serving import SeriesStateTable
+from quantumflow_core.forecasting import forecast_horizon
+from quantumflow_core.instrumentation import RECORDER, profiled
+
+def main(cfg_path="configs/dev.yaml", horizon=None, out_dir="artifacts/forecasts"):
+    cfg = load_config(cfg_path)
+    data_dir = cfg.get("data_dir","data")
+    horizon = int(horizon or cfg.get("forecast_horizon_days", 30))
+    model = with_backend(load_model(os.environ.get("QF_MODEL_PATH", "artifacts/model")), cfg)
+
+    # series tails: feature store state when available, else the raw sales history
+    store_dir = cfg.get("feature_store_dir")
+    if store_dir and os.path.exists(os.path.join(store_dir, MANIFEST)):
+        tail = FeatureStore(store_dir).state()
+    else:
+        cache_dir = cfg.get("ingest_cache_dir")
+        tail = load_sales(os.path.join(data_dir,"sales.csv"), parquet_path=os.path.join(cache_dir, "sales.parquet") if cache_dir else None,
+                          chunksize=cfg.get("ingest_chunk_rows", 500_000))
+        ensure_columns(tail, ["Date","SKU_ID","Sales_Channel","Sales_Quantity"], "sales")
+    state = SeriesStateTable.from_tail(tail)
+    promos_path = os.path.join(data_dir,"promos.csv")
+    promos = read_csv(promos_path) if os.path.exists(promos_path) else None
+
+    ref = (model.fallback or next(iter(model.shards.values()))) if isinstance(model, ShardedModel) else model
+    quantiles = sorted(ref.quantile_models or {})
+    with profiled("forecast", cfg.get("profile"), cfg.get("profile_dir", "artifacts/profiles")):
+        fc = forecast_horizon(model, state, horizon=horizon, promos=promos, quantiles=quantiles)
+    run_date = pd.Timestamp.now().strftime("%Y-%m-%d")
+    fc["run_date"] = run_date
+
+    # rerunning the same day replaces that day's partition
+    shutil.rmtree(os.path.join(out_dir, f"run_date={run_date}"), ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+    fc.to_parquet(out_dir, partition_cols=["run_date","Sales_Channel"], index=False)
+    print(f"Wrote {len(fc)} rows ({len(state)} series x {horizon} days) to {out_dir}/run_date={run_date}")
+    print(RECORDER.summary())
+    return fc
 
 if __name__ == "__main__":
     main()
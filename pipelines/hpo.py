@@ -1,53 +1,50 @@
-import os, joblib, pandas as pd, numpy as np, time
-from quantumflow_core import load_config, read_csv, prepare_features, select_and_train
-from sklearn.model_selection import ParameterSampler
-from scipy.stats import randint, uniform
-import optuna
+import os, json, pandas as pd, numpy as np, time
+from quantumflow_core import load_config, load_sales
+from quantumflow_core.feature_store import features_from_config
+from quantumflow_core.hpo import tune_segments
 
-def objective(trial, X, y):
-    params = {
-        'n_estimators': trial.suggest_int('n_estimators', 100, 1000),
-        'learning_rate': trial.suggest_loguniform('learning_rate', 0.01, 0.2),
-        'max_depth': trial.suggest_int('max_depth', 3, 12),
-        'subsample': trial.suggest_float('subsample', 0.6, 1.0),
-        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0)
-    }
-    import lightgbm as lgb
-    cv = 3
-    n = len(y)
-    fold = n // (cv+1)
-    rmses = []
-    for i in range(cv):
-        tr = slice(0, fold*(i+1))
-        va = slice(fold*(i+1), fold*(i+2))
-        m = lgb.LGBMRegressor(**params)
-        m.fit(X[tr], y[tr])
-        pred = m.predict(X[va])
-        from sklearn.metrics import mean_squared_error
-        rmses.append(mean_squared_error(y[va], pred, squared=False))
-    return float(sum(rmses)/len(rmses))
+def run_optuna(X, y, n_trials=30, n_jobs=None, storage=None):
+    """Best LightGBM params for one (X, y), rows in Date order."""
+    df = pd.DataFrame(X, columns=[f"f{i}" for i in range(X.shape[1])]).assign(_y=y)
+    res = tune_segments(df, target="_y", features=list(df.columns[:-1]), n_trials=n_trials, n_jobs=n_jobs,
+                        storage=storage, study_prefix=f"qf-hpo-{int(time.time())}", min_rows=0)
+    return res["ALL"]["best_params"]
 
-def run_optuna(X, y, n_trials=30):
-    study = optuna.create_study(direction="minimize")
-    study.optimize(lambda t: objective(t, X, y), n_trials=n_trials)
-    return study.best_params
-
-def main(cfg_path="configs/dev.yaml", sku_id=None):
+def main(cfg_path="configs/dev.yaml", sku_id=None, segment_by=None, n_trials=None):
     cfg = load_config(cfg_path)
     data_dir = cfg.get("data_dir","data")
-    sales = read_csv(os.path.join(data_dir,"sales.csv"))
+    cache_dir = cfg.get("ingest_cache_dir")
+    sales = load_sales(os.path.join(data_dir,"sales.csv"), parquet_path=os.path.join(cache_dir, "sales.parquet") if cache_dir else None,
+                       chunksize=cfg.get("ingest_chunk_rows", 500_000))
     if sku_id:
         sales = sales[sales['SKU_ID']==sku_id]
-    feats = prepare_features(sales)
-    X = feats.drop(columns=['Date','SKU_ID','Sales_Channel','Sales_Quantity']).values
-    y = feats['Sales_Quantity'].values
-    best = run_optuna(X, y, n_trials=20)
-    out = os.path.join('artifacts', f'hpo_{sku_id or "ALL"}.json')
+    # same enrichment as pipelines/train.py, so both can share the feature store
+    feats = features_from_config(sales, cfg)
+    if sku_id:
+        feats = feats[feats['SKU_ID']==sku_id].reset_index(drop=True)
+
+    # hpo_segment_by: e.g. [SKU_ID] or [Sales_Channel] tunes one study per segment in one run
+    segment_by = segment_by if segment_by is not None else cfg.get("hpo_segment_by")
+    if isinstance(segment_by, str):
+        segment_by = [segment_by]
+    storage = cfg.get("hpo_storage", "artifacts/hpo/optuna.journal")
+    results = tune_segments(feats, segment_cols=segment_by, n_trials=int(n_trials or cfg.get("hpo_trials", 20)),
+                            n_jobs=cfg.get("parallel_jobs"), storage=storage,
+                            study_prefix=f"qf-hpo-{sku_id}" if sku_id else "qf-hpo",
+                            min_rows=cfg.get("hpo_min_rows", 200))
+
     os.makedirs('artifacts', exist_ok=True)
-    with open(out,'w') as f:
-        import json
-        json.dump(best, f)
-    print('Wrote best params to', out)
+    for seg, r in results.items():
+        name = sku_id if sku_id and seg == "ALL" else seg
+        with open(os.path.join('artifacts', f'hpo_{name}.json'), 'w') as f:
+            json.dump(r["best_params"], f)
+    with open(os.path.join('artifacts', 'hpo_summary.json'), 'w') as f:
+        json.dump(results, f, indent=1)
+    for seg, r in results.items():
+        if r["resumed_trials"]:
+            print(f'  {seg}: resumed study {r["study"]} ({r["resumed_trials"]} earlier trials on the same data)')
+    print(f'Tuned {len(results)} segment(s); best params in artifacts/hpo_<segment>.json, summary in artifacts/hpo_summary.json')
+    return results
 
 if __name__ == '__main__':
     main()
@@ -1,50 +1,104 @@
-import pandas as pd, numpy as np, os, joblib, mlflow, time
+import pandas as pd, numpy as np, os, joblib, mlflow, time, argparse
 from pathlib import Path
-from quantumflow_core import load_config, read_csv, ensure_columns, prepare_features, select_and_train
+from quantumflow_core import load_config, read_csv, load_sales, ensure_columns, select_and_train
+from quantumflow_core.models import select_and_train_sharded
+from quantumflow_core.feature_store import features_from_config
+from quantumflow_core.artifacts import save_model
+from quantumflow_core.progress import write_progress
+from quantumflow_core.instrumentation import RECORDER, stage, profiled
 mlflow.set_tracking_uri(os.environ.get("MLFLOW_TRACKING_URI","file:./mlruns"))
 mlflow.set_experiment("quantumflow_forecasting")
 
-def main(cfg_path="configs/dev.yaml"):
+def main(cfg_path=None, model_dir="artifacts/model"):
+    # cfg_path None: QF_CONFIG, else configs/dev.yaml
     cfg = load_config(cfg_path)
+    RECORDER.reset()
+    with mlflow.start_run(run_name=f"train_{int(time.time())}"):
+        # profile: cprofile | sample | none (default)
+        with profiled("train", cfg.get("profile"), cfg.get("profile_dir", "artifacts/profiles")) as prof:
+            _train(cfg, model_dir)
+        # per-stage wall time / rows / peak RSS, so regressions show up run over run
+        mlflow.log_metrics(RECORDER.mlflow_metrics())
+        for f in ([prof, os.path.splitext(prof)[0] + ".txt"] if prof else []):
+            if os.path.exists(f):
+                mlflow.log_artifact(f, artifact_path="profile")
+        print(RECORDER.summary())
+
+def _train(cfg, model_dir):
+    write_progress("load_sales", 0.0)
     data_dir = cfg.get("data_dir","data")
     source = cfg.get("data_source","local")
     sales_path = os.path.join(data_dir,"sales.csv") if source=="local" else f"gs://{cfg['gcs_bucket']}/{cfg['gcs_prefix']}/sales.csv"
-    sales = read_csv(sales_path)
+    # typed, chunked load; the Parquet copy under ingest_cache_dir is reused while sales.csv is unchanged
+    cache_dir = cfg.get("ingest_cache_dir")
+    with stage("load_sales") as st:
+        sales = load_sales(sales_path, parquet_path=os.path.join(cache_dir, "sales.parquet") if cache_dir else None,
+                           chunksize=cfg.get("ingest_chunk_rows", 500_000))
+        st.rows = len(sales)
     ensure_columns(sales, ["Date","SKU_ID","Sales_Channel","Sales_Quantity"], "sales")
-    with mlflow.start_run(run_name=f"train_{int(time.time())}"):
-        from quantumflow_core.external_factors import batch_enrich_weather
-sku_map = os.path.join(data_dir, 'sku_locations.csv')
-if os.path.exists(sku_map):
-    print('Found SKU location map, running batch weather enrichment...')
-    sales = batch_enrich_weather(sales, sku_location_map_path=sku_map, cache_dir=os.path.join(data_dir,'weather_cache'))
-feats = prepare_features(sales, enrich_weather=False)
+    write_progress("features", 0.1)
+    # feature store, weather map, holiday country and feature_jobs from the config (shared with pipelines/hpo.py)
+    feats = features_from_config(sales, cfg)
 
-        model = select_and_train(feats)
-        mlflow.log_param("selected_model", model.name)
-        mlflow.log_param("features", ",".join(model.features))
-        out = Path("artifacts"); out.mkdir(parents=True, exist_ok=True)
-        joblib.dump(model, out/"model.joblib")
-        mlflow.log_artifact(str(out/"model.joblib"))
-        # Log feature importances if available
-        try:
-            import pandas as _pd
-            fi = None
-            if hasattr(model, 'model') and hasattr(model.model, 'feature_importances_'):
-                # TrainedModel wrapper case
-                fi = model.model.feature_importances_
-                names = model.features
-            elif hasattr(model, 'feature_importances_'):
-                fi = model.feature_importances_
-                names = model.features if 'model' not in locals() else model.features
-            if fi is not None:
-                fi_df = _pd.DataFrame({'feature': names, 'importance': fi})
-                fi_path = out / 'feature_importances.csv'
-                fi_df.to_csv(fi_path, index=False)
-                mlflow.log_artifact(str(fi_path))
-        except Exception:
-            pass
-        
-        print("Saved model to artifacts/model.joblib")
+    n_jobs = cfg.get("parallel_jobs")
+    write_progress("train", 0.3, rows=int(len(feats)))
+    t0 = time.perf_counter()
+    shard_by = cfg.get("shard_by")
+    if shard_by:
+        # optional SKU -> segment map (e.g. SKU_ID,Cluster) for keys not in the sales data
+        key_map = None
+        if cfg.get("shard_map"):
+            key_map = read_csv(os.path.join(data_dir, cfg["shard_map"])).astype(str)
+            feats = feats.merge(key_map, on="SKU_ID", how="left")
+        model = select_and_train_sharded(feats, shard_by, n_jobs=n_jobs, min_rows=cfg.get("shard_min_rows", 200),
+                                         key_map=key_map)
+    else:
+        model = select_and_train(feats, n_jobs=n_jobs)
+    mlflow.log_metric("train_wall_seconds", time.perf_counter() - t0)
+    mlflow.log_param("parallel_jobs", n_jobs)
+    mlflow.log_param("selected_model", model.name)
+    if shard_by:
+        mlflow.log_param("shard_by", shard_by)
+        mlflow.log_metric("n_shards", len(model.shards))
+    elif model.fit_times:
+        # per-fit wall time; fit_seconds_total / train_wall_seconds ~ effective parallel speedup
+        mlflow.log_metric("fit_seconds_total", sum(t["seconds"] for t in model.fit_times))
+        mlflow.log_dict({"fits": model.fit_times}, "fit_times.json")
+    mlflow.log_param("features", ",".join(model.features))
+    write_progress("save", 0.9)
+    # pickle and importances go next to the model dir (artifacts/ by default; per config for API jobs)
+    out = Path(model_dir).parent; out.mkdir(parents=True, exist_ok=True)
+    # native boosters + manifest (what the API loads); the pickle is kept for older consumers
+    with stage("save_model"):
+        save_model(model, model_dir)
+    mlflow.log_artifacts(model_dir, artifact_path="model")
+    joblib.dump(model, out/"model.joblib")
+    mlflow.log_artifact(str(out/"model.joblib"))
+    # Log feature importances if available
+    try:
+        import pandas as _pd
+        fi = None
+        if hasattr(model, 'model') and hasattr(model.model, 'feature_importances_'):
+            # TrainedModel wrapper case
+            fi = model.model.feature_importances_
+            names = model.features
+        elif hasattr(model, 'feature_importances_'):
+            fi = model.feature_importances_
+            names = model.features if 'model' not in locals() else model.features
+        if fi is not None:
+            fi_df = _pd.DataFrame({'feature': names, 'importance': fi})
+            fi_path = out / 'feature_importances.csv'
+            fi_df.to_csv(fi_path, index=False)
+            mlflow.log_artifact(str(fi_path))
+    except Exception:
+        pass
+    
+    print(f"Saved model to {model_dir}/ and {out/'model.joblib'}")
+    write_progress("done", 1.0)
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cfg", default=None, help="config YAML (default: QF_CONFIG or configs/dev.yaml)")
+    ap.add_argument("--model-dir", default="artifacts/model")
+    args = ap.parse_args()
+    main(args.cfg, args.model_dir)
@@ -4,4 +4,5 @@ from .models import *
 from .inventory import *
 from .evaluation import *
 from .io import *
+from .validation import *
 from .config import load_config
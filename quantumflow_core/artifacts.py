@@ -0,0 +1,217 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import uuid
+from collections.abc import Mapping
+import joblib
+import pandas as pd
+from .models import TrainedModel, ShardedModel, _slug
+
+try:
+    import lightgbm as lgb
+    HAS_LGB = True
+except Exception:
+    HAS_LGB = False
+
+try:
+    import xgboost as xgb
+    HAS_XGB = True
+except Exception:
+    HAS_XGB = False
+
+MANIFEST = "manifest.json"
+FORMAT = "qf-native/1"
+
+class LGBMBoosterModel:
+    """Predict-only LightGBM model loaded from its text dump (no sklearn wrapper)."""
+
+    def __init__(self, path):
+        if not HAS_LGB:
+            raise RuntimeError("LightGBM not installed in environment")
+        self.booster = lgb.Booster(model_file=path)
+
+    def predict(self, X):
+        return self.booster.predict(X)
+
+    @property
+    def feature_importances_(self):
+        return self.booster.feature_importance()
+
+def _save_booster(name, model, base):
+    if name == "lgbm":
+        booster = model.booster_ if hasattr(model, "booster_") else getattr(model, "booster", model)
+        booster.save_model(base + ".txt")
+        return base + ".txt"
+    model.save_model(base + ".ubj")
+    return base + ".ubj"
+
+def _load_booster(name, path):
+    if name == "lgbm":
+        return LGBMBoosterModel(path)
+    if not HAS_XGB:
+        raise RuntimeError("XGBoost not installed in environment")
+    m = xgb.XGBRegressor()
+    m.load_model(path)
+    return m
+
+class LazyModels(Mapping):
+    """quantile -> model mapping that loads each booster file on first access."""
+
+    def __init__(self, name, paths):
+        self.name = name
+        self.paths = dict(paths)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, q):
+        m = self._loaded.get(q)
+        if m is None:
+            path = self.paths[q]
+            with self._lock:
+                m = self._loaded.get(q)
+                if m is None:
+                    m = self._loaded[q] = _load_booster(self.name, path)
+        return m
+
+    def __contains__(self, q):
+        return q in self.paths
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def loaded(self):
+        return sorted(self._loaded)
+
+    def __getstate__(self):
+        d = dict(self.__dict__)
+        d.pop("_lock")
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._lock = threading.Lock()
+
+def _write_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+def _save_trained(m: TrainedModel, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    base = _save_booster(m.name, m.model, os.path.join(out_dir, "model"))
+    quantiles = {}
+    for q, qm in (m.quantile_models or {}).items():
+        quantiles[str(q)] = os.path.basename(_save_booster(m.name, qm, os.path.join(out_dir, f"quantile_{q}")))
+    _write_manifest(out_dir, dict(format=FORMAT, kind="trained", name=m.name, features=list(m.features),
+                                  model=os.path.basename(base), quantiles=quantiles, fit_times=m.fit_times))
+
+def save_model(model, out_dir: str) -> str:
+    """Write `model` as native booster files plus manifest.json; returns the manifest path.
+
+    TrainedModel: model.txt (LightGBM) or model.ubj (XGBoost) and one file per
+    quantile model. ShardedModel: one such directory per shard under shards/,
+    plus fallback/ and key_map.csv. `out_dir` is a symlink to the new version,
+    swapped atomically (see `_replace_dir`).
+    """
+    tmp = f"{out_dir.rstrip('/')}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        _write_artifact(model, tmp)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    _replace_dir(tmp, out_dir)
+    return os.path.join(out_dir, MANIFEST)
+
+def _write_artifact(model, tmp):
+    if not isinstance(model, ShardedModel):
+        _save_trained(model, tmp)
+        return
+    os.makedirs(tmp)
+    entries = []
+    for key, m in model.shards.items():
+        rel = os.path.join("shards", _slug(key))
+        _save_trained(m, os.path.join(tmp, rel))
+        entries.append(dict(key=[str(k) for k in key], path=rel))
+    manifest = dict(format=FORMAT, kind="sharded", key_cols=model.key_cols, shards=entries, fallback=None, key_map=None)
+    if model.fallback is not None:
+        _save_trained(model.fallback, os.path.join(tmp, "fallback"))
+        manifest["fallback"] = "fallback"
+    if model.key_map is not None:
+        model.key_map.to_csv(os.path.join(tmp, "key_map.csv"), index=False)
+        manifest["key_map"] = "key_map.csv"
+    _write_manifest(tmp, manifest)
+
+def copy_model(src: str, out_dir: str) -> str:
+    """Copy the artifact directory `src` to `out_dir`, swapped in like `save_model`; returns the manifest path."""
+    if not os.path.exists(os.path.join(src, MANIFEST)):
+        raise ValueError(f"No model artifact at {src}")
+    tmp = f"{out_dir.rstrip('/')}.{uuid.uuid4().hex[:8]}.tmp"
+    shutil.copytree(src, tmp)
+    _replace_dir(tmp, out_dir)
+    return os.path.join(out_dir, MANIFEST)
+
+def _replace_dir(tmp, out_dir):
+    # `out_dir` is a symlink to a versioned sibling directory and is swapped with one
+    # rename, so the path always exists. The previous version stays for models
+    # still reading quantile boosters from it; older versions are removed.
+    base = out_dir.rstrip("/")
+    parent, name = os.path.split(base)
+    version = f"{name}.v-{pd.Timestamp.now(tz='UTC'):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    os.replace(tmp, os.path.join(parent, version))
+    prev = os.path.basename(os.path.realpath(base)) if os.path.islink(base) else None
+    if os.path.isdir(base) and not os.path.islink(base):
+        # a plain directory from before versioned artifacts is moved aside once
+        prev = f"{name}.v-legacy-{uuid.uuid4().hex[:8]}"
+        os.replace(base, os.path.join(parent, prev))
+    link = f"{base}.{uuid.uuid4().hex[:8]}.link"
+    os.symlink(version, link)
+    os.replace(link, base)
+    for d in os.listdir(parent or "."):
+        if d.startswith(f"{name}.v-") and d not in (version, prev):
+            shutil.rmtree(os.path.join(parent, d), ignore_errors=True)
+
+def _load_trained(d, lazy=True):
+    with open(os.path.join(d, MANIFEST), "r", encoding="utf-8") as f:
+        m = json.load(f)
+    quantiles = LazyModels(m["name"], {float(q): os.path.join(d, p) for q, p in m["quantiles"].items()})
+    if not lazy:
+        quantiles = {q: quantiles[q] for q in quantiles}
+    return TrainedModel(name=m["name"], model=_load_booster(m["name"], os.path.join(d, m["model"])),
+                        features=m["features"], quantile_models=quantiles or None, fit_times=m.get("fit_times"))
+
+def load_model(path: str, lazy: bool = True):
+    """Load a model artifact: a save_model directory (native boosters) or a joblib pickle.
+
+    Quantile boosters of native artifacts are read on first use unless `lazy` is False.
+    """
+    if os.path.isdir(path):
+        # the version the live symlink points to now: lazy reads never mix in a later swap
+        path = os.path.realpath(path)
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("kind") != "sharded":
+            return _load_trained(path, lazy)
+        shards = {tuple(e["key"]): _load_trained(os.path.join(path, e["path"]), lazy) for e in manifest["shards"]}
+        fb = _load_trained(os.path.join(path, manifest["fallback"]), lazy) if manifest.get("fallback") else None
+        km = pd.read_csv(os.path.join(path, manifest["key_map"]), dtype=str) if manifest.get("key_map") else None
+        return ShardedModel(key_cols=manifest["key_cols"], shards=shards, fallback=fb, key_map=km)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return joblib.load(path)
+
+def artifact_digest(path: str) -> str:
+    """sha256 over the file names and bytes of an artifact directory (or a single file)."""
+    h = hashlib.sha256()
+    files = [path] if not os.path.isdir(path) else sorted(
+        os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+    for fp in files:
+        h.update(os.path.relpath(fp, path).encode())
+        with open(fp, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
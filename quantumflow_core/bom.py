@@ -0,0 +1,117 @@
+from dataclasses import dataclass, field
+from typing import List
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from .validation import BOM_VALIDATOR
+
+@dataclass
+class BOMGraph:
+    """Multi-level bill of materials as a sparse usage matrix.
+
+    Node ids are positions in `skus`; `usage[p, c]` is the Qty_Per of component
+    c in one unit of parent p (duplicate edges summed). `level` is the low-level
+    code: the longest chain of parents above a node, 0 for end items, so every
+    parent has a lower level than its components.
+    """
+    skus: pd.Index
+    usage: sp.csr_matrix
+    level: np.ndarray
+    _steps: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_frame(cls, bom: pd.DataFrame) -> "BOMGraph":
+        """Build from Parent_SKU, Component_SKU, Qty_Per rows; raises ValueError on cycles."""
+        BOM_VALIDATOR.validate(bom).raise_for_errors()
+        parent = bom["Parent_SKU"].astype(str).to_numpy()
+        comp = bom["Component_SKU"].astype(str).to_numpy()
+        if (parent == comp).any():
+            raise ValueError(f"BOM lists SKUs as their own component: {sorted(set(parent[parent == comp]))[:10]}")
+        codes, skus = pd.factorize(np.concatenate([parent, comp]))
+        n, m = len(skus), len(bom)
+        usage = sp.csr_matrix((bom["Qty_Per"].to_numpy(dtype=np.float64), (codes[:m], codes[m:])), shape=(n, n))
+        usage.sum_duplicates()
+        return cls(pd.Index(skus, name="SKU_ID"), usage, _levels(usage, skus))
+
+    @property
+    def depth(self) -> int:
+        return int(self.level.max()) + 1 if len(self.level) else 0
+
+    def _plan(self, square: bool) -> List[tuple]:
+        # per level: (parents with components, their usage rows transposed), built once
+        if square not in self._steps:
+            A = self.usage.multiply(self.usage).tocsr() if square else self.usage
+            has_children = np.diff(A.indptr) > 0
+            steps = []
+            for d in range(self.depth - 1):
+                rows = np.flatnonzero((self.level == d) & has_children)
+                if len(rows):
+                    steps.append((rows, A[rows].T.tocsr()))
+            self._steps[square] = steps
+        return self._steps[square]
+
+    def explode(self, demand, square: bool = False) -> np.ndarray:
+        """Gross requirement per node: its own demand plus Qty_Per x each parent's gross requirement.
+
+        `demand` is (n,) or (n, k) in `skus` order (k columns, e.g. forecast days,
+        are exploded together). Levels are processed top-down, so every edge is
+        used once. `square=True` propagates variances (Qty_Per squared).
+        """
+        total = np.array(demand, dtype=np.float64)
+        if total.shape[0] != len(self.skus):
+            raise ValueError(f"demand has {total.shape[0]} rows, BOM has {len(self.skus)} SKUs")
+        for rows, usage_t in self._plan(square):
+            total += usage_t @ total[rows]
+        return total
+
+def _levels(usage: sp.csr_matrix, skus) -> np.ndarray:
+    # Kahn's algorithm one frontier at a time; a node's level is the pass in which its last parent is done
+    adj = usage.copy()
+    adj.data[:] = 1.0
+    indeg = np.asarray(adj.sum(0)).ravel()
+    level = np.full(len(skus), -1, dtype=np.int32)
+    frontier = np.flatnonzero(indeg == 0)
+    d = 0
+    while len(frontier):
+        level[frontier] = d
+        indeg -= np.asarray(adj[frontier].sum(0)).ravel()
+        frontier = np.flatnonzero((indeg == 0) & (level < 0))
+        d += 1
+    left = np.flatnonzero(level < 0)
+    if len(left):
+        # what is left sits on or below a cycle; report the strongly connected nodes
+        _, comp = connected_components(adj[left][:, left], directed=True, connection="strong")
+        on_cycle = left[np.bincount(comp)[comp] > 1]
+        raise ValueError(f"BOM has cycles through {len(on_cycle)} SKUs, e.g. {list(np.asarray(skus)[on_cycle][:10])}")
+    return level
+
+def load_bom(path: str) -> BOMGraph:
+    return BOMGraph.from_frame(pd.read_csv(path, dtype={"Parent_SKU": str, "Component_SKU": str}))
+
+def explode_demand(bom: BOMGraph, demand: pd.DataFrame) -> pd.DataFrame:
+    """Component-level demand for `plan_orders_frame`, one row per SKU in `demand` or the BOM.
+
+    `demand` has SKU_ID, daily_mean_demand, daily_std_demand (independent demand,
+    summed over channels). Means explode linearly; standard deviations are
+    propagated as variances assuming independent parent demands. Other columns
+    of `demand` (e.g. on_hand) are carried over, NaN for components it does not
+    list. `independent_mean_demand` is the SKU's own demand, `bom_level` its
+    low-level code (0 for SKUs outside the BOM).
+    """
+    d = pd.DataFrame({"mean": demand["daily_mean_demand"].to_numpy(dtype=np.float64),
+                      "var": demand["daily_std_demand"].to_numpy(dtype=np.float64) ** 2},
+                     index=demand["SKU_ID"].astype(str).to_numpy()).groupby(level=0, sort=False).sum()
+    skus = bom.skus.append(d.index.difference(bom.skus))
+    own = d.reindex(skus).fillna(0.0)
+    n = len(bom.skus)
+    mean, var = own["mean"].to_numpy(dtype=np.float64, copy=True), own["var"].to_numpy(dtype=np.float64, copy=True)
+    mean[:n] = bom.explode(mean[:n])
+    var[:n] = bom.explode(var[:n], square=True)
+    out = pd.DataFrame({"SKU_ID": skus, "daily_mean_demand": mean, "daily_std_demand": np.sqrt(var),
+                        "independent_mean_demand": own["mean"].to_numpy(),
+                        "bom_level": np.concatenate([bom.level, np.zeros(len(skus) - n, dtype=np.int32)])})
+    extra = [c for c in demand.columns if c not in ("SKU_ID", "daily_mean_demand", "daily_std_demand")]
+    if extra:
+        out = out.merge(demand.drop_duplicates("SKU_ID")[["SKU_ID"] + extra], on="SKU_ID", how="left")
+    return out
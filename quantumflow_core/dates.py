@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+_EPOCH_THURSDAY = 3  # 1970-01-01 was a Thursday (Monday=0)
+_MAX_SPAN = 1_000_000  # widest dense day table (~2700 years); sparser dates fall back to np.unique
+
+def to_days(dates) -> np.ndarray:
+    """Dates (str / datetime-like) -> int64 days since 1970-01-01."""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+def day_numbers(dates) -> np.ndarray:
+    """int32 days since 1970-01-01 for a Date column or array.
+
+    datetime64 values are converted arithmetically; strings, Python dates and
+    categoricals are parsed once per distinct value. Integers are taken to be
+    day numbers already. Missing dates raise ValueError.
+    """
+    if isinstance(dates, pd.Series) and isinstance(dates.dtype, pd.CategoricalDtype):
+        codes = dates.cat.codes.to_numpy()
+        if (codes < 0).any():
+            raise ValueError("Date has missing values")
+        return day_numbers(dates.cat.categories)[codes]
+    arr = dates.to_numpy() if isinstance(dates, (pd.Series, pd.Index)) else np.asarray(dates)
+    if arr.dtype.kind == "M":
+        days = arr.astype("datetime64[D]").view(np.int64)
+        missing = np.isnat(arr)
+    elif arr.dtype.kind in "iu":
+        days, missing = arr.astype(np.int64), np.zeros(len(arr), dtype=bool)
+    else:
+        codes, uniq = pd.factorize(arr)
+        parsed = pd.to_datetime(pd.Index(uniq)).values.astype("datetime64[D]")
+        days = parsed.view(np.int64)[codes]
+        missing = (codes < 0) | np.isnat(parsed)[codes]
+    if missing.any():
+        raise ValueError("Date has missing values")
+    return days.astype(np.int32)
+
+def day_index(days: np.ndarray):
+    """(table_days, idx) with table_days[idx] == days.
+
+    Per-date values are computed once over `table_days` and broadcast back with
+    `values[idx]`. The table is the dense range min..max (idx is an offset, no
+    sort) unless the dates are spread over more than `_MAX_SPAN` days.
+    """
+    days = np.asarray(days)
+    if not len(days):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    lo, hi = int(days.min()), int(days.max())
+    if hi - lo < _MAX_SPAN:
+        return np.arange(lo, hi + 1, dtype=np.int32), (days - lo).astype(np.int32)
+    table, idx = np.unique(days, return_inverse=True)
+    return table.astype(np.int32), idx.astype(np.int32)
+
+def calendar_arrays(days: np.ndarray) -> dict:
+    """dayofweek / ISO weekofyear / month / quarter for day numbers, without pandas."""
+    days = np.asarray(days, dtype=np.int64)
+    dow = (days + _EPOCH_THURSDAY) % 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    month = months % 12 + 1
+    # ISO week: week of the Thursday in the same Monday-based week
+    thursday = days - dow + 3
+    iso_year_start = thursday.astype("datetime64[D]").astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    week = (thursday - iso_year_start) // 7 + 1
+    return {"dayofweek": dow, "weekofyear": week, "month": month, "quarter": (month - 1) // 3 + 1}
+
+# dtypes of the pandas .dt accessors the calendar columns were first built with
+CALENDAR_DTYPES = {"dayofweek": np.int32, "weekofyear": np.int64, "month": np.int32, "quarter": np.int32}
+
+def calendar_columns(days: np.ndarray) -> dict:
+    """Calendar feature columns for every row of `days`, computed once per distinct date."""
+    table, idx = day_index(days)
+    cols = calendar_arrays(table)
+    return {k: cols[k].astype(t)[idx] for k, t in CALENDAR_DTYPES.items()}
+
+def day_strings(days) -> list:
+    return [str(d) for d in np.asarray(days, dtype=np.int64).astype("datetime64[D]")]
@@ -0,0 +1,255 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from .io import open_source
+
+try:
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except Exception:
+    HAS_ARROW = False
+
+REFERENCE, CURRENT = 0, 1
+STATE_ARRAYS = ("counts", "nan", "n", "mean", "m2")
+_ID_COLS = ("Date", "SKU_ID", "Sales_Channel", "lat", "lon", "country")
+
+def iter_frames(path: str, chunksize: int = 500_000, columns=None):
+    """DataFrames of at most `chunksize` rows from a Parquet file or CSV (local or gs://)."""
+    if str(path).endswith(".parquet") and HAS_ARROW:
+        pf = pq.ParquetFile(path)
+        cols = [c for c in columns if c in pf.schema_arrow.names] if columns is not None else None
+        for batch in pf.iter_batches(batch_size=chunksize, columns=cols):
+            yield batch.to_pandas()
+        return
+    if str(path).endswith(".parquet"):
+        yield pd.read_parquet(path, columns=columns)
+        return
+    usecols = (lambda c: c in set(columns)) if columns is not None else None
+    yield from pd.read_csv(open_source(path), chunksize=chunksize, usecols=usecols)
+
+def reservoir_sample(frames, n: int, seed: int = 0) -> pd.DataFrame:
+    """Uniform sample of at most `n` rows from a stream of frames (one random key per row)."""
+    rng = np.random.default_rng(seed)
+    keep = None
+    for df in frames:
+        if not len(df):
+            continue
+        df = df.assign(_key=rng.random(len(df)))
+        keep = df if keep is None else pd.concat([keep, df], ignore_index=True)
+        if len(keep) > n:
+            keep = keep.nsmallest(n, "_key")
+    return keep.drop(columns="_key").reset_index(drop=True) if keep is not None else pd.DataFrame()
+
+def psi_from_counts(ref: np.ndarray, cur: np.ndarray, floor: float = 1e-4) -> np.ndarray:
+    """Population stability index over the last axis (bin counts); empty bins are floored."""
+    p = np.maximum(ref / np.maximum(ref.sum(-1, keepdims=True), 1), floor)
+    q = np.maximum(cur / np.maximum(cur.sum(-1, keepdims=True), 1), floor)
+    return ((q - p) * np.log(q / p)).sum(-1)
+
+def ks_from_counts(ref: np.ndarray, cur: np.ndarray) -> np.ndarray:
+    """Largest CDF gap at the bin edges: the two-sample KS statistic, up to binning."""
+    p = np.cumsum(ref, -1) / np.maximum(ref.sum(-1, keepdims=True), 1)
+    q = np.cumsum(cur, -1) / np.maximum(cur.sum(-1, keepdims=True), 1)
+    return np.abs(p - q).max(-1)
+
+def numeric_features(df: pd.DataFrame) -> list:
+    return [c for c in df.columns if c not in _ID_COLS and pd.api.types.is_numeric_dtype(df[c])]
+
+def _later(a, b):
+    # the later of two ISO dates, either may be None
+    return b if a is None or (b is not None and b > a) else a
+
+class DriftMonitor:
+    """Mergeable per-segment, per-feature sketches of a reference and a current window.
+
+    Each (window, segment, feature) keeps a histogram over fixed bin edges
+    (quantiles of a reference sample, plus under/overflow bins), a NaN count
+    and count/mean/M2 moments, all updated chunk by chunk. Rows enter the
+    current window only if their Date is past `watermark`, so re-reading a
+    growing file ingests just the new days. PSI, KS and the standardized mean
+    shift are computed from the sketches alone.
+    """
+
+    def __init__(self, features, segment_by, edges, segments=None, reference_end=None, watermark=None, arrays=None,
+                 fit_end=None):
+        self.features = list(features)
+        self.segment_by = list(segment_by or [])
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.n_bins = max(len(e) for e in self.edges) + 1
+        self.segments = [tuple(s) for s in (segments or [])]
+        self._index = {s: i for i, s in enumerate(self.segments)}
+        self.reference_end = reference_end
+        self.watermark = watermark
+        # last Date of the stream the reference was fitted on; later reference days come from rebases
+        self.fit_end = fit_end
+        S, F, B = len(self.segments), len(self.features), self.n_bins
+        if arrays is None:
+            arrays = dict(counts=np.zeros((2, S, F, B), np.int64), nan=np.zeros((2, S, F), np.int64),
+                          n=np.zeros((2, S, F), np.int64), mean=np.zeros((2, S, F)), m2=np.zeros((2, S, F)))
+        for k in STATE_ARRAYS:
+            setattr(self, k, arrays[k])
+
+    @classmethod
+    def fit(cls, frames, features=None, segment_by=None, bins: int = 20, sample_rows: int = 200_000, seed: int = 0):
+        """Bin edges from a sample of the reference stream; `frames` is a zero-arg callable giving that stream.
+
+        The stream is read twice (sample, then sketches); the reference ends at its last Date.
+        """
+        sample = reservoir_sample(frames(), sample_rows, seed)
+        features = list(features or numeric_features(sample))
+        qs = np.linspace(0, 1, bins + 1)
+        edges = []
+        for f in features:
+            x = pd.to_numeric(sample[f], errors="coerce").to_numpy(np.float64) if f in sample else np.array([])
+            x = x[~np.isnan(x)]
+            edges.append(np.unique(np.quantile(x, qs)) if len(x) else np.array([0.0]))
+        mon = cls(features, segment_by, edges)
+        last = None
+        for df in frames():
+            last = _later(last, mon._ingest(REFERENCE, df))
+        mon.reference_end = mon.watermark = mon.fit_end = last
+        return mon
+
+    def _codes(self, df):
+        # segment index per row; unseen segments get new rows in every state array
+        if not self.segment_by:
+            keys, inv = [("ALL",)], np.zeros(len(df), dtype=np.int64)
+        else:
+            codes, uniques = pd.MultiIndex.from_frame(df[self.segment_by].astype(str)).factorize()
+            keys, inv = [tuple(u) for u in uniques], codes
+        new = [k for k in keys if k not in self._index]
+        if new:
+            for k in new:
+                self._index[k] = len(self.segments)
+                self.segments.append(k)
+            for name in STATE_ARRAYS:
+                a = getattr(self, name)
+                pad = [(0, 0)] * a.ndim
+                pad[1] = (0, len(new))
+                setattr(self, name, np.pad(a, pad))
+        return np.array([self._index[k] for k in keys], dtype=np.int64)[inv]
+
+    def _ingest(self, w, df, since=None):
+        # sketch the rows of `df` dated after `since`; returns their last Date
+        if not len(df):
+            return None
+        dates = pd.to_datetime(df["Date"]) if "Date" in df else None
+        if dates is not None and since is not None:
+            keep = (dates > pd.Timestamp(since)).to_numpy()
+            df, dates = df[keep], dates[keep]
+            if not len(df):
+                return None
+        codes = self._codes(df)
+        S, B = len(self.segments), self.n_bins
+        for j, f in enumerate(self.features):
+            x = pd.to_numeric(df[f], errors="coerce").to_numpy(np.float64) if f in df else np.full(len(df), np.nan)
+            miss = np.isnan(x)
+            c, x = codes[~miss], x[~miss]
+            self.nan[w, :, j] += np.bincount(codes[miss], minlength=S)
+            b = np.searchsorted(self.edges[j], x, side="right")
+            self.counts[w, :, j, :] += np.bincount(c * B + b, minlength=S * B).reshape(S, B)
+            # chunk moments, merged into the running ones (Chan et al.)
+            nb = np.bincount(c, minlength=S)
+            mb = np.bincount(c, weights=x, minlength=S) / np.maximum(nb, 1)
+            m2b = np.bincount(c, weights=(x - mb[c]) ** 2, minlength=S)
+            na, ma = self.n[w, :, j], self.mean[w, :, j]
+            n = na + nb
+            delta = mb - ma
+            safe = np.maximum(n, 1)
+            self.mean[w, :, j] = ma + delta * nb / safe
+            self.m2[w, :, j] += m2b + delta ** 2 * na * nb / safe
+            self.n[w, :, j] = n
+        return dates.max().strftime("%Y-%m-%d") if dates is not None else None
+
+    def update(self, frames) -> int:
+        """Add rows newer than `watermark` from `frames` to the current window; returns rows seen.
+
+        The watermark moves only after the whole stream is read, so frames need not be date-ordered.
+        """
+        rows, last = 0, None
+        for df in frames:
+            rows += len(df)
+            last = _later(last, self._ingest(CURRENT, df, since=self.watermark))
+        self.watermark = _later(self.watermark, last)
+        return rows
+
+    def rebase(self):
+        """Fold the current window into the reference (e.g. after retraining) and start a new one."""
+        for j in range(len(self.features)):
+            na, nb = self.n[REFERENCE, :, j], self.n[CURRENT, :, j]
+            n = na + nb
+            delta = self.mean[CURRENT, :, j] - self.mean[REFERENCE, :, j]
+            safe = np.maximum(n, 1)
+            self.m2[REFERENCE, :, j] += self.m2[CURRENT, :, j] + delta ** 2 * na * nb / safe
+            self.mean[REFERENCE, :, j] += delta * nb / safe
+            self.n[REFERENCE, :, j] = n
+        self.counts[REFERENCE] += self.counts[CURRENT]
+        self.nan[REFERENCE] += self.nan[CURRENT]
+        for name in STATE_ARRAYS:
+            getattr(self, name)[CURRENT] = 0
+        self.reference_end = self.watermark
+
+    def _score(self, counts, nan, n, mean, m2):
+        var_ref = m2[REFERENCE] / np.maximum(n[REFERENCE] - 1, 1)
+        total = n + nan
+        return dict(n_ref=total[REFERENCE], n_cur=total[CURRENT],
+                    psi=psi_from_counts(counts[REFERENCE], counts[CURRENT]),
+                    ks=ks_from_counts(counts[REFERENCE], counts[CURRENT]),
+                    mean_ref=mean[REFERENCE], mean_cur=mean[CURRENT],
+                    std_shift=(mean[CURRENT] - mean[REFERENCE]) / np.sqrt(np.maximum(var_ref, 1e-12)),
+                    nan_ref=nan[REFERENCE] / np.maximum(total[REFERENCE], 1),
+                    nan_cur=nan[CURRENT] / np.maximum(total[CURRENT], 1))
+
+    def scores(self, psi_threshold: float = 0.2, ks_threshold: float = 0.1, min_rows: int = 200) -> pd.DataFrame:
+        """One row per (segment, feature), plus segment ALL pooling every segment.
+
+        `drifted` when both windows have `min_rows` rows and PSI or KS crosses its threshold.
+        """
+        S, F = len(self.segments), len(self.features)
+        parts = [self._score(self.counts, self.nan, self.n, self.mean, self.m2)]
+        seg_keys = list(self.segments)
+        if self.segment_by and S > 1:
+            # pooled moments: total n, weighted mean, M2 with between-segment spread
+            n = self.n.sum(1)
+            mean = (self.n * self.mean).sum(1) / np.maximum(n, 1)
+            m2 = (self.m2 + self.n * (self.mean - mean[:, None, :]) ** 2).sum(1)
+            parts.append(self._score(self.counts.sum(1)[:, None], self.nan.sum(1)[:, None],
+                                     n[:, None], mean[:, None], m2[:, None]))
+            seg_keys.append(("ALL",) * len(self.segment_by))
+        cols = {k: np.concatenate([p[k].reshape(-1) for p in parts]) for k in parts[0]}
+        out = pd.DataFrame(np.repeat(np.array(seg_keys, dtype=object), F, axis=0),
+                           columns=self.segment_by or ["segment"])
+        out["feature"] = np.tile(self.features, len(seg_keys))
+        for k, v in cols.items():
+            out[k] = v
+        enough = (out["n_ref"] >= min_rows) & (out["n_cur"] >= min_rows)
+        out["drifted"] = enough & ((out["psi"] >= psi_threshold) | (out["ks"] >= ks_threshold))
+        return out
+
+    def save(self, path: str):
+        """Arrays to sketch.npz and metadata to sketch.json under `path` (each written atomically)."""
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, "sketch.tmp.npz")
+        np.savez(tmp, **{k: getattr(self, k) for k in STATE_ARRAYS},
+                 **{f"edges_{j}": e for j, e in enumerate(self.edges)})
+        os.replace(tmp, os.path.join(path, "sketch.npz"))
+        meta = dict(features=self.features, segment_by=self.segment_by, segments=[list(s) for s in self.segments],
+                    reference_end=self.reference_end, watermark=self.watermark, fit_end=self.fit_end)
+        with open(os.path.join(path, "sketch.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(os.path.join(path, "sketch.json.tmp"), os.path.join(path, "sketch.json"))
+
+    @classmethod
+    def load(cls, path: str):
+        with open(os.path.join(path, "sketch.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(os.path.join(path, "sketch.npz")) as z:
+            arrays = {k: z[k] for k in STATE_ARRAYS}
+            edges = [z[f"edges_{j}"] for j in range(len(meta["features"]))]
+        return cls(meta["features"], meta["segment_by"], edges, meta["segments"], meta["reference_end"],
+                   meta["watermark"], arrays, meta.get("fit_end"))
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "sketch.json"))
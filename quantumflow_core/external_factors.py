@@ -1,24 +1,31 @@
 import os
+import numpy as np
 import pandas as pd
 import requests
 from datetime import datetime
 import holidays as hols
 from cachetools import cached, TTLCache
+from functools import lru_cache
+from .instrumentation import timed
+from .dates import day_numbers, day_index, day_strings
 
 # cache for in-memory short-term calls (not persistent)
 mem_cache = TTLCache(maxsize=1024, ttl=3600)
 
 def date_range_for_df(df, date_col="Date"):
-    d = pd.to_datetime(df[date_col])
-    return d.min().strftime("%Y-%m-%d"), d.max().strftime("%Y-%m-%d")
+    days = day_numbers(df[date_col])
+    return tuple(day_strings([days.min(), days.max()]))
 
-def _open_meteo_fetch(lat, lon, start_date, end_date, timezone="auto"):
-    # Use Open-Meteo historical archive API
-    base = "https://archive-api.open-meteo.com/v1/archive"
+# Open-Meteo historical archive API; QF_OPEN_METEO_URL (read per call) points at a mirror or a local stand-in
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+WEATHER_COLS = ["temp_max", "temp_min", "precip_mm", "weathercode"]
+
+def _open_meteo_fetch(lat, lon, start_date, end_date, timezone="auto", session=None):
     params = dict(latitude=lat, longitude=lon, start_date=start_date, end_date=end_date,
                   daily="temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode",
                   timezone=timezone)
-    resp = requests.get(base, params=params, timeout=30)
+    url = os.environ.get("QF_OPEN_METEO_URL") or OPEN_METEO_ARCHIVE_URL
+    resp = (session or requests).get(url, params=params, timeout=30)
     resp.raise_for_status()
     return resp.json()
 
@@ -34,111 +41,163 @@ def parse_open_meteo(json_payload):
     })
     return df
 
-def fetch_weather_for_location(lat, lon, start_date, end_date, cache_path=None, timezone="auto"):
-    # cache_path: optional local parquet path to persist fetched weather
-    if cache_path and os.path.exists(cache_path):
-        try:
-            w = pd.read_parquet(cache_path)
-            # If cache covers requested range, return subset
-            wmin = w['Date'].min().date().strftime("%Y-%m-%d")
-            wmax = w['Date'].max().date().strftime("%Y-%m-%d")
-            if wmin <= start_date and wmax >= end_date:
-                return w[(w['Date'] >= start_date) & (w['Date'] <= end_date)].reset_index(drop=True)
-        except Exception:
-            pass
-    payload = _open_meteo_fetch(lat, lon, start_date, end_date, timezone=timezone)
-    df = parse_open_meteo(payload)
-    if cache_path:
-        try:
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            df.to_parquet(cache_path, index=False)
-        except Exception:
-            pass
-    return df
+def gap_ranges(missing_days, merge_within=7) -> list:
+    """[start, end] date-string ranges covering sorted missing day numbers.
+
+    Gaps separated by fewer than `merge_within` known days are fetched as one
+    request, trading a few refetched days for fewer round trips.
+    """
+    miss = np.asarray(missing_days, dtype=np.int64)
+    if not len(miss):
+        return []
+    brk = np.flatnonzero(np.diff(miss) > merge_within)
+    starts = np.concatenate(([miss[0]], miss[brk + 1]))
+    ends = np.concatenate((miss[brk], [miss[-1]]))
+    return list(zip(day_strings(starts), day_strings(ends)))
+
+def weather_columns(w, days) -> dict:
+    """WEATHER_COLS for rows on `days` from a weather frame (Date + WEATHER_COLS), NaN where
+    `w` has no row; each distinct day is looked up once. `w` may be None (all NaN)."""
+    table, idx = day_index(days)
+    cols = {c: np.full(len(table), np.nan) for c in WEATHER_COLS}
+    if w is not None and len(w) and len(table):
+        wd = day_numbers(w["Date"])
+        pos = np.minimum(np.searchsorted(table, wd), len(table) - 1)
+        hit = table[pos] == wd
+        for c in WEATHER_COLS:
+            cols[c][pos[hit]] = w[c].to_numpy(dtype=np.float64)[hit]
+    return {c: v[idx] for c, v in cols.items()}
 
-def add_weather_features(df, lat, lon, cache_path=None, date_col="Date"):
-    # df: expects Date column parseable; returns df merged with weather columns
+def weather_flags(cols) -> dict:
+    # engineered flags; temp_avg averages whichever of max/min is known
+    tmax, tmin = cols["temp_max"], cols["temp_min"]
+    n = (~np.isnan(tmax)).astype(np.int8) + ~np.isnan(tmin)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        temp_avg = np.where(n > 0, (np.nan_to_num(tmax) + np.nan_to_num(tmin)) / n, np.nan)
+    return {"is_rain": np.nan_to_num(cols["precip_mm"]) > 0.5, "temp_avg": temp_avg,
+            "is_cold": temp_avg < 10, "is_hot": temp_avg > 30}
+
+def add_weather_features(df, lat, lon, cache_dir='data/weather_cache', grid_deg=0.1, date_col="Date", days=None):
+    # df: expects Date column parseable (or its `days` numbers); returns a copy with the weather and flag
+    # columns of one location, rows and Date left as they are. Weather comes from the same WeatherStore
+    # as batch_enrich_weather; only the days it is missing are fetched.
+    from .weather_store import WeatherStore
+    from .weather_backfill import backfill_store
     if df is None or len(df)==0:
         return df
-    start, end = date_range_for_df(df, date_col=date_col)
-    try:
-        w = fetch_weather_for_location(lat, lon, start, end, cache_path=cache_path)
-    except Exception as e:
-        # best-effort: attach NaNs if API fails
-        w = pd.DataFrame({ 'Date': pd.to_datetime(pd.Series(pd.to_datetime(df[date_col]).dt.date.unique())), 'temp_max': None, 'temp_min': None, 'precip_mm': None, 'weathercode': None })
-    # normalize Date types
-    w['Date'] = pd.to_datetime(w['Date']).dt.date
-    df2 = df.copy()
-    df2['Date'] = pd.to_datetime(df2['Date']).dt.date
-    out = df2.merge(w, on='Date', how='left')
-    # engineered flags
-    out['is_rain'] = out['precip_mm'].fillna(0) > 0.5
-    out['temp_avg'] = out[['temp_max','temp_min']].astype(float).mean(axis=1)
-    out['is_cold'] = out['temp_avg'] < 10
-    out['is_hot'] = out['temp_avg'] > 30
+    if days is None:
+        days = day_numbers(df[date_col])
+    store = WeatherStore(cache_dir, grid_deg)
+    loc = store.location_ids([lat], [lon], add=True)
+    # best-effort: failed fetches are reported by backfill_store and leave NaNs
+    backfill_store(store, loc, [days.min()], [days.max()])
+    out = df.copy()
+    for k, v in store.lookup(np.full(len(df), loc[0]), days).items():
+        out[k] = v
     return out
 
-def add_holiday_flags(df, country_code='US', date_col='Date'):
-    if df is None or len(df)==0:
-        return df
-    yrs = pd.to_datetime(df[date_col]).dt.year.unique().tolist()
+@lru_cache(maxsize=1024)
+def _holiday_year(country_code, year):
     try:
-        holiday_cal = hols.CountryHoliday(country_code, years=yrs)
+        cal = hols.CountryHoliday(country_code, years=[year])
     except Exception:
         # fallback using common countries mapping
-        holiday_cal = hols.CountryHoliday('US', years=yrs)
-    df2 = df.copy()
-    df2['Holiday_Flag'] = pd.to_datetime(df2[date_col]).dt.date.apply(lambda d: 1 if d in holiday_cal else 0)
-    return df2
+        cal = hols.CountryHoliday('US', years=[year])
+    days = np.array(sorted(cal.keys()), dtype="datetime64[D]")
+    days.flags.writeable = False
+    return days
 
+def holiday_calendar(country_code, years) -> np.ndarray:
+    """Sorted datetime64[D] holiday dates of `country_code` for `years`, cached per (country, year)."""
+    parts = [_holiday_year(country_code, int(y)) for y in sorted(set(years))]
+    return np.concatenate(parts) if parts else np.array([], dtype="datetime64[D]")
 
-def batch_enrich_weather(df, sku_location_map_path=None, cache_dir='data/weather_cache'):
+def is_holiday(days, country_code='US') -> np.ndarray:
+    """Vectorized membership test of datetime64[D] `days` in the country's holiday calendar."""
+    days = np.asarray(days, dtype="datetime64[D]")
+    if not len(days):
+        return np.zeros(0, dtype=bool)
+    years = np.unique(days.astype("datetime64[Y]").astype(np.int64) + 1970)
+    cal = holiday_calendar(country_code, years.tolist())
+    if not len(cal):
+        return np.zeros(len(days), dtype=bool)
+    idx = np.minimum(np.searchsorted(cal, days), len(cal) - 1)
+    return cal[idx] == days
+
+def holiday_flags(df, country_code='US', date_col='Date', country_col=None, days=None) -> np.ndarray:
+    """Holiday flag (int) per row; with `country_col`, each row uses its own country
+    (e.g. mapped per SKU location), falling back to `country_code` where missing.
+    Each (country, distinct day) is checked once; `days` are the rows' day numbers if known."""
+    if days is None:
+        days = day_numbers(df[date_col])
+    table, idx = day_index(days)
+    table = table.astype("datetime64[D]")
+    if country_col and country_col in df.columns and len(df):
+        codes, countries = pd.factorize(df[country_col])
+        names = [str(c) for c in countries] + [country_code]
+        codes = np.where(codes < 0, len(countries), codes)
+        flag = np.stack([is_holiday(table, c) for c in names])[codes, idx]
+    else:
+        flag = is_holiday(table, country_code)[idx]
+    return flag.astype(int)
+
+def _take(values, pos):
+    # values[pos], NaN where pos is -1
+    out = np.asarray(values)[np.maximum(pos, 0)]
+    if out.dtype.kind not in "fO":
+        out = out.astype(object)
+    out[pos < 0] = np.nan
+    return out
+
+def _positions(col, keys: pd.Index) -> np.ndarray:
+    # position of each row's value in `keys` (-1 if absent), resolved once per distinct value
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, uniq = col.cat.codes.to_numpy(), col.cat.categories
+    else:
+        codes, uniq = pd.factorize(col)
+    pos = keys.get_indexer(pd.Index(uniq).astype(str))
+    return np.where(codes >= 0, pos[codes], -1)
+
+@timed("batch_enrich_weather")
+def batch_enrich_weather(df, sku_location_map_path=None, cache_dir='data/weather_cache', max_workers=8, rate_per_sec=5.0,
+                         grid_deg=0.1):
     """Batch enrich sales DataFrame with weather for each region/sku mapping.
-    sku_location_map_path: CSV with columns SKU_ID, lat, lon (optional).
-    If not provided, attempts to use 'Region' column on df and map region->lat/lon via config.
-    Returns df with weather columns merged.
-    Caches per-location parquet files under cache_dir/{lat}_{lon}.parquet
+    sku_location_map_path: CSV with columns SKU_ID, lat, lon (optional, plus country).
+    Without it, lat/lon columns already on df are used.
+    Returns df with the mapping columns and weather columns added, rows in input order and Date as given.
+    Weather comes from the WeatherStore under cache_dir: SKUs map to grid locations, the
+    store's missing date ranges are backfilled concurrently (max_workers, rate_per_sec),
+    then every row is one (location_id, day) lookup.
     """
-    import pandas as pd, os
+    from .weather_store import WeatherStore
+    from .weather_backfill import backfill_store
     if sku_location_map_path and os.path.exists(sku_location_map_path):
         mapping = pd.read_csv(sku_location_map_path)
     else:
-        # try to infer if df has Location/Region columns
         mapping = None
-    df2 = df.copy()
-    df2['Date'] = pd.to_datetime(df2['Date']).dt.date
-    # Determine unique SKUs and their lat/lon
+    store = WeatherStore(cache_dir, grid_deg)
+    out = df.copy()
     if mapping is not None and 'SKU_ID' in mapping.columns and 'lat' in mapping.columns and 'lon' in mapping.columns:
-        map_df = mapping[['SKU_ID','lat','lon']].drop_duplicates()
-        merged = df2.merge(map_df, on='SKU_ID', how='left')
+        map_df = mapping[['SKU_ID','lat','lon'] + [c for c in ['country'] if c in mapping.columns]].drop_duplicates('SKU_ID')
+        pos = _positions(out['SKU_ID'], pd.Index(map_df['SKU_ID'].astype(str)))
+        for c in map_df.columns[1:]:
+            out[c] = _take(map_df[c].to_numpy(), pos)
+        map_loc = store.location_ids(map_df['lat'], map_df['lon'], add=True)
+        loc = np.where(pos >= 0, map_loc[np.maximum(pos, 0)], -1)
+    elif 'lat' in out.columns and 'lon' in out.columns:
+        # no mapping: per-row coordinates
+        loc = store.location_ids(out['lat'], out['lon'], add=True)
     else:
-        # if no mapping, assume single location (require lat/lon in df)
-        if 'lat' in df2.columns and 'lon' in df2.columns:
-            merged = df2.copy()
-        else:
-            # nothing to do
-            return df2
-    out_frames = []
-    os.makedirs(cache_dir, exist_ok=True)
-    grouped = merged.groupby(['lat','lon'], dropna=True)
-    for (lat, lon), group in grouped:
-        if pd.isna(lat) or pd.isna(lon):
-            out_frames.append(group)
-            continue
-        start = group['Date'].min().strftime('%Y-%m-%d')
-        end = group['Date'].max().strftime('%Y-%m-%d')
-        cache_file = os.path.join(cache_dir, f"weather_{str(lat).replace('.','_')}_{str(lon).replace('.','_')}.parquet")
-        try:
-            w = fetch_weather_for_location(float(lat), float(lon), start, end, cache_path=cache_file)
-            w['Date'] = pd.to_datetime(w['Date']).dt.date
-            g2 = group.merge(w, on='Date', how='left')
-            # engineered flags
-            g2['is_rain'] = g2['precip_mm'].fillna(0) > 0.5
-            g2['temp_avg'] = g2[['temp_max','temp_min']].astype(float).mean(axis=1)
-            g2['is_cold'] = g2['temp_avg'] < 10
-            g2['is_hot'] = g2['temp_avg'] > 30
-            out_frames.append(g2)
-        except Exception:
-            out_frames.append(group)
-    result = pd.concat(out_frames, ignore_index=True)
-    return result
+        # nothing to do
+        return out
+    days = day_numbers(out['Date'])
+    has = loc >= 0
+    if has.any():
+        r = pd.DataFrame({"loc": loc[has], "day": days[has]}).groupby("loc")["day"].agg(["min", "max"])
+        backfill_store(store, r.index, r["min"], r["max"], max_workers=max_workers, rate_per_sec=rate_per_sec)
+    cols = store.lookup(loc, days)
+    # no weather columns at all when nothing is known for these rows
+    if any((~np.isnan(cols[c])).any() for c in WEATHER_COLS):
+        for k, v in cols.items():
+            out[k] = v
+    return out
@@ -0,0 +1,238 @@
+import os
+import json
+import uuid
+import hashlib
+import shutil
+import pandas as pd
+from .features import SERIES_KEYS, FEATURE_VERSION, extend_features, prepare_features
+from .instrumentation import stage
+
+MANIFEST = "manifest.json"
+
+class FeatureStore:
+    """Append-only feature store for the sales feature frame.
+
+    Layout under `root`:
+      features/month=YYYY-MM/part-<token>.parquet  feature rows, sorted by SKU_ID, Sales_Channel, Date
+      state-<token>.parquet                        last `depth` target values of every series
+      manifest.json                                committed part files + current state file + fingerprint
+
+    `update` only computes features for rows newer than each series' last stored
+    Date; lags and rolling windows are seeded from the stored tail, so the result
+    matches a full `prepare_features` run. The manifest is swapped atomically
+    last, so a crash mid-update leaves the previous snapshot intact.
+    Late corrections to already stored days are ignored; rebuild to pick them up.
+
+    `settings` describes how rows are enriched (see `feature_settings`). Its
+    fingerprint, with FEATURE_VERSION and the lag/roll layout, is stored in the
+    manifest; when it differs, `pending` and `update` rebuild the whole store.
+    """
+
+    def __init__(self, root, key_cols=None, target_col="Sales_Quantity", lags=(1,7,14), rolls=(7,28), settings=None):
+        self.root = root
+        self.key_cols = list(key_cols or SERIES_KEYS)
+        self.target_col = target_col
+        self.lags = tuple(lags)
+        self.rolls = tuple(rolls)
+        self.depth = max(self.lags + self.rolls)
+        self.settings = dict(settings or {})
+        spec = dict(self.settings, version=FEATURE_VERSION, key_cols=self.key_cols, target_col=target_col,
+                    lags=list(self.lags), rolls=list(self.rolls))
+        self.fingerprint = hashlib.blake2b(json.dumps(spec, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+    # -- manifest / state ---------------------------------------------------
+    def _manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return {"parts": [], "state": None}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def stale(self) -> bool:
+        """Stored rows were built with other settings or feature code (or before fingerprints)."""
+        m = self._manifest()
+        return bool(m["parts"]) and m.get("fingerprint") != self.fingerprint
+
+    def _commit(self, manifest):
+        path = os.path.join(self.root, MANIFEST)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, path)
+
+    def state(self) -> pd.DataFrame:
+        """Tail rows (keys, Date, target) kept to seed lags/rolls of the next update."""
+        m = self._manifest()
+        if not m["state"]:
+            return pd.DataFrame(columns=self.key_cols + ["Date", self.target_col])
+        return pd.read_parquet(os.path.join(self.root, m["state"]))
+
+    def serving_state(self, mmap=True):
+        """SeriesStateTable of the current state, snapshotted once as .npy files under
+        serving/<state>/ and memory-mapped, so API workers share one copy."""
+        from .serving import SeriesStateTable
+        m = self._manifest()
+        if not m["state"]:
+            return SeriesStateTable.from_tail(self.state(), self.key_cols, self.target_col, depth=self.depth)
+        snap = os.path.join(self.root, "serving", os.path.splitext(m["state"])[0])
+        if not os.path.exists(os.path.join(snap, "keys.json")):
+            tmp = f"{snap}.{uuid.uuid4().hex[:8]}.tmp"
+            SeriesStateTable.from_tail(self.state(), self.key_cols, self.target_col, depth=self.depth).save(tmp)
+            try:
+                os.replace(tmp, snap)
+            except OSError:
+                # another worker published the same snapshot first
+                shutil.rmtree(tmp, ignore_errors=True)
+        return SeriesStateTable.load(snap, mmap=mmap)
+
+    def watermarks(self) -> pd.DataFrame:
+        st = self.state()
+        return st.groupby(self.key_cols, as_index=False, observed=True)["Date"].max()
+
+    def pending(self, sales: pd.DataFrame) -> pd.DataFrame:
+        """Rows of `sales` newer than the stored watermark of their series (all rows when stale)."""
+        sales = sales.copy()
+        sales["Date"] = pd.to_datetime(sales["Date"])
+        if self.stale():
+            return sales.reset_index(drop=True)
+        wm = self.watermarks().rename(columns={"Date": "_wm"})
+        if not len(wm):
+            return sales.reset_index(drop=True)
+        sales = sales.merge(wm, on=self.key_cols, how="left")
+        keep = sales["_wm"].isna() | (sales["Date"] > sales["_wm"])
+        return sales[keep].drop(columns="_wm").reset_index(drop=True)
+
+    # -- write path ----------------------------------------------------------
+    def update(self, sales: pd.DataFrame, promos=None, external=None, country_code: str='US', country_col: str=None,
+               n_jobs: int | None = None) -> pd.DataFrame:
+        """Compute and append features for new rows of `sales`; returns the appended rows.
+
+        `n_jobs` > 1 computes them in worker processes, as `prepare_features` does.
+
+        A stale store is rebuilt from `sales` alone, which must then hold the full history.
+        """
+        if self.settings:
+            given = feature_settings(country_code, country_col, promos, external, self.settings.get("weather"))
+            if given != self.settings:
+                raise ValueError(f"update arguments {given} do not match the store settings {self.settings}")
+        new = self.pending(sales)
+        if not len(new):
+            return new
+        stale = self.stale()
+        if promos is not None and len(promos):
+            promos = promos.assign(Date=pd.to_datetime(promos["Date"]))
+        if external is not None and len(external):
+            external = external.assign(Date=pd.to_datetime(external["Date"]))
+        cols = self.key_cols + ["Date", self.target_col]
+        hist = self.state()[cols] if not stale else pd.DataFrame(columns=cols)
+        # n_jobs > 1: series partitions in worker processes, each seeded from its own stored tail
+        feats = extend_features(new, hist, self.key_cols, self.target_col, self.lags, self.rolls, n_jobs=n_jobs,
+                                promos=promos, external=external, country_code=country_code, country_col=country_col)
+        feats = feats.sort_values(self.key_cols + ["Date"]).reset_index(drop=True)
+
+        token = f"{pd.Timestamp.now(tz='UTC'):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        m = self._manifest()
+        parts = list(m["parts"]) if not stale else []
+        month = feats["Date"].dt.strftime("%Y-%m")
+        for mo, idx in feats.groupby(month).groups.items():
+            rel = f"features/month={mo}/part-{token}.parquet"
+            os.makedirs(os.path.dirname(os.path.join(self.root, rel)), exist_ok=True)
+            feats.loc[idx].to_parquet(os.path.join(self.root, rel), index=False)
+            parts.append(rel)
+
+        tail = pd.concat([hist, new[cols]], ignore_index=True) if len(hist) else new[cols]
+        tail = tail.sort_values(self.key_cols + ["Date"]).groupby(self.key_cols, sort=False, observed=True).tail(self.depth)
+        state_rel = f"state-{token}.parquet"
+        tail.reset_index(drop=True).to_parquet(os.path.join(self.root, state_rel), index=False)
+        self._commit({"parts": parts, "state": state_rel, "key_cols": self.key_cols,
+                      "lags": list(self.lags), "rolls": list(self.rolls),
+                      "fingerprint": self.fingerprint, "settings": self.settings})
+        if stale:
+            for rel in m["parts"]:
+                try:
+                    os.remove(os.path.join(self.root, rel))
+                except OSError:
+                    pass
+        if m["state"]:
+            try:
+                os.remove(os.path.join(self.root, m["state"]))
+            except OSError:
+                pass
+            # mapped by running workers until they reload; unlinking the files is safe
+            shutil.rmtree(os.path.join(self.root, "serving", os.path.splitext(m["state"])[0]), ignore_errors=True)
+        return feats
+
+    # -- read path -----------------------------------------------------------
+    def load(self, columns=None, since=None) -> pd.DataFrame:
+        """Read the stored feature frame, Date-ordered like `prepare_features` output.
+
+        `since` (date-like) skips month partitions entirely before it.
+        """
+        parts = self._manifest()["parts"]
+        if since is not None:
+            since = pd.Timestamp(since)
+            parts = [p for p in parts if _part_month(p) >= since.strftime("%Y-%m")]
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat([pd.read_parquet(os.path.join(self.root, p), columns=columns) for p in parts],
+                       ignore_index=True)
+        if since is not None and "Date" in df.columns:
+            df = df[df["Date"] >= since]
+        order = [c for c in ["Date"] + self.key_cols if c in df.columns]
+        if order:
+            df = df.sort_values(order, kind="mergesort")
+        return df.reset_index(drop=True)
+
+def _part_month(rel):
+    return rel.split("month=", 1)[1].split("/", 1)[0]
+
+def feature_settings(country_code='US', country_col=None, promos=None, external=None, weather=False) -> dict:
+    """What a FeatureStore fingerprint records about row enrichment."""
+    return {"country_code": country_code, "country_col": country_col,
+            "promos": promos is not None and len(promos) > 0,
+            "external": sorted(map(str, external.columns)) if external is not None and len(external) else None,
+            "weather": bool(weather)}
+
+def load_features(sales: pd.DataFrame, store_dir: str=None, promos=None, external=None, country_code: str='US', country_col: str=None,
+                  n_jobs: int | None = None, weather_map: str=None, weather_cache_dir: str='data/weather_cache',
+                  weather_grid_deg: float=0.1) -> pd.DataFrame:
+    """prepare_features, served from an incremental FeatureStore when `store_dir` is set.
+
+    `weather_map` (sku_locations.csv) adds weather and `country` columns with
+    `batch_enrich_weather`; with a store only the pending rows are enriched.
+    """
+    def enrich(df):
+        if not weather_map or not len(df):
+            return df
+        from .external_factors import batch_enrich_weather
+        return batch_enrich_weather(df, sku_location_map_path=weather_map, cache_dir=weather_cache_dir,
+                                    grid_deg=weather_grid_deg)
+
+    if not store_dir:
+        return prepare_features(enrich(sales), promos=promos, external=external, country_code=country_code,
+                                country_col=country_col, n_jobs=n_jobs)
+    store = FeatureStore(store_dir, settings=feature_settings(country_code, country_col, promos, external,
+                                                               weather=bool(weather_map)))
+    new = enrich(store.pending(sales))
+    with stage("feature_store_update", rows=len(new)):
+        store.update(new, promos=promos, external=external, country_code=country_code, country_col=country_col,
+                     n_jobs=n_jobs)
+    with stage("feature_store_load") as st:
+        feats = store.load()
+        st.rows = len(feats)
+    return feats
+
+def features_from_config(sales: pd.DataFrame, cfg: dict, promos=None, external=None) -> pd.DataFrame:
+    """`load_features` with the pipeline config: store, holiday country, weather map and feature_jobs.
+
+    Every pipeline that writes the store goes through here, so stored rows are
+    always enriched the same way.
+    """
+    data_dir = cfg.get("data_dir", "data")
+    sku_map = os.path.join(data_dir, "sku_locations.csv")
+    # holiday calendar: per-row `country` from sku_locations.csv when present, else the config default
+    return load_features(sales, store_dir=cfg.get("feature_store_dir"), promos=promos, external=external,
+                         country_code=cfg.get("country_holidays", "US"), country_col="country",
+                         n_jobs=cfg.get("feature_jobs"), weather_map=sku_map if os.path.exists(sku_map) else None,
+                         weather_cache_dir=os.path.join(data_dir, "weather_cache"),
+                         weather_grid_deg=cfg.get("weather_grid_deg", 0.1))
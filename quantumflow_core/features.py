@@ -1,31 +1,175 @@
+import os
+import shutil
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+from .instrumentation import timed
+from .dates import day_numbers, calendar_columns
+
+try:
+    import pyarrow as pa
+    HAS_ARROW = True
+except Exception:
+    HAS_ARROW = False
 
 CAL_PARTS = ["dayofweek","weekofyear","month","quarter"]
 
 def add_calendar(df, date_col="Date"):
     df = df.copy()
-    d = pd.to_datetime(df[date_col])
-    df["dayofweek"] = d.dt.dayofweek
-    df["weekofyear"] = d.dt.isocalendar().week.astype(int)
-    df["month"] = d.dt.month
-    df["quarter"] = d.dt.quarter
+    _set_calendar(df, date_col)
     return df
 
-def add_lags_rollups(df, key_cols, target_col="Sales_Quantity", lags=(1,7,14), rolls=(7,28)):
-    df = df.sort_values(["Date"])
-    df = df.copy()
-    g = df.groupby(key_cols, group_keys=False)
+def _set_calendar(df, date_col="Date", days=None):
+    # in place, from one lookup row per distinct date
+    if days is None:
+        days = day_numbers(df[date_col])
+    for k, v in calendar_columns(days).items():
+        df[k] = v
+
+def _series_order(codes, dates):
+    # one sort by (keys..., Date) given per-key integer codes; returns the
+    # permutation and the start offset of every series inside the sorted order
+    order = np.lexsort([dates] + codes[::-1])
+    if len(order) == 0:
+        return order, np.zeros(0, dtype=np.int64)
+    brk = np.zeros(len(order), dtype=bool)
+    brk[0] = True
+    for c in codes:
+        cs = c[order]
+        brk[1:] |= cs[1:] != cs[:-1]
+    starts = np.flatnonzero(brk)
+    return order, starts
+
+def _segment_prefix_sums(v, starts, lengths):
+    """(P, Q): sums of v and v**2 over each row's series before that row (0 at a series start).
+
+    Runs over positions within the series rather than over series, longest
+    series first, so each step adds one row of every series still running.
+    """
+    n = len(v)
+    P, Q = np.empty(n), np.empty(n)
+    by_len = np.argsort(-lengths, kind="stable")
+    first = starts[by_len]
+    # number of series longer than j, for every position j
+    active = np.searchsorted(-lengths[by_len], -np.arange(lengths.max() if n else 0), side="left")
+    acc1, acc2 = np.zeros(len(starts)), np.zeros(len(starts))
+    for j, k in enumerate(active):
+        idx = first[:k] + j
+        P[idx], Q[idx] = acc1[:k], acc2[:k]
+        vj = v[idx]
+        acc1[:k] += vj
+        acc2[:k] += vj * vj
+    return P, Q
+
+def _lag_roll_columns(x, starts, lags=(1,7,14), rolls=(7,28)):
+    """(name, values) of lags and shift(1) rolling mean/std for series laid out contiguously in `x`.
+
+    `starts` holds the offset of each series. Rolling windows use per-series
+    prefix sums over values centred on their series mean, so every window is O(1).
+    Columns are yielded one at a time and temporaries freed as soon as they
+    are no longer needed, to keep peak memory near a few columns.
+    """
+    n = len(x)
+    lengths = np.diff(np.append(starts, n))
+    seg_start = np.repeat(starts, lengths)
+    pos = np.arange(n)
     for L in lags:
-        df[f"lag_{L}"] = g[target_col].shift(L)
+        src = pos - L
+        ok = src >= seg_start
+        np.maximum(src, 0, out=src)
+        yield f"lag_{L}", np.where(ok, x[src], np.nan)
+        del src, ok
+    if not rolls:
+        return
+    valid = ~np.isnan(x)
+    # centre per series to keep sum-of-squares numerically stable
+    seg_id = np.repeat(np.arange(len(starts)), lengths)
+    cnt_seg = np.bincount(seg_id, weights=valid, minlength=len(starts))
+    sum_seg = np.bincount(seg_id, weights=np.where(valid, x, 0.0), minlength=len(starts))
+    centre = np.divide(sum_seg, cnt_seg, out=np.zeros(len(starts)), where=cnt_seg > 0)[seg_id]
+    del seg_id
+    xc = np.where(valid, x - centre, 0.0)
+    # sums restart at every series, so a series' precision does not depend on the ones before it
+    P, Q = _segment_prefix_sums(xc, starts, lengths)
+    del xc
+    C = np.concatenate(([0], np.cumsum(valid)))
+    del valid
+    # start of the run of identical values ending at each row; constant
+    # windows get an exact zero std instead of cancellation noise
+    change = np.ones(n, dtype=bool)
+    change[1:] = x[1:] != x[:-1]
+    change[starts] = True
+    run_start = np.maximum.accumulate(np.where(change, pos, 0))
+    del change
+    prev_run = run_start[np.maximum(pos - 1, 0)]
+    del run_start
     for W in rolls:
-        df[f"roll_mean_{W}"] = g[target_col].shift(1).rolling(W, min_periods=max(2, W//2)).mean()
-        df[f"roll_std_{W}"]  = g[target_col].shift(1).rolling(W, min_periods=max(2, W//2)).std()
-    return df
+        min_periods = max(2, W // 2)
+        # window over shift(1): rows [i-W, i-1] clipped to the series start
+        lo = np.maximum(pos - W, seg_start)
+        cnt = C[pos] - C[lo]
+        s1 = P[pos] - P[lo]
+        s2 = Q[pos] - Q[lo]
+        enough = cnt >= min_periods
+        safe = np.where(enough, cnt, 2)
+        del cnt
+        mean = s1 / safe
+        var = np.maximum(s2 - s1 * mean, 0.0) / (safe - 1)
+        del s1, s2, safe
+        var[prev_run <= lo] = 0.0
+        del lo
+        mean += centre
+        yield f"roll_mean_{W}", np.where(enough, mean, np.nan)
+        del mean
+        np.sqrt(var, out=var)
+        yield f"roll_std_{W}", np.where(enough, var, np.nan)
+        del var, enough
 
+def add_lags_rollups(df, key_cols, target_col="Sales_Quantity", lags=(1,7,14), rolls=(7,28), dropna=False):
+    """Date-ordered copy of `df` with per-series lag and rolling columns.
 
-def prepare_features(sales: pd.DataFrame, promos=None, external=None, enrich_weather: bool=False, lat: float=None, lon: float=None, weather_cache_path: str=None, country_code: str='US'):
+    The frame is copied once (the Date reorder). With `dropna`, rows with a
+    NaN in any column are left out of that same copy instead of being
+    filtered afterwards.
+    """
+    dates = pd.to_datetime(df["Date"]).values.view("i8")
+    by_date = np.argsort(dates, kind="stable")
+    codes = [pd.factorize(df[c])[0][by_date] for c in key_cols]
+    order, starts = _series_order(codes, dates[by_date])
+    del codes, dates
+    x = df[target_col].to_numpy(dtype=np.float64, na_value=np.nan)[by_date][order]
+    keep = df.notna().all(axis=1).to_numpy()[by_date] if dropna else None
+    cols = {}
+    for name, vals in _lag_roll_columns(x, starts, lags, rolls):
+        full = np.empty(len(x), dtype=np.float64)
+        full[order] = vals
+        del vals
+        if dropna:
+            keep &= ~np.isnan(full)
+        cols[name] = full
+    del x, order
+    out = df.take(by_date[keep] if dropna else by_date)
+    for name in list(cols):
+        full = cols.pop(name)
+        out[name] = full[keep] if dropna else full
+    return out
+
+SERIES_KEYS = ["SKU_ID","Sales_Channel"]
+# bump when a change to the feature code alters the values of stored feature rows
+FEATURE_VERSION = 1
+
+def add_base_features(sales: pd.DataFrame, promos=None, external=None, enrich_weather: bool=False, lat: float=None, lon: float=None, weather_cache_dir: str='data/weather_cache', weather_grid_deg: float=0.1, country_code: str='US', country_col: str=None):
+    # row-local features only (promo/external merges, weather, holidays, calendar);
+    # these never look at other rows, so they can be computed for new days alone
     df = sales.copy()
+    if pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        # typed ingestion parses Date once; bring CSV-read side tables to the same dtype
+        if promos is not None and len(promos) and not pd.api.types.is_datetime64_any_dtype(promos["Date"]):
+            promos = promos.assign(Date=pd.to_datetime(promos["Date"]))
+        if external is not None and len(external) and not pd.api.types.is_datetime64_any_dtype(external["Date"]):
+            external = external.assign(Date=pd.to_datetime(external["Date"]))
     if promos is not None and len(promos):
         df = df.merge(promos, on=["Date","SKU_ID"], how="left")
         df["Promo_Flag"] = df["Promo_Flag"].fillna(0).astype(int)
@@ -34,19 +178,153 @@ def prepare_features(sales: pd.DataFrame, promos=None, external=None, enrich_wea
     if external is not None and len(external):
         df = df.merge(external, on=["Date"], how="left")
     # External enrichments (weather, holidays)
+    # Date is turned into day numbers once; weather, holidays and calendar are
+    # looked up per distinct day from them
+    days = day_numbers(df["Date"])
     if enrich_weather and lat is not None and lon is not None:
         try:
             from .external_factors import add_weather_features
-            df = add_weather_features(df, lat, lon, cache_path=weather_cache_path, date_col='Date')
+            df = add_weather_features(df, lat, lon, cache_dir=weather_cache_dir, grid_deg=weather_grid_deg, date_col='Date', days=days)
         except Exception:
             pass
-    # holidays
-    try:
-        from .external_factors import add_holiday_flags
-        df = add_holiday_flags(df, country_code=country_code, date_col='Date')
-    except Exception:
-        pass
-    df = add_calendar(df, "Date")
-    df = add_lags_rollups(df, ["SKU_ID","Sales_Channel"], "Sales_Quantity")
-    df = df.dropna().reset_index(drop=True)
+    # holidays and calendar are set in place on `df`, which is already a private copy
+    if len(df):
+        try:
+            from .external_factors import holiday_flags
+            df["Holiday_Flag"] = holiday_flags(df, country_code=country_code, date_col='Date', country_col=country_col, days=days)
+        except Exception:
+            pass
+    _set_calendar(df, "Date", days)
     return df
+
+@timed("prepare_features")
+def prepare_features(sales: pd.DataFrame, promos=None, external=None, enrich_weather: bool=False, lat: float=None, lon: float=None, weather_cache_dir: str='data/weather_cache', weather_grid_deg: float=0.1, country_code: str='US', country_col: str=None,
+                     n_jobs: int | None = None, min_partition_rows: int = 250_000):
+    """Training features for every SKU×Channel series of `sales`, Date-ordered, rows with NaNs dropped.
+
+    With `n_jobs` > 1 and at least `min_partition_rows` rows per worker, series
+    are split into balanced partitions computed in worker processes (see
+    `_prepare_parallel`); the result is identical to the single-process one.
+    """
+    kw = dict(promos=promos, external=external, enrich_weather=enrich_weather, lat=lat, lon=lon,
+              weather_cache_dir=weather_cache_dir, weather_grid_deg=weather_grid_deg, country_code=country_code,
+              country_col=country_col)
+    workers = min(int(n_jobs or 1), len(sales) // max(1, min_partition_rows))
+    if workers > 1:
+        return _prepare_parallel(sales, workers, kw)
+    return _prepare(sales, **kw)
+
+def extend_features(sales: pd.DataFrame, tail: pd.DataFrame, key_cols=SERIES_KEYS, target_col="Sales_Quantity",
+                    lags=(1,7,14), rolls=(7,28), n_jobs: int | None = None, min_partition_rows: int = 250_000, **kw):
+    """Features for new rows of series that continue from `tail` (keys, Date, target of earlier days).
+
+    Lags and rolling windows are seeded from `tail`, whose rows are not returned;
+    `kw` go to `add_base_features`. Rows with NaNs are dropped. `n_jobs` splits
+    series into worker processes as in `prepare_features`.
+    """
+    kw.update(tail=tail, key_cols=list(key_cols), target_col=target_col, lags=tuple(lags), rolls=tuple(rolls))
+    workers = min(int(n_jobs or 1), len(sales) // max(1, min_partition_rows))
+    if workers > 1:
+        return _prepare_parallel(sales, workers, kw)
+    return _prepare(sales, **kw)
+
+def _prepare(sales, tail=None, key_cols=SERIES_KEYS, target_col="Sales_Quantity", lags=(1,7,14), rolls=(7,28), **kw):
+    df = add_base_features(sales, **kw)
+    if tail is None:
+        df = add_lags_rollups(df, key_cols, target_col, lags=lags, rolls=rolls, dropna=True)
+        df.reset_index(drop=True, inplace=True)
+        return df
+    # tail rows get negative labels so the lagged columns can be read back for `df`'s rows only
+    df = df.reset_index(drop=True)
+    cols = list(key_cols) + ["Date", target_col]
+    hist = tail[cols].copy()
+    hist.index = -1 - np.arange(len(hist))
+    narrow = add_lags_rollups(pd.concat([hist, df[cols]]) if len(hist) else df[cols], key_cols, target_col,
+                              lags=lags, rolls=rolls)
+    lagged = narrow.loc[df.index]
+    for c in narrow.columns.difference(cols):
+        df[c] = lagged[c]
+    return df.dropna().reset_index(drop=True)
+
+# ---- partition-parallel mode -------------------------------------------------
+
+_ROW = "__qf_row"
+_SHARED = {}   # inherited by forked workers: the parent's frames, read without pickling
+
+def _series_partitions(sales, n_parts, key_cols=SERIES_KEYS, tail=None):
+    # series -> partition, largest series first in snake order so partitions get similar row counts;
+    # returns row positions per partition, ascending (input order kept), for `sales` and for `tail`
+    keys = sales[key_cols] if tail is None else pd.concat([sales[key_cols], tail[key_cols]], ignore_index=True)
+    codes = keys.groupby(list(key_cols), sort=False, observed=True).ngroup().to_numpy()
+    counts = np.bincount(codes[:len(sales)], minlength=codes.max() + 1)
+    by_size = np.argsort(-counts, kind="stable")
+    lane = np.arange(len(by_size)) % (2 * n_parts)
+    part_of = np.empty(len(counts), dtype=np.int64)
+    part_of[by_size] = np.where(lane < n_parts, lane, 2 * n_parts - 1 - lane)
+
+    def split(rows):
+        order = np.argsort(rows, kind="stable")
+        return np.split(order, np.cumsum(np.bincount(rows, minlength=n_parts))[:-1])
+    rows = part_of[codes]
+    return split(rows[:len(sales)]), (split(rows[len(sales):]) if tail is not None else None)
+
+def _part_kw(kw, tail_parts, i):
+    # a partition's kwargs: the tail rows of its own series only
+    return kw if tail_parts is None else dict(kw, tail=kw["tail"].iloc[tail_parts[i]])
+
+def _prepare_part(i, out_dir):
+    sales, kw, parts, tails = _SHARED["sales"], _SHARED["kw"], _SHARED["parts"], _SHARED["tails"]
+    return _prepare_rows(sales.iloc[parts[i]].assign(**{_ROW: parts[i]}), _part_kw(kw, tails, i), out_dir, i)
+
+def _prepare_rows(sub, kw, out_dir, i):
+    df = _prepare(sub, **kw)
+    if out_dir is None:
+        return df
+    # Arrow IPC file, memory-mapped by the parent: no pickling through the result pipe
+    path = os.path.join(out_dir, f"part-{i:04d}.arrow")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    del df
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+def _prepare_parallel(sales, workers, kw):
+    """prepare_features over series partitions in `workers` processes.
+
+    Lags and rolling windows never cross series, so each partition is complete
+    on its own. Forked workers read their rows from the parent's frame
+    directly (nothing is pickled); each writes its features to an Arrow IPC
+    file under /dev/shm that the parent memory-maps. The partitions are then
+    put back in the single-process row order (Date, then input position).
+    """
+    tail = kw.get("tail")
+    parts, tails = _series_partitions(sales, workers, kw.get("key_cols", SERIES_KEYS), tail)
+    fork = "fork" in mp.get_all_start_methods()
+    shm = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+    out_dir = tempfile.mkdtemp(prefix="qf-features-", dir=shm) if HAS_ARROW else None
+    try:
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork" if fork else "spawn")) as ex:
+            if fork:
+                _SHARED.update(sales=sales, kw=kw, parts=parts, tails=tails)
+                try:
+                    results = list(ex.map(_prepare_part, range(len(parts)), [out_dir] * len(parts)))
+                finally:
+                    _SHARED.clear()
+            else:
+                futs = [ex.submit(_prepare_rows, sales.iloc[p].assign(**{_ROW: p}), _part_kw(kw, tails, i), out_dir, i)
+                        for i, p in enumerate(parts)]
+                results = [f.result() for f in futs]
+        return _assemble(results)
+    finally:
+        if out_dir is not None:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def _assemble(results):
+    if HAS_ARROW and results and isinstance(results[0], str):
+        table = pa.concat_tables([pa.ipc.open_file(pa.memory_map(p)).read_all() for p in results])
+        dates = pd.to_datetime(table.column("Date").to_numpy()).values.view("i8")
+        table = table.take(np.lexsort((table.column(_ROW).to_numpy(), dates))).drop([_ROW])
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    df = pd.concat(results, ignore_index=True)
+    df = df.take(np.lexsort((df[_ROW].to_numpy(), pd.to_datetime(df["Date"]).values.view("i8"))))
+    return df.drop(columns=_ROW).reset_index(drop=True)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from .serving import SeriesStateTable, calendar_arrays, lag_roll_from_history, feature_matrix, to_days
+from .models import ShardedModel, predict, predict_quantiles
+from .instrumentation import timed
+
+def _promo_lookup(promos, skus):
+    # (sku code, day) pairs flagged in the promo calendar, as sorted int64 keys
+    if promos is None or not len(promos):
+        return None
+    code = {s: i for i, s in enumerate(skus)}
+    p = promos[promos["Promo_Flag"].fillna(0).astype(int) > 0]
+    sc = p["SKU_ID"].map(code)
+    p, sc = p[sc.notna()], sc[sc.notna()].astype(np.int64)
+    return np.unique(sc.to_numpy() << 32 | (to_days(pd.to_datetime(p["Date"]).values) & 0xFFFFFFFF))
+
+def _predict_step(trained, X, features, keys, quantiles=(None,)):
+    # (series, len(quantiles)); None is the mean model
+    if isinstance(trained, ShardedModel):
+        # shards route on SKU_ID / Sales_Channel (or key_map via SKU_ID)
+        df = pd.DataFrame(X, columns=features)
+        df["SKU_ID"], df["Sales_Channel"] = keys[:, 0], keys[:, 1]
+        return np.column_stack([predict(trained, df, quantile=q) for q in quantiles])
+    return predict_quantiles(trained, X, quantiles)
+
+@timed("forecast_horizon", rows_arg=1)
+def forecast_horizon(trained, state: SeriesStateTable, horizon: int = 30, promos: pd.DataFrame = None,
+                     quantiles=(), include_features: bool = False) -> pd.DataFrame:
+    """Recursive multi-step forecast for every series in `state` at once.
+
+    Each step builds the feature matrix for all series in NumPy (calendar,
+    promo, lags and rolling stats from the rolling history) and makes one
+    batched model call; the mean forecast is appended to the history and feeds
+    the next step's lags. Steps start the day after each series' last
+    observed day. `quantiles` adds forecast_q<q> columns (not fed back).
+    `include_features` keeps the feature columns, e.g. for
+    `inventory.lead_time_quantile_demand`.
+    """
+    n = len(state)
+    features = list(trained.features)
+    keys = np.array(state.keys, dtype=object).reshape(n, -1)
+    skus = pd.unique(keys[:, 0])
+    sku_code = pd.Index(skus).get_indexer(keys[:, 0]).astype(np.int64)
+    promo_keys = _promo_lookup(promos, skus)
+    hist = state.history.copy()
+    frames = []
+    for h in range(1, horizon + 1):
+        days = state.last_day + h
+        cols = calendar_arrays(days)
+        if promo_keys is not None:
+            k = sku_code << 32 | (days & 0xFFFFFFFF)
+            cols["Promo_Flag"] = np.isin(k, promo_keys).astype(np.float64)
+        else:
+            cols["Promo_Flag"] = np.zeros(n)
+        cols.update(lag_roll_from_history(hist, np.ones(n, dtype=np.int64), state.lags, state.rolls))
+        X = feature_matrix(cols, features)
+        P = np.asarray(_predict_step(trained, X, features, keys, [None, *quantiles]), dtype=np.float64)
+        pred = np.maximum(P[:, 0], 0.0)
+        out = {"SKU_ID": keys[:, 0], "Sales_Channel": keys[:, 1], "Date": days.astype("datetime64[D]"),
+               "horizon_day": np.full(n, h, dtype=np.int16), "forecast": pred}
+        for j, q in enumerate(quantiles, 1):
+            out[f"forecast_q{q}"] = P[:, j]
+        if include_features:
+            out.update({f: X[:, i] for i, f in enumerate(features)})
+        frames.append(pd.DataFrame(out))
+        hist = np.concatenate([hist[:, 1:], pred[:, None]], axis=1)
+    if not frames:
+        return pd.DataFrame(columns=["SKU_ID", "Sales_Channel", "Date", "horizon_day", "forecast"])
+    res = pd.concat(frames, ignore_index=True)
+    res["Date"] = pd.to_datetime(res["Date"])
+    return res
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import hashlib
+import warnings
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from .evaluation import blocked_cv_slices, rmse
+from .models import FEATURES_BASE, _thread_budget
+
+try:
+    import lightgbm as lgb
+    HAS_LGB = True
+except Exception:
+    HAS_LGB = False
+
+try:
+    import optuna
+    HAS_OPTUNA = True
+except Exception:
+    HAS_OPTUNA = False
+
+# binning is fixed when the fold Datasets are built, so only training params are searched
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+
+def suggest_params(trial) -> dict:
+    """LightGBM search space (sklearn-API names, so results drop into LGBMRegressor)."""
+    return {
+        "n_estimators": trial.suggest_int("n_estimators", 100, 1000, step=50),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.2, log=True),
+        "num_leaves": trial.suggest_int("num_leaves", 15, 255, log=True),
+        "max_depth": trial.suggest_int("max_depth", 3, 12),
+        "min_child_samples": trial.suggest_int("min_child_samples", 5, 100, log=True),
+        "subsample": trial.suggest_float("subsample", 0.6, 1.0),
+        "subsample_freq": 1,
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+        "reg_lambda": trial.suggest_float("reg_lambda", 1e-3, 10.0, log=True),
+    }
+
+class FoldDatasets:
+    """Blocked-CV folds of one (X, y) as LightGBM Datasets, binned once.
+
+    Every trial trains on the same constructed training Datasets, so feature
+    histograms are not rebuilt per fit.
+    """
+
+    def __init__(self, X, y, n_splits=3, params=None):
+        if not HAS_LGB:
+            raise RuntimeError("LightGBM not installed in environment")
+        self.params = dict(DATASET_PARAMS, **(params or {}))
+        self.folds = []
+        for tr, va in blocked_cv_slices(len(y), n_splits=n_splits):
+            train = lgb.Dataset(X[tr], y[tr], params=self.params, free_raw_data=False).construct()
+            valid = lgb.Dataset(X[va], y[va], reference=train, params=self.params, free_raw_data=False).construct()
+            self.folds.append((train, valid, X[va], y[va]))
+
+    def __len__(self):
+        return len(self.folds)
+
+def cv_objective(trial, folds: FoldDatasets, threads=None, early_stopping=50):
+    """Mean fold RMSE; the running mean is reported after every fold for pruning.
+
+    `n_estimators` is an upper bound: each fold stops `early_stopping` rounds
+    after its validation RMSE stops improving, and the mean best iteration is
+    kept as the trial's `n_estimators` user attribute.
+    """
+    params = suggest_params(trial)
+    rounds = params.pop("n_estimators")
+    params = dict(folds.params, objective="regression", metric="rmse", **params)
+    if threads:
+        params["num_threads"] = threads
+    callbacks = [lgb.early_stopping(early_stopping, verbose=False)] if early_stopping else []
+    scores, iters = [], []
+    for i, (train, valid, X_va, y_va) in enumerate(folds.folds):
+        booster = lgb.train(params, train, num_boost_round=rounds, valid_sets=[valid], callbacks=callbacks)
+        best = booster.best_iteration or rounds
+        scores.append(rmse(y_va, booster.predict(X_va, num_iteration=best)))
+        iters.append(best)
+        trial.report(float(np.mean(scores)), step=i)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    trial.set_user_attr("n_estimators", int(np.mean(iters)))
+    return float(np.mean(scores))
+
+def data_fingerprint(X, y, features, n_splits) -> str:
+    """Short hash of a segment's training data and CV setup; part of its study name."""
+    h = hashlib.blake2b(digest_size=6)
+    h.update(json.dumps([list(features), int(n_splits), list(X.shape)]).encode())
+    h.update(np.ascontiguousarray(X, dtype=np.float64))
+    h.update(np.ascontiguousarray(y, dtype=np.float64))
+    return h.hexdigest()
+
+def make_storage(storage):
+    """Optuna storage from a URL (sqlite:///...) or a journal file path; None = in memory."""
+    if storage is None or "://" in str(storage):
+        return storage
+    os.makedirs(os.path.dirname(storage) or ".", exist_ok=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", optuna.exceptions.ExperimentalWarning)
+        return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(storage))
+
+def _study(name, storage, seed=None, n_startup_trials=5):
+    # median pruning on the running fold mean; fold i scores are only compared with other trials' fold i
+    pruner = optuna.pruners.MedianPruner(n_startup_trials=n_startup_trials, n_warmup_steps=0)
+    return optuna.create_study(study_name=name, storage=make_storage(storage), direction="minimize",
+                               sampler=optuna.samplers.TPESampler(seed=seed), pruner=pruner, load_if_exists=True)
+
+def _tune_worker(name, X, y, n_trials, storage, n_splits, threads, seed):
+    # one worker: builds its fold Datasets once and pulls trials from the (shared) study
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = _study(name, storage, seed)
+    finished = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    remaining = n_trials - len(study.get_trials(deepcopy=False, states=finished))
+    build = 0.0
+    if remaining > 0:
+        t0 = time.perf_counter()
+        folds = FoldDatasets(X, y, n_splits=n_splits)
+        build = time.perf_counter() - t0
+        # stops every worker of the study once n_trials have finished in total
+        stop = optuna.study.MaxTrialsCallback(n_trials, states=finished)
+        study.optimize(lambda t: cv_objective(t, folds, threads), n_trials=remaining, callbacks=[stop])
+    # in-memory studies die with the worker, so summarise here
+    return name, build, _summary(study, len(y)) if storage is None else None
+
+def _summary(study, n_rows):
+    TS = optuna.trial.TrialState
+    states = [t.state for t in study.trials]
+    done = TS.COMPLETE in states
+    best = dict(study.best_params, subsample_freq=1) if done else None
+    if done and "n_estimators" in study.best_trial.user_attrs:
+        best["n_estimators"] = study.best_trial.user_attrs["n_estimators"]
+    return {"best_params": best,
+            "best_rmse": study.best_value if done else None, "rows": n_rows,
+            "trials": states.count(TS.COMPLETE), "pruned": states.count(TS.PRUNED)}
+
+def tune_segments(df: pd.DataFrame, segment_cols=None, target="Sales_Quantity", features=None, n_trials=20,
+                  n_splits=3, n_jobs=None, storage=None, study_prefix="qf-hpo", min_rows=200, seed=0) -> dict:
+    """Tune LightGBM for every segment of `df` (or the whole frame) in one run.
+
+    Each segment gets its own study `<study_prefix>-<segment>-<fingerprint>`,
+    the fingerprint hashing the segment's rows, features and folds. `n_jobs`
+    (config `parallel_jobs`) is split into worker processes x LightGBM threads,
+    as in `select_and_train`; workers go to segments first. With `storage` (a
+    journal file path or sqlite URL) spare workers also share a segment's study
+    and a rerun on the same data resumes it, while new data starts a new study;
+    in memory, each segment runs in a single worker.
+    Rows must be Date-ordered within each segment, as `prepare_features`
+    returns them. Returns {segment: summary}; segments below `min_rows` are
+    skipped.
+    """
+    if not HAS_OPTUNA:
+        raise RuntimeError("optuna not installed in environment")
+    features = list(features or FEATURES_BASE)
+    segment_cols = list(segment_cols or [])
+    groups = df.groupby(segment_cols, sort=True, observed=True).indices if segment_cols else {"ALL": np.arange(len(df))}
+    segments = {}
+    for key, idx in groups.items():
+        label = "ALL" if not segment_cols else "__".join(str(k) for k in (key if isinstance(key, tuple) else (key,)))
+        if len(idx) >= min_rows:
+            segments[label] = idx
+    if not segments:
+        return {}
+
+    X_all = df[features].to_numpy(dtype=np.float64)
+    y_all = df[target].to_numpy(dtype=np.float64)
+    data = {label: (X_all[idx], y_all[idx]) for label, idx in segments.items()}
+    del X_all, y_all
+    # old trials were scored on other data: only the same rows and folds resume a study
+    names = {label: f"{study_prefix}-{label}-{data_fingerprint(X, y, features, n_splits)}"
+             for label, (X, y) in data.items()}
+    per_segment = max(1, int(n_jobs or 1) // len(segments)) if storage is not None else 1
+    workers, threads = _thread_budget(n_jobs, len(segments) * per_segment)
+    resumed = dict.fromkeys(segments, 0)
+    if storage is not None:
+        # create storage schema and studies up front so concurrent workers only load them
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        for label in segments:
+            resumed[label] = len(_study(names[label], storage, seed).get_trials(deepcopy=False))
+    t0 = time.perf_counter()
+    results = Parallel(n_jobs=workers)(
+        delayed(_tune_worker)(names[label], X, y, n_trials, storage, n_splits, threads, seed + w)
+        for label, (X, y) in data.items() for w in range(per_segment))
+    seconds = time.perf_counter() - t0
+
+    build, summaries = {}, {}
+    for name, b, summary in results:
+        build[name] = build.get(name, 0.0) + b
+        if summary is not None:
+            summaries[name] = summary
+    out = {}
+    for label, idx in segments.items():
+        name = names[label]
+        if name not in summaries:
+            summaries[name] = _summary(optuna.load_study(study_name=name, storage=make_storage(storage)), len(idx))
+        out[label] = dict(summaries[name], study=name, resumed_trials=resumed[label],
+                          dataset_seconds=build.get(name, 0.0), wall_seconds=seconds)
+    return out
@@ -0,0 +1,302 @@
+import json
+import warnings
+import numpy as np
+from dataclasses import dataclass
+from .models import TrainedModel, ShardedModel
+
+try:
+    import numba
+    HAS_NUMBA = True
+except Exception:
+    HAS_NUMBA = False
+
+# objectives whose prediction is the raw leaf sum (no link function)
+_LGB_IDENTITY = ("regression", "regression_l1", "huber", "fair", "quantile", "mape")
+_XGB_IDENTITY = ("reg:squarederror", "reg:absoluteerror", "reg:quantileerror", "reg:pseudohubererror")
+_LGB_ZERO = 1e-35  # LightGBM kZeroThreshold
+BLOCK_ELEMS = 1 << 18  # rows x trees per block of the NumPy traversal
+# batch sizes up to which the compiled kernel beats the native predictor (bench_tree_inference, 1 core)
+MAX_ROWS = {"lgbm": 4096, "xgb": 32}
+
+def _traverse(X, feature, threshold, nan_left, zero, child, value, roots, tree_out, out):
+    # tree by tree (its nodes stay in cache), every row down to its leaf
+    for t in range(roots.shape[0]):
+        k = tree_out[t]
+        for i in range(X.shape[0]):
+            node = roots[t]
+            while child[2 * node] != node:
+                x = X[i, feature[node]]
+                if np.isnan(x) or (zero[node] and abs(x) <= 1e-35):
+                    go_left = nan_left[node]
+                else:
+                    go_left = x <= threshold[node]
+                node = child[2 * node] if go_left else child[2 * node + 1]
+            out[i, k] += value[node]
+
+if HAS_NUMBA:
+    _traverse = numba.njit(cache=True, nogil=True)(_traverse)
+
+@dataclass
+class FlatForest:
+    """Tree ensembles as flat node arrays, traversed for all rows x trees at once.
+
+    Node i sends a row left when x[feature[i]] <= threshold[i]; NaN goes left
+    iff nan_left[i]. Children of node i are child[2i] (left) and child[2i+1]
+    (right); leaves point to themselves, so tree_depth[t] steps take every
+    row to its leaf in tree t.
+    Trees of output k are roots[out_ptr[k]:out_ptr[k+1]] and output k is
+    base[k] + the sum of its trees' leaf values.
+    """
+    feature: np.ndarray
+    threshold: np.ndarray
+    nan_left: np.ndarray
+    child: np.ndarray
+    value: np.ndarray
+    roots: np.ndarray
+    out_ptr: np.ndarray
+    base: np.ndarray
+    tree_depth: np.ndarray
+    n_features: int
+    float32_input: bool = False
+    zero_missing: np.ndarray | None = None  # LightGBM zero_as_missing splits: |x| <= 1e-35 goes the NaN way
+
+    def __post_init__(self):
+        self._acc_value = self.value.astype(np.float32 if self.float32_input else np.float64)
+        self._zero_mask = self.zero_missing if self.zero_missing is not None else np.zeros(len(self.feature), dtype=bool)
+        # the NumPy traversal works on "slots" 2*node: per-node arrays are repeated so a slot
+        # indexes them directly, and child slot = _child[slot + went_right]
+        self._feature = np.repeat(self.feature, 2).astype(np.int32)
+        self._threshold = np.repeat(self.threshold, 2)
+        self._nan_left = np.repeat(self.nan_left, 2)
+        self._zero = np.repeat(self.zero_missing, 2) if self.zero_missing is not None else None
+        self._child = (2 * self.child).astype(np.int32)
+        self._value = np.repeat(self.value, 2)
+        self._plans = {}
+
+    @property
+    def n_outputs(self) -> int:
+        return len(self.base)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def _plan(self, outputs):
+        # trees of `outputs`, deepest first so finished trees drop off the end of the active prefix
+        plan = self._plans.get(outputs)
+        if plan is None:
+            tree_out = np.concatenate([np.full(self.out_ptr[k + 1] - self.out_ptr[k], j, dtype=np.int64)
+                                       for j, k in enumerate(outputs)])
+            tree_depth = np.concatenate([self.tree_depth[self.out_ptr[k]:self.out_ptr[k + 1]] for k in outputs])
+            roots = np.concatenate([self.roots[self.out_ptr[k]:self.out_ptr[k + 1]] for k in outputs])
+            counts = np.array([self.out_ptr[k + 1] - self.out_ptr[k] for k in outputs])
+            order = np.argsort(-tree_depth, kind="stable")
+            active = [int((tree_depth > s).sum()) for s in range(int(tree_depth.max(initial=0)))]
+            plan = self._plans[outputs] = (roots, tree_out, 2 * roots[order].astype(np.int32), active, np.argsort(order),
+                                           np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        return plan
+
+    def _leaves(self, Xf, n, roots, active):
+        # (trees, rows) leaf values; tree-major so the active trees are a prefix
+        T = len(roots)
+        slot = np.repeat(roots, n)
+        off = np.tile(np.arange(0, n * self.n_features, self.n_features, dtype=np.int32), T)
+        has_nan = bool(np.isnan(Xf).any())
+        for k in active:
+            m = k * n
+            sl = slot[:m]
+            xi = self._feature.take(sl)
+            xi += off[:m]
+            x = Xf.take(xi)
+            right = x > self._threshold.take(sl)
+            if has_nan or self._zero is not None:
+                miss = np.isnan(x)
+                if self._zero is not None:
+                    miss |= self._zero.take(sl) & (np.abs(x) <= _LGB_ZERO)
+                right[miss] = ~self._nan_left.take(sl[miss])
+            sl += right
+            slot[:m] = self._child.take(sl)
+        return self._value.take(slot).reshape(T, n)
+
+    def predict(self, X, outputs=None) -> np.ndarray:
+        """(rows, len(outputs)) predictions; `outputs` are output indices (default all)."""
+        outputs = tuple(range(self.n_outputs) if outputs is None else outputs)
+        X = np.asarray(X, dtype=np.float32 if self.float32_input else np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected a (rows, {self.n_features}) feature matrix, got {X.shape}")
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        roots, tree_out, slots, active, inverse, starts, counts = self._plan(outputs)
+        out = np.zeros((len(X), len(outputs)))
+        if HAS_NUMBA:
+            # accumulate like the booster: XGBoost from base_score in float32, LightGBM in float64
+            out = np.tile(self.base[list(outputs)].astype(self._acc_value.dtype), (len(X), 1))
+            _traverse(X, self.feature, self.threshold, self.nan_left, self._zero_mask, self.child,
+                      self._acc_value, roots, tree_out, out)
+            return out.astype(np.float64, copy=False)
+        block = max(1, BLOCK_ELEMS // max(1, len(roots)))
+        for s in range(0, len(X) if len(roots) else 0, block):
+            Xb = X[s:s + block]
+            leaves = self._leaves(Xb.ravel(), len(Xb), slots, active)[inverse]
+            # tree-by-tree accumulation, the order the boosters sum in
+            out[s:s + block] = np.add.reduceat(leaves, starts, axis=0).T
+        # reduceat of an empty segment returns the next element instead of 0
+        out[:, counts == 0] = 0.0
+        return out + self.base[list(outputs)]
+
+def _depth(child, root):
+    # longest root-to-leaf path; leaves point to themselves
+    depth, stack = 0, [(root, 0)]
+    while stack:
+        i, d = stack.pop()
+        depth = max(depth, d)
+        if child[2 * i] != i:
+            stack += [(child[2 * i], d + 1), (child[2 * i + 1], d + 1)]
+    return depth
+
+def _booster(name, model):
+    if name == "lgbm":
+        return model.booster_ if hasattr(model, "booster_") else getattr(model, "booster", model)
+    return model.get_booster() if hasattr(model, "get_booster") else model
+
+def _tree_arrays(feature, threshold, nan_left, zero_missing, left, right, value):
+    # per-tree node arrays, root at 0
+    child = np.stack([np.asarray(left), np.asarray(right)], axis=1).ravel()
+    return dict(feature=np.asarray(feature, dtype=np.int64), threshold=np.asarray(threshold, dtype=np.float64),
+                nan_left=np.asarray(nan_left, dtype=bool), zero_missing=np.asarray(zero_missing, dtype=bool),
+                left=np.asarray(left, dtype=np.int64), right=np.asarray(right, dtype=np.int64),
+                value=np.asarray(value, dtype=np.float64), depth=_depth(child, 0))
+
+def _lgb_trees(booster):
+    d = booster.dump_model()
+    obj = d.get("objective", "regression").split()[0]
+    if obj not in _LGB_IDENTITY or d.get("num_tree_per_iteration", 1) != 1 or d.get("average_output"):
+        raise ValueError(f"flat inference supports single-output regression boosters, not objective {obj!r}")
+    trees = []
+    for info in d["tree_info"]:
+        cols = ([], [], [], [], [], [], [])
+
+        def add(feature, threshold, nan_left, zero, value):
+            i = len(cols[0])
+            for c, v in zip(cols, (feature, threshold, nan_left, zero, i, i, value)):
+                c.append(v)
+            return i
+
+        stack = [(info["tree_structure"], None, None)]
+        while stack:
+            s, parent, side = stack.pop()
+            if "leaf_value" in s:
+                i = add(0, 0.0, True, False, s["leaf_value"])
+            else:
+                if s["decision_type"] != "<=":
+                    raise ValueError("flat inference does not support categorical splits")
+                mt, thr = s["missing_type"], s["threshold"]
+                # missing_type None: NaN is compared as 0.0; Zero/NaN: missing goes the default way
+                i = add(s["split_feature"], thr, (0.0 <= thr) if mt == "None" else s["default_left"], mt == "Zero", 0.0)
+                stack += [(s["right_child"], i, 5), (s["left_child"], i, 4)]
+            if parent is not None:
+                cols[side][parent] = i
+        trees.append(_tree_arrays(*cols))
+    return trees, 0.0, False
+
+def _xgb_trees(booster):
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    obj = learner["objective"]["name"]
+    gb = learner["gradient_booster"]
+    if obj not in _XGB_IDENTITY or gb["name"] != "gbtree" or int(learner["learner_model_param"].get("num_target", 1)) != 1:
+        raise ValueError(f"flat inference supports single-output gbtree regression boosters, not {obj!r}")
+    raw = gb["model"]["trees"]
+    best = booster.attr("best_iteration")
+    if best is not None:
+        raw = raw[:gb["model"]["iteration_indptr"][int(best) + 1]]
+    trees = []
+    for t in raw:
+        if any(t["split_type"]):
+            raise ValueError("flat inference does not support categorical splits")
+        left, right = np.array(t["left_children"]), np.array(t["right_children"])
+        cond = np.array(t["split_conditions"], dtype=np.float32)
+        leaf = left == -1
+        ids = np.arange(len(left))
+        # XGBoost compares float32 values with `x < cond`, i.e. x <= the next float32 below cond
+        thr = np.nextafter(cond, np.float32(-np.inf)).astype(np.float64)
+        trees.append(_tree_arrays(np.where(leaf, 0, t["split_indices"]), thr, np.array(t["default_left"], dtype=bool),
+                                  np.zeros(len(left), dtype=bool), np.where(leaf, ids, left), np.where(leaf, ids, right),
+                                  np.where(leaf, cond.astype(np.float64), 0.0)))
+    return trees, float(learner["learner_model_param"]["base_score"]), True
+
+def flatten_boosters(name: str, models, n_features: int) -> FlatForest:
+    """One FlatForest holding every model in `models` as a separate output."""
+    parts = [(_lgb_trees if name == "lgbm" else _xgb_trees)(_booster(name, m)) for m in models]
+    cols = {k: [] for k in ("feature", "threshold", "nan_left", "zero_missing", "value")}
+    child, roots, out_ptr, depth, offset = [], [], [0], [], 0
+    for trees, _, _ in parts:
+        for t in trees:
+            for k in cols:
+                cols[k].append(t[k])
+            child.append(np.stack([t["left"], t["right"]], axis=1).ravel() + offset)
+            roots.append(offset)
+            depth.append(t["depth"])
+            offset += len(t["feature"])
+        out_ptr.append(len(roots))
+    cat = {k: np.concatenate(v) if v else np.zeros(0) for k, v in cols.items()}
+    zero = cat["zero_missing"].astype(bool)
+    return FlatForest(feature=cat["feature"].astype(np.int64), threshold=cat["threshold"].astype(np.float64),
+                      nan_left=cat["nan_left"].astype(bool),
+                      child=np.concatenate(child).astype(np.int64) if child else np.zeros(0, dtype=np.int64),
+                      value=cat["value"].astype(np.float64), roots=np.array(roots, dtype=np.int64),
+                      out_ptr=np.array(out_ptr, dtype=np.int64), base=np.array([b for _, b, _ in parts]),
+                      tree_depth=np.array(depth, dtype=np.int64), n_features=n_features, float32_input=any(f for _, _, f in parts),
+                      zero_missing=zero if zero.any() else None)
+
+class CompiledModel:
+    """Flat forest of a TrainedModel's base model and quantile models, one output each.
+
+    `predict(X, [None, 0.9, ...])` evaluates the requested outputs in a single
+    traversal (numba-compiled when numba is installed, else NumPy). Above
+    `max_rows` rows `predict_quantiles` keeps using the native boosters, which
+    are multi-threaded.
+    """
+
+    def __init__(self, trained: TrainedModel, quantiles=None, max_rows: int | None = None):
+        qm = trained.quantile_models or {}
+        self.keys = [None] + [q for q in (qm if quantiles is None else quantiles) if q in qm]
+        self.forest = flatten_boosters(trained.name, [trained.model] + [qm[q] for q in self.keys[1:]],
+                                       len(trained.features))
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.max_rows = MAX_ROWS.get(trained.name, 4096) if max_rows is None else max_rows
+        # JIT-compile (or load the cached kernel) now rather than on the first request
+        self.forest.predict(np.zeros((1, self.forest.n_features)))
+
+    def covers(self, quantiles) -> bool:
+        return all(q in self.index for q in quantiles)
+
+    def predict(self, X, quantiles=(None,)) -> np.ndarray:
+        return self.forest.predict(X, [self.index[q] for q in quantiles])
+
+def compile_model(model, quantiles=None, max_rows: int | None = None):
+    """Attach a CompiledModel to `model` (and to every shard); returns `model`.
+
+    Quantile boosters of lazily loaded artifacts are loaded here; pass
+    `quantiles` to compile only those.
+    """
+    if isinstance(model, ShardedModel):
+        for m in list(model.shards.values()) + ([model.fallback] if model.fallback is not None else []):
+            compile_model(m, quantiles, max_rows)
+        return model
+    model.compiled = CompiledModel(model, quantiles, max_rows)
+    return model
+
+def with_backend(model, cfg: dict):
+    """Compile `model` when config `inference_backend` is "flat"; returns it.
+
+    `flat_max_rows` overrides the per-booster batch size cutoff (MAX_ROWS).
+    """
+    backend = (cfg or {}).get("inference_backend", "native")
+    if backend not in ("native", "flat"):
+        raise ValueError(f"inference_backend must be 'native' or 'flat', got {backend!r}")
+    if backend == "flat" and not HAS_NUMBA:
+        # the NumPy traversal is slower than the native boosters; only the compiled kernel pays off
+        warnings.warn("inference_backend: flat needs numba; using the native boosters")
+    elif backend == "flat":
+        max_rows = cfg.get("flat_max_rows")
+        compile_model(model, max_rows=int(max_rows) if max_rows is not None else None)
+    return model
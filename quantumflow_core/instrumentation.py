@@ -0,0 +1,282 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+# ---- memory ----------------------------------------------------------------
+
+def rss_mb() -> float:
+    """Current resident set size of this process (0 where /proc is unavailable)."""
+    return _proc_status("VmRSS")
+
+def peak_rss_mb() -> float:
+    """Peak RSS since the last `reset_peak_rss` (Linux), else since process start."""
+    peak = _proc_status("VmHWM")
+    if peak:
+        return peak
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 1024)
+
+def reset_peak_rss() -> bool:
+    # Linux >= 4.0 resets VmHWM to the current RSS on "5" > clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _proc_status(key):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+# ---- stage timers ----------------------------------------------------------
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    peak_rss_mb: float = 0.0   # 0 unless the stage tracks memory
+
+class _Span:
+    __slots__ = ("name", "rows", "peak")
+
+    def __init__(self, name, rows):
+        self.name, self.rows, self.peak = name, rows, 0.0
+
+class StageRecorder:
+    """Wall time, row counts and peak RSS per named stage, aggregated over calls.
+
+    Stages nest; a stage's peak RSS includes its children's. Peak tracking
+    resets the process-wide high-water mark, so with several threads in
+    memory-tracked stages at once the peaks are only approximate. Hot paths
+    should use `timed(..., memory=False)`, which adds a couple of microseconds per call.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None, memory: bool = True):
+        stack = self._local.__dict__.setdefault("stack", [])
+        if memory:
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak_rss_mb())
+            reset_peak_rss()
+        span = _Span(name, rows)
+        stack.append(span)
+        t0 = time.perf_counter()
+        try:
+            yield span
+        finally:
+            dt = time.perf_counter() - t0
+            stack.pop()
+            peak = max(span.peak, peak_rss_mb()) if memory else 0.0
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            self.add(name, dt, span.rows, peak)
+
+    def add(self, name, seconds, rows=None, peak_mb=0.0):
+        with self._lock:
+            s = self._stats.get(name)
+            if s is None:
+                s = self._stats[name] = StageStats()
+            s.calls += 1
+            s.seconds += seconds
+            s.max_seconds = max(s.max_seconds, seconds)
+            s.rows += int(rows or 0)
+            s.peak_rss_mb = max(s.peak_rss_mb, peak_mb)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: StageStats(**asdict(v)) for k, v in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self) -> str:
+        rows = sorted(self.snapshot().items(), key=lambda kv: -kv[1].seconds)
+        lines = [f"{'stage':<28s} {'calls':>6s} {'seconds':>9s} {'rows':>12s} {'peak MB':>8s}"]
+        lines += [f"{k:<28s} {s.calls:6d} {s.seconds:9.3f} {s.rows:12,d} {s.peak_rss_mb:8.0f}" for k, s in rows]
+        return "\n".join(lines)
+
+    def mlflow_metrics(self, prefix: str = "stage") -> dict:
+        out = {}
+        for k, s in self.snapshot().items():
+            out[f"{prefix}_seconds.{k}"] = s.seconds
+            if s.rows:
+                out[f"{prefix}_rows.{k}"] = s.rows
+            if s.peak_rss_mb:
+                out[f"{prefix}_peak_rss_mb.{k}"] = s.peak_rss_mb
+        return out
+
+RECORDER = StageRecorder()
+
+def stage(name: str, rows: int | None = None, memory: bool = True):
+    """`with stage("features", rows=len(df)) as s: ...` on the process-wide recorder; `s.rows` may be set inside."""
+    return RECORDER.stage(name, rows, memory)
+
+def timed(name: str | None = None, rows_arg: int | None = 0, memory: bool = True):
+    """Decorator: record every call as a stage; rows = len() of positional argument `rows_arg`."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            n = None
+            if rows_arg is not None and len(args) > rows_arg and hasattr(args[rows_arg], "__len__"):
+                n = len(args[rows_arg])
+            if memory:
+                with RECORDER.stage(label, n):
+                    return fn(*args, **kwargs)
+            # hot paths: no context manager, no nesting bookkeeping
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                RECORDER.add(label, time.perf_counter() - t0, n)
+        return inner
+    return wrap
+
+# ---- profiling -------------------------------------------------------------
+
+class _Sampler(threading.Thread):
+    # folded stacks of one thread every `interval` seconds (flamegraph.pl / speedscope input)
+    def __init__(self, thread_id, interval):
+        super().__init__(name="qf-sampler", daemon=True)
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+@contextmanager
+def profiled(name: str, mode: str | None = None, out_dir: str = "artifacts/profiles", interval_ms: float = 5.0):
+    """Profile the enclosed block of the calling thread.
+
+    mode "cprofile": `<name>-<time>.prof` (pstats / snakeviz) plus a text top-40
+    by cumulative time; mode "sample": `<name>-<time>.folded` stack samples
+    every `interval_ms`. None / "none" / "off" does nothing. Worker processes
+    are not profiled.
+    """
+    if not mode or str(mode).lower() in ("none", "off", "false"):
+        yield None
+        return
+    if mode not in ("cprofile", "sample"):
+        raise ValueError(f"Unknown profile mode: {mode}")
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield base + ".prof"
+        finally:
+            prof.disable()
+            prof.dump_stats(base + ".prof")
+            text = io.StringIO()
+            pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(40)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+        return
+    sampler = _Sampler(threading.get_ident(), interval_ms / 1000.0)
+    sampler.start()
+    try:
+        yield base + ".folded"
+    finally:
+        sampler.stop()
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.writelines(f"{k} {v}\n" for k, v in sampler.stacks.most_common())
+
+# ---- Prometheus text format --------------------------------------------------
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(d):
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in d.items()) + "}" if d else ""
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set (Prometheus `histogram`)."""
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[0][i] += 1
+                    break
+            s[1] += 1
+            s[2] += value
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(dict(k), list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for labels, counts, n, total in series:
+            cum = 0
+            for b, c in zip(self.buckets, counts):
+                cum += c
+                out.append(f"{self.name}_bucket{_labels({**labels, 'le': repr(float(b))})} {cum}")
+            out.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {n}")
+            out.append(f"{self.name}_sum{_labels(labels)} {total}")
+            out.append(f"{self.name}_count{_labels(labels)} {n}")
+        return out
+
+def render_prometheus(histograms=(), recorder: StageRecorder = RECORDER, extra: dict | None = None) -> str:
+    """Exposition text: the histograms, stage totals of `recorder`, process memory and `extra` gauges."""
+    lines = []
+    for h in histograms:
+        lines += h.render()
+    stats = recorder.snapshot()
+    for metric, attr, kind, help in (
+            ("qf_stage_seconds_total", "seconds", "counter", "Wall time spent in the stage"),
+            ("qf_stage_calls_total", "calls", "counter", "Stage calls"),
+            ("qf_stage_rows_total", "rows", "counter", "Input rows processed by the stage"),
+            ("qf_stage_peak_rss_bytes", "peak_rss_mb", "gauge", "Largest peak RSS seen during the stage")):
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+        scale = 2**20 if attr == "peak_rss_mb" else 1
+        lines += [f"{metric}{_labels({'stage': k})} {getattr(s, attr) * scale}" for k, s in sorted(stats.items())]
+    gauges = {"qf_process_resident_memory_bytes": rss_mb() * 2**20, **(extra or {})}
+    for k, v in gauges.items():
+        lines += [f"# TYPE {k} gauge", f"{k} {float(v)}"]
+    return "\n".join(lines) + "\n"
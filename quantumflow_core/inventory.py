@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from typing import Optional, Dict
 import numpy as np
 import pandas as pd
+from scipy.special import ndtri
+from .validation import LEADTIME_VALIDATOR
 
 @dataclass
 class IndentPolicy:
@@ -11,7 +13,120 @@ class IndentPolicy:
     shelf_life_days: Optional[int] = None  # cap coverage if perishable
     reorder_point_days: int = 7            # fallback if no quantile
 
-_Z_FOR = {0.8:0.8416, 0.85:1.036, 0.9:1.2816, 0.95:1.6449, 0.975:1.96, 0.99:2.326}
+def service_level_z(service_level) -> np.ndarray:
+    """Exact standard-normal quantile for cycle service levels in (0, 1), vectorized."""
+    sl = np.asarray(service_level, dtype=np.float64)
+    if np.any((sl <= 0) | (sl >= 1)):
+        raise ValueError("service_level must be strictly between 0 and 1")
+    return ndtri(sl)
+
+def _round_orders(qty, mean, on_hand, moq, multiple, shelf_life_days):
+    # shelf-life cap, then rounding to multiple and MOQ; returns (qty, bound_reason)
+    shape = qty.shape
+    mult = np.broadcast_to(np.nan_to_num(np.asarray(multiple, dtype=np.float64), nan=1.0), shape)
+    moq = np.broadcast_to(np.nan_to_num(np.asarray(moq, dtype=np.float64), nan=0.0), shape)
+    shelf = np.broadcast_to(np.asarray(np.nan if shelf_life_days is None else shelf_life_days, dtype=np.float64), shape)
+    # perishables: never hold more than shelf-life days of mean demand
+    cap = np.where(np.isnan(shelf), np.inf, np.maximum(0.0, mean * shelf - on_hand))
+    capped = qty > cap
+    qty = np.minimum(qty, cap)
+    # Round to multiple (down instead of up when that would break the shelf-life cap) & MOQ
+    has_mult = mult > 1
+    step = np.where(has_mult, mult, 1.0)
+    up = step * np.ceil(qty / step)
+    rounded = np.where(up > cap, step * np.floor(qty / step), up)
+    qty = np.where(has_mult, rounded, qty)
+    moq_applied = (moq > 0) & (qty > 0) & (qty < moq)
+    qty = np.where(moq_applied, moq, qty)
+    # the binding constraint: an MOQ bump past the shelf-life cap is reported as such, not as the cap
+    reason = np.where(moq_applied & (qty > cap), "moq_over_shelf_life",
+                      np.where(capped, "shelf_life_cap",
+                               np.where(has_mult | moq_applied, "multiple/moq_applied", "reorder_gap")))
+    return qty, reason
+
+def plan_orders(daily_mean_demand, daily_std_demand, lead_time_days, on_hand, service_level=0.9,
+                moq=1, multiple=1, shelf_life_days=None) -> Dict[str, np.ndarray]:
+    """Vectorized `recommend_order` over all SKUs; every argument broadcasts.
+
+    shelf_life_days (NaN / None = not perishable) caps the order so stock on hand
+    plus the order covers at most shelf-life days of mean demand.
+    """
+    mean = np.asarray(daily_mean_demand, dtype=np.float64)
+    std = np.asarray(daily_std_demand, dtype=np.float64)
+    lt = np.asarray(lead_time_days, dtype=np.float64)
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    mean, std, lt, on_hand = np.broadcast_arrays(mean, std, lt, on_hand)
+    z = np.broadcast_to(service_level_z(service_level), mean.shape)
+    lead_mean = mean * lt
+    safety = z * std * np.sqrt(lt)
+    reorder_point = lead_mean + safety
+    qty = np.maximum(0.0, reorder_point - on_hand)
+    qty, reason = _round_orders(qty, mean, on_hand, moq, multiple, shelf_life_days)
+    return dict(reorder_point=reorder_point, safety_stock=safety, suggested_order=qty, bound_reason=reason)
+
+def plan_orders_from_quantiles(lead_demand_mean, lead_demand_quantile, on_hand, moq=1, multiple=1,
+                               shelf_life_days=None, daily_mean_demand=None) -> Dict[str, np.ndarray]:
+    """Plan from forecast lead-time demand instead of the normal approximation.
+
+    The reorder point is the lead-time demand quantile at the service level;
+    safety stock is its excess over the mean lead-time forecast. The shelf-life
+    cap needs `daily_mean_demand` and is skipped without it.
+    """
+    lead_mean = np.asarray(lead_demand_mean, dtype=np.float64)
+    lead_q = np.asarray(lead_demand_quantile, dtype=np.float64)
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    lead_mean, lead_q, on_hand = np.broadcast_arrays(lead_mean, lead_q, on_hand)
+    if daily_mean_demand is None:
+        # without a daily rate the shelf-life coverage cap cannot be applied
+        mean, shelf_life_days = np.zeros(lead_mean.shape), None
+    else:
+        mean = np.asarray(daily_mean_demand, dtype=np.float64)
+    reorder_point = np.maximum(lead_q, 0.0)
+    safety = np.maximum(reorder_point - lead_mean, 0.0)
+    qty = np.maximum(0.0, reorder_point - on_hand)
+    qty, reason = _round_orders(qty, mean, on_hand, moq, multiple, shelf_life_days)
+    return dict(reorder_point=reorder_point, safety_stock=safety, suggested_order=qty, bound_reason=reason)
+
+def _model_quantiles(trained):
+    if hasattr(trained, "shards"):
+        trained = trained.fallback or next(iter(trained.shards.values()), None)
+    return sorted((getattr(trained, "quantile_models", None) or {}).keys())
+
+def lead_time_quantile_demand(trained, future: pd.DataFrame, lead_times: pd.DataFrame, service_level=0.9) -> pd.DataFrame:
+    """Lead-time demand per SKU from the model's daily mean and quantile forecasts.
+
+    `future` holds daily feature rows per SKU (SKU_ID, Date, model features) from
+    the day after planning onwards; `lead_times` has SKU_ID, Lead_Time_Days. Rows
+    within each SKU's lead time are predicted in one batched call per model and
+    summed (channels add up). The quantile model used is the smallest trained
+    level >= service_level; ValueError if there is none. Summing daily quantiles
+    is conservative: it equals the lead-time quantile only for perfectly
+    correlated days. SKUs whose
+    forecast covers fewer days than the lead time are scaled up pro rata.
+    """
+    from .models import predict
+    qs = _model_quantiles(trained)
+    if not qs:
+        raise ValueError("Model has no quantile models; use the normal-approximation planner")
+    q = next((x for x in qs if x >= service_level - 1e-9), None)
+    if q is None:
+        raise ValueError(f"No trained quantile reaches service level {service_level} (highest {qs[-1]}); "
+                         "use the normal-approximation planner or train that quantile")
+    f = future.merge(lead_times[["SKU_ID", "Lead_Time_Days"]], on="SKU_ID", how="inner")
+    f["Date"] = pd.to_datetime(f["Date"])
+    day = (f["Date"] - f.groupby("SKU_ID", observed=True)["Date"].transform("min")).dt.days
+    f = f[day < f["Lead_Time_Days"]].reset_index(drop=True)
+    mean_pred = np.asarray(predict(trained, f), dtype=np.float64)
+    q_pred = np.asarray(predict(trained, f, quantile=q), dtype=np.float64)
+    codes, skus = pd.factorize(f["SKU_ID"])
+    lead_mean = np.bincount(codes, weights=mean_pred, minlength=len(skus))
+    lead_q = np.bincount(codes, weights=q_pred, minlength=len(skus))
+    covered = f.groupby(codes)["Date"].nunique().reindex(range(len(skus))).to_numpy(dtype=np.float64)
+    lt = f.groupby(codes)["Lead_Time_Days"].first().reindex(range(len(skus))).to_numpy(dtype=np.float64)
+    scale = np.where(covered > 0, lt / np.maximum(covered, 1), 1.0)
+    return pd.DataFrame({"SKU_ID": skus, "lead_demand_mean": lead_mean * scale, "lead_demand_quantile": lead_q * scale,
+                         "daily_mean_demand": lead_mean / np.maximum(covered, 1), "quantile_used": q,
+                         "days_covered": covered})
 
 def recommend_order(
     daily_mean_demand: float,
@@ -20,20 +135,72 @@ def recommend_order(
     on_hand: float,
     policy: IndentPolicy
 ) -> Dict:
-    z = _Z_FOR.get(round(policy.service_level,3), 1.28)
-    lead_mean = daily_mean_demand * lead_time_days
-    lead_std = daily_std_demand * np.sqrt(lead_time_days)
-    safety = z * lead_std
-    reorder_point = lead_mean + safety
-    qty = max(0.0, reorder_point - on_hand)
-    # Round to multiple & MOQ
-    if policy.multiple > 1:
-        qty = policy.multiple * int(np.ceil(qty / policy.multiple))
-    if policy.moq and qty < policy.moq and qty > 0:
-        qty = policy.moq
+    rec = plan_orders(daily_mean_demand, daily_std_demand, lead_time_days, on_hand,
+                      service_level=policy.service_level, moq=policy.moq or 0, multiple=policy.multiple,
+                      shelf_life_days=policy.shelf_life_days)
     return dict(
-        reorder_point=reorder_point,
-        safety_stock=safety,
-        suggested_order=float(qty),
-        bound_reason="multiple/moq_applied" if (policy.multiple>1 or (policy.moq and qty>0 and qty<policy.moq)) else "reorder_gap"
+        reorder_point=float(rec["reorder_point"]),
+        safety_stock=float(rec["safety_stock"]),
+        suggested_order=float(rec["suggested_order"]),
+        bound_reason=str(rec["bound_reason"])
     )
+
+def load_planning_table(leadtime_path: str, policy_path: Optional[str] = None) -> pd.DataFrame:
+    """Per-SKU planning inputs (LeadTimeRow columns) with defaults filled in.
+
+    `policy_path` optionally supplies Order_Multiple / MOQ / Shelf_Life_Days for
+    SKUs whose lead-time file lacks them.
+    """
+    lt = pd.read_csv(leadtime_path, dtype={"SKU_ID": str})
+    LEADTIME_VALIDATOR.validate(lt).raise_for_errors()
+    if policy_path:
+        pol = pd.read_csv(policy_path, dtype={"SKU_ID": str})
+        cols = [c for c in ["Order_Multiple", "MOQ", "Shelf_Life_Days"] if c in pol.columns]
+        if "SKU_ID" in pol.columns and cols:
+            lt = lt.merge(pol[["SKU_ID"] + cols], on="SKU_ID", how="left", suffixes=("", "_policy"))
+            for c in cols:
+                if f"{c}_policy" in lt.columns:
+                    lt[c] = lt[c].fillna(lt.pop(f"{c}_policy"))
+    for c, default in (("Order_Multiple", 1), ("MOQ", 0), ("Shelf_Life_Days", np.nan)):
+        if c not in lt.columns:
+            lt[c] = default
+    lt["Order_Multiple"] = lt["Order_Multiple"].fillna(1)
+    lt["MOQ"] = lt["MOQ"].fillna(0)
+    return lt[["SKU_ID", "Lead_Time_Days", "Order_Multiple", "MOQ", "Shelf_Life_Days"]]
+
+def plan_orders_frame(demand: pd.DataFrame, planning: Optional[pd.DataFrame] = None, service_level=0.9,
+                      mode: str = "normal") -> pd.DataFrame:
+    """Plan all SKUs of `demand` in one vectorized pass.
+
+    mode="normal": `demand` has SKU_ID, daily_mean_demand, daily_std_demand, on_hand.
+    mode="quantile": `demand` has SKU_ID, lead_demand_mean, lead_demand_quantile,
+    on_hand (see `lead_time_quantile_demand`).
+    Lead time, MOQ, multiple and shelf life come from `planning`
+    (`load_planning_table`) unless `demand` carries them itself.
+    """
+    df = demand.copy()
+    if planning is not None:
+        df = df.merge(planning, on="SKU_ID", how="left", suffixes=("", "_plan"))
+        for c in planning.columns:
+            if f"{c}_plan" in df.columns:
+                df[c] = df[c].fillna(df.pop(f"{c}_plan"))
+    rounding = dict(moq=df["MOQ"].values if "MOQ" in df.columns else 0,
+                    multiple=df["Order_Multiple"].values if "Order_Multiple" in df.columns else 1,
+                    shelf_life_days=df["Shelf_Life_Days"].values if "Shelf_Life_Days" in df.columns else None)
+    if mode == "quantile":
+        rec = plan_orders_from_quantiles(df["lead_demand_mean"].values, df["lead_demand_quantile"].values,
+                                         df["on_hand"].values, daily_mean_demand=df.get("daily_mean_demand"),
+                                         **rounding)
+    elif mode == "normal":
+        lt = df["Lead_Time_Days"] if "Lead_Time_Days" in df.columns else pd.Series(np.nan, index=df.index)
+        if lt.isna().any():
+            raise ValueError(f"No Lead_Time_Days for SKUs: {df.loc[lt.isna(), 'SKU_ID'].head(10).tolist()}")
+        rec = plan_orders(df["daily_mean_demand"].values, df["daily_std_demand"].values, lt.values, df["on_hand"].values,
+                          service_level=df["service_level"].values if "service_level" in df.columns else service_level,
+                          **rounding)
+    else:
+        raise ValueError(f"Unknown planning mode: {mode}")
+    out = df[["SKU_ID"]].copy()
+    for k, v in rec.items():
+        out[k] = v
+    return out
@@ -1,26 +1,85 @@
 import os
+from io import BufferedReader, RawIOBase
 import pandas as pd
 from typing import Optional
+from .validation import SALES_VALIDATOR
 try:
     from google.cloud import storage
     HAS_GCS = True
 except Exception:
     HAS_GCS = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except Exception:
+    HAS_ARROW = False
 
-def read_csv(path: str) -> pd.DataFrame:
-    if path.startswith("gs://"):
-        if not HAS_GCS:
-            raise RuntimeError("google-cloud-storage not installed for GCS paths")
-        bucket, *prefix = path.replace("gs://","",1).split("/",1)
-        prefix = prefix[0] if prefix else ""
-        client = storage.Client()
-        blob = client.bucket(bucket).blob(prefix)
-        data = blob.download_as_bytes()
-        from io import BytesIO
-        return pd.read_csv(BytesIO(data))
+# dtypes assigned once at ingestion; nullable integer columns use pandas' Int32
+SALES_DTYPES = {
+    "SKU_ID": "category", "Sales_Channel": "category", "Sales_Quantity": "float32",
+    "Price": "float32", "Promotion_Active": "Int32", "Discount_Percentage": "float32", "Holiday_Flag": "Int32",
+}
+_CATEGORICAL = ["SKU_ID", "Sales_Channel"]
+_SOURCE_KEY = b"qf_source"
+
+class LocalBlob:
+    """Stand-in for a GCS blob over a local file (size / ranged download_as_bytes)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.generation = int(os.path.getmtime(path) * 1e6)
+        self.requests = 0
+
+    def download_as_bytes(self, start=None, end=None):
+        self.requests += 1
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            return f.read(-1 if end is None else end - (start or 0) + 1)
+
+class RangedReader(RawIOBase):
+    """Sequential file object over a blob, fetched in `block_size` ranged reads."""
+
+    def __init__(self, blob, block_size=8 << 20):
+        if getattr(blob, "size", None) is None:
+            blob.reload()
+        self.blob = blob
+        self.size = blob.size
+        self.block_size = block_size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.pos >= self.size:
+            return 0
+        n = min(len(b), self.block_size, self.size - self.pos)
+        # GCS ranges are inclusive at both ends
+        data = self.blob.download_as_bytes(start=self.pos, end=self.pos + n - 1)
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+def _gcs_blob(path):
+    if not HAS_GCS:
+        raise RuntimeError("google-cloud-storage not installed for GCS paths")
+    bucket, *prefix = path.replace("gs://","",1).split("/",1)
+    return storage.Client().bucket(bucket).blob(prefix[0] if prefix else "")
+
+def open_source(path, blob=None, block_size=8 << 20):
+    """Binary file object for a local path or gs:// URL (ranged reads, no full download)."""
+    if blob is not None or path.startswith("gs://"):
+        blob = blob if blob is not None else _gcs_blob(path)
+        return BufferedReader(RangedReader(blob, block_size=block_size), buffer_size=block_size)
     if not os.path.exists(path):
         raise FileNotFoundError(path)
-    return pd.read_csv(path)
+    return open(path, "rb")
+
+def read_csv(path: str) -> pd.DataFrame:
+    with open_source(path) as f:
+        return pd.read_csv(f)
 
 def ensure_columns(df, cols, name=""):
     missing = [c for c in cols if c not in df.columns]
@@ -31,3 +90,95 @@ def ensure_columns(df, cols, name=""):
 def write_parquet(df, path: str):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     df.to_parquet(path, index=False)
+
+# -- typed, chunked sales ingestion -----------------------------------------
+def _parse_dates(s):
+    try:
+        return pd.to_datetime(s, format="%Y-%m-%d")
+    except (ValueError, TypeError):
+        return pd.to_datetime(s, errors="coerce")
+
+def iter_sales_chunks(path, chunksize=500_000, blob=None, errors="raise"):
+    """Stream sales.csv as typed chunks (categories, float32, datetime64).
+
+    Chunks are checked with the columnar SalesRow validator; invalid rows raise
+    ValueError (errors="raise") or are dropped ("drop").
+    Category levels are per chunk; `load_sales` unifies them.
+    """
+    with open_source(path, blob=blob) as f:
+        dtype = dict(SALES_DTYPES, Date=str)
+        start = 0
+        for chunk in pd.read_csv(f, chunksize=chunksize, dtype=dtype):
+            # unparseable dates become NaT and are reported as nulls
+            chunk["Date"] = _parse_dates(chunk["Date"])
+            report = SALES_VALIDATOR.validate(chunk)
+            if not report.ok:
+                if errors == "raise":
+                    for smp in report.samples:
+                        smp["row"] += start
+                    raise ValueError(report.summary())
+                chunk = chunk[~report.invalid]
+            start += report.n_rows
+            yield chunk
+
+def _source_signature(path, blob=None):
+    if blob is not None:
+        return f"{path}|{blob.size}|{getattr(blob, 'generation', '')}"
+    if path.startswith("gs://"):
+        b = _gcs_blob(path)
+        b.reload()
+        return f"{path}|{b.size}|{b.generation}"
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+def _cached_signature(parquet_path):
+    if not os.path.exists(parquet_path):
+        return None
+    meta = pq.read_schema(parquet_path).metadata or {}
+    return meta.get(_SOURCE_KEY, b"").decode() or None
+
+def load_sales(path, parquet_path: Optional[str]=None, chunksize=500_000, blob=None, errors="raise") -> pd.DataFrame:
+    """Typed sales frame, converted to Parquet once and reused afterwards.
+
+    The CSV (local or gs://) is streamed in chunks into `parquet_path`; later
+    calls read the Parquet copy directly while the source is unchanged. Without
+    pyarrow or a `parquet_path` the chunks are concatenated in memory.
+    """
+    if not (HAS_ARROW and parquet_path):
+        chunks = list(iter_sales_chunks(path, chunksize=chunksize, blob=blob, errors=errors))
+        for c in _CATEGORICAL:
+            levels = pd.api.types.union_categoricals([ch[c] for ch in chunks]).categories
+            for ch in chunks:
+                ch[c] = ch[c].cat.set_categories(levels)
+        return pd.concat(chunks, ignore_index=True)
+    sig = _source_signature(path, blob)
+    if _cached_signature(parquet_path) != sig:
+        os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
+        tmp = parquet_path + ".tmp"
+        writer = None
+        try:
+            for chunk in iter_sales_chunks(path, chunksize=chunksize, blob=blob, errors=errors):
+                t = pa.Table.from_pandas(chunk, preserve_index=False)
+                # chunk-local dictionaries -> plain strings; re-dictionary-encoded on read
+                t = t.cast(pa.schema([pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f
+                                      for f in t.schema]))
+                if writer is None:
+                    schema = t.schema.with_metadata({_SOURCE_KEY: sig.encode()})
+                    writer = pq.ParquetWriter(tmp, schema)
+                writer.write_table(t.replace_schema_metadata(schema.metadata))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError(f"sales: no rows in {path}")
+        os.replace(tmp, parquet_path)
+    return read_sales_parquet(parquet_path)
+
+def read_sales_parquet(path, columns=None) -> pd.DataFrame:
+    cols = pq.read_schema(path).names
+    t = pq.read_table(path, columns=columns, read_dictionary=[c for c in _CATEGORICAL if c in cols])
+    df = t.to_pandas(ignore_metadata=True)
+    for c, dt in SALES_DTYPES.items():
+        if c in df.columns and dt != "category":
+            df[c] = df[c].astype(dt)
+    return df
@@ -5,8 +5,12 @@ from dataclasses import dataclass
 from typing import Dict, Tuple, List
 from sklearn.model_selection import ParameterGrid
 from sklearn.metrics import mean_squared_error
+from joblib import Parallel, delayed
 from .evaluation import blocked_cv_slices, rmse
+from .instrumentation import timed
 import warnings
+import time
+import re
 
 try:
     import lightgbm as lgb
@@ -36,6 +40,28 @@ class TrainedModel:
     model: object
     features: List[str]
     quantile_models: Dict[float, object] | None = None
+    fit_times: List[Dict] | None = None
+    # inference.CompiledModel: flat NumPy trees used by predict_array for small batches
+    compiled: object | None = None
+
+@dataclass
+class ShardedModel:
+    """One TrainedModel per value of `key_cols` (e.g. per channel or SKU cluster).
+
+    `key_map` optionally maps SKU_ID to key columns that are not part of the
+    feature frame (e.g. a Cluster column from a shard map CSV). Rows whose key
+    has no shard are served by `fallback`.
+    """
+    key_cols: List[str]
+    shards: Dict[tuple, TrainedModel]
+    fallback: TrainedModel | None = None
+    key_map: pd.DataFrame | None = None
+    name: str = "sharded"
+
+    @property
+    def features(self) -> List[str]:
+        m = self.fallback or next(iter(self.shards.values()), None)
+        return list(m.features) if m is not None else list(FEATURES_BASE)
 
 def _fit_lgbm(X, y, params):
     if not HAS_LGB:
@@ -51,7 +77,40 @@ def _fit_xgb(X, y, params):
     model.fit(X, y)
     return model
 
-def select_and_train(df: pd.DataFrame, target="Sales_Quantity", n_splits=3) -> TrainedModel:
+def _fit(name, X, y, params):
+    if name == "lgbm":
+        return _fit_lgbm(X, y, params)
+    return _fit_xgb(X, y, params)
+
+def _timed_fit(name, X, y, params, tag, X_val=None):
+    # runs inside a pool worker; CV fits ship back only their predictions
+    t0 = time.perf_counter()
+    m = _fit(name, X, y, params)
+    out = m.predict(X_val) if X_val is not None else m
+    return out, dict(tag, seconds=time.perf_counter() - t0)
+
+def _thread_budget(n_jobs, n_tasks):
+    """Split `n_jobs` cores into (pool workers, booster threads per worker)."""
+    if n_jobs is None:
+        return 1, None
+    n_jobs = max(1, int(n_jobs))
+    workers = max(1, min(n_jobs, n_tasks))
+    return workers, max(1, n_jobs // workers)
+
+def _with_threads(params, threads):
+    if threads is None:
+        return params
+    return dict(params, n_jobs=threads)
+
+@timed("select_and_train")
+def select_and_train(df: pd.DataFrame, target="Sales_Quantity", n_splits=3, n_jobs: int | None = None) -> TrainedModel:
+    """Blocked-CV model selection, then final + quantile fits.
+
+    `n_jobs` is the total core budget (config `parallel_jobs`): CV fold fits and
+    the final/quantile fits each run in a process pool, and the cores left per
+    worker are handed to LightGBM/XGBoost `n_jobs`. None keeps the sequential
+    path with the boosters' default threading.
+    """
     X = df[FEATURES_BASE].values
     y = df[target].values
     # Candidate specs
@@ -63,45 +122,117 @@ def select_and_train(df: pd.DataFrame, target="Sales_Quantity", n_splits=3) -> T
     if not specs:
         raise RuntimeError("No GBM backend available (LightGBM or XGBoost).")
 
+    fit_times = []
+    folds = list(blocked_cv_slices(len(y), n_splits=n_splits))
+    # lightweight blocked CV, all specs x folds at once
+    workers, threads = _thread_budget(n_jobs, len(specs) * len(folds))
+    jobs = [delayed(_timed_fit)(spec.name, X[tr], y[tr], _with_threads(spec.params, threads),
+                                dict(stage="cv", model=spec.name, fold=i, threads=threads), X[va])
+            for spec in specs for i, (tr, va) in enumerate(folds)]
+    results = Parallel(n_jobs=workers)(jobs)
     best = None
     best_rmse = 1e18
-
-    for spec in specs:
-        # lightweight blocked CV
+    for k, spec in enumerate(specs):
         rmses = []
-        for tr, va in blocked_cv_slices(len(y), n_splits=n_splits):
-            Xtr, Xva = X[tr], X[va]
-            ytr, yva = y[tr], y[va]
-            if spec.name == "lgbm":
-                m = _fit_lgbm(Xtr, ytr, spec.params)
-            else:
-                m = _fit_xgb(Xtr, ytr, spec.params)
-            pred = m.predict(Xva)
-            rmses.append(rmse(yva, pred))
+        for i, (tr, va) in enumerate(folds):
+            pred, timing = results[k * len(folds) + i]
+            rmses.append(rmse(y[va], pred))
+            fit_times.append(timing)
         cv_rmse = float(np.mean(rmses))
         if cv_rmse < best_rmse:
             best_rmse = cv_rmse
             best = spec
 
-    # Train on full data
-    if best.name == "lgbm":
-        base_model = _fit_lgbm(X, y, best.params)
-    else:
-        base_model = _fit_xgb(X, y, best.params)
-
-    # Quantile models (LightGBM only)
+    # Train on full data; quantile models (LightGBM only) alongside the base model
     quantiles = [0.5, 0.8, 0.9, 0.95]
-    q_models = {}
+    fits = [(None, best.params)]
     if best.name == "lgbm":
-        for q in quantiles:
-            q_params = dict(best.params)
-            q_params.update(objective="quantile", alpha=q)
-            q_models[q] = _fit_lgbm(X, y, q_params)
+        fits += [(q, dict(best.params, objective="quantile", alpha=q)) for q in quantiles]
+    workers, threads = _thread_budget(n_jobs, len(fits))
+    jobs = [delayed(_timed_fit)(best.name, X, y, _with_threads(params, threads),
+                                dict(stage="final" if q is None else "quantile", model=best.name, quantile=q, threads=threads))
+            for q, params in fits]
+    results = Parallel(n_jobs=workers)(jobs)
+    base_model = results[0][0]
+    q_models = {q: m for (q, _), (m, _) in zip(fits[1:], results[1:])}
+    fit_times += [timing for _, timing in results]
+
+    return TrainedModel(name=best.name, model=base_model, features=list(FEATURES_BASE), quantile_models=q_models or None,
+                        fit_times=fit_times)
+
+def _shard_groups(df, key_cols, key_map=None):
+    # positional row indices per shard key, keys normalised to tuples
+    missing = [c for c in key_cols if c not in df.columns]
+    if missing:
+        if key_map is None:
+            raise ValueError(f"shard key columns missing: {missing}")
+        km = key_map.drop_duplicates("SKU_ID").set_index("SKU_ID")
+        df = pd.DataFrame({c: df[c].values if c in df.columns else df["SKU_ID"].map(km[c]).values for c in key_cols})
+    idx = df.groupby(key_cols, sort=False, dropna=False, observed=True).indices
+    return {(k if isinstance(k, tuple) else (k,)): v for k, v in idx.items()}
+
+def _train_shard(key, sub, target, n_splits, n_jobs):
+    t0 = time.perf_counter()
+    m = select_and_train(sub, target=target, n_splits=n_splits, n_jobs=n_jobs)
+    return key, m, time.perf_counter() - t0
+
+@timed("select_and_train_sharded")
+def select_and_train_sharded(df: pd.DataFrame, shard_by, target="Sales_Quantity", n_splits=3, n_jobs: int | None = None,
+                             min_rows: int = 200, key_map: pd.DataFrame | None = None, fallback: bool = True) -> ShardedModel:
+    """Train one model per shard of `df` in a worker pool.
 
-    return TrainedModel(name=best.name, model=base_model, features=list(FEATURES_BASE), quantile_models=q_models or None)
+    Shards are trained concurrently, each with `n_jobs // workers` cores for its
+    own CV/quantile fits. Shards with fewer than `min_rows` rows are left to the
+    global fallback model, which is trained on the full frame when `fallback`.
+    """
+    key_cols = [shard_by] if isinstance(shard_by, str) else list(shard_by)
+    groups = _shard_groups(df, key_cols, key_map)
+    keys = [k for k, idx in groups.items() if len(idx) >= min_rows]
+    workers, threads = _thread_budget(n_jobs, len(keys))
+    # iloc keeps every shard in input (Date) order, as blocked CV expects
+    results = Parallel(n_jobs=workers)(
+        delayed(_train_shard)(k, df.iloc[groups[k]], target, n_splits, threads) for k in keys)
+    shards = {}
+    for key, m, seconds in results:
+        m.fit_times = (m.fit_times or []) + [dict(stage="shard", shard=list(key), rows=int(len(groups[key])), seconds=seconds)]
+        shards[key] = m
+    fb = select_and_train(df, target=target, n_splits=n_splits, n_jobs=n_jobs) if fallback else None
+    return ShardedModel(key_cols=key_cols, shards=shards, fallback=fb, key_map=key_map)
 
+def _slug(key):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", "__".join(str(k) for k in key))
+
+def _predict_sharded(sm: ShardedModel, df_future: pd.DataFrame, quantile: float | None = None) -> np.ndarray:
+    # one batched predict per shard, scattered back into row order
+    out = np.full(len(df_future), np.nan)
+    for key, idx in _shard_groups(df_future, sm.key_cols, sm.key_map).items():
+        m = sm.shards.get(key)
+        if m is None:
+            m = sm.shards.get(tuple(str(k) for k in key), sm.fallback)
+        if m is None:
+            raise KeyError(f"No shard for {dict(zip(sm.key_cols, key))} and no fallback model")
+        out[idx] = predict(m, df_future.iloc[idx], quantile=quantile)
+    return out
+
+@timed("predict", rows_arg=1, memory=False)
 def predict(trained: TrainedModel, df_future: pd.DataFrame, quantile: float | None = None) -> np.ndarray:
-    X = df_future[trained.features].values
-    if quantile is not None and trained.quantile_models and quantile in trained.quantile_models:
-        return trained.quantile_models[quantile].predict(X)
-    return trained.model.predict(X)
+    if isinstance(trained, ShardedModel):
+        return _predict_sharded(trained, df_future, quantile=quantile)
+    return predict_array(trained, df_future[trained.features].values, quantile=quantile)
+
+def predict_array(trained: TrainedModel, X: np.ndarray, quantile: float | None = None) -> np.ndarray:
+    """predict on a prebuilt feature matrix whose columns follow `trained.features`."""
+    return predict_quantiles(trained, X, [quantile])[:, 0]
+
+def predict_quantiles(trained: TrainedModel, X: np.ndarray, quantiles=(None,)) -> np.ndarray:
+    """(rows, len(quantiles)) predictions; None (or a quantile without a model) is the base model.
+
+    With a compiled model and at most `compiled.max_rows` rows, all columns
+    come from one traversal of the flat trees; otherwise each booster predicts.
+    """
+    qm = trained.quantile_models or {}
+    keys = [q if q is not None and q in qm else None for q in quantiles]
+    c = getattr(trained, "compiled", None)
+    if c is not None and len(X) <= c.max_rows and c.covers(keys):
+        return c.predict(X, keys)
+    return np.column_stack([(qm[q] if q is not None else trained.model).predict(X) for q in keys])
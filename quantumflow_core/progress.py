@@ -0,0 +1,25 @@
+import json
+import os
+import time
+
+PROGRESS_ENV = "QF_PROGRESS_FILE"
+
+def write_progress(stage: str, fraction: float, path: str | None = None, **extra):
+    """Report progress of a background job (no-op unless `path` or QF_PROGRESS_FILE is set).
+
+    The file is replaced atomically, so readers never see a partial write.
+    """
+    path = path or os.environ.get(PROGRESS_ENV)
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(stage=stage, fraction=round(float(fraction), 4), time=time.time(), **extra), f)
+    os.replace(tmp, path)
+
+def read_progress(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
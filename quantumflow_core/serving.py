@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from .features import SERIES_KEYS
+from .dates import to_days, calendar_arrays
+
+LAGS = (1, 7, 14)
+ROLLS = (7, 28)
+
+def _window_stats(hist, gap, W):
+    # shift(1) rolling mean/std over the known part of the window [d-W, d-1];
+    # hist[:, -1] is the last observed day, `gap` = days between it and d
+    depth = hist.shape[1]
+    col = np.arange(depth)[None, :]
+    lo = (depth - 1 + gap - W)[:, None]
+    hi = np.minimum(depth - 1, depth - 2 + gap)[:, None]
+    mask = (col >= lo) & (col <= hi) & ~np.isnan(hist)
+    v = np.where(mask, hist, 0.0)
+    cnt = mask.sum(axis=1)
+    enough = cnt >= max(2, W // 2)
+    safe = np.where(enough, cnt, 2)
+    mean = v.sum(axis=1) / safe
+    var = np.where(mask, (hist - mean[:, None]) ** 2, 0.0).sum(axis=1) / (safe - 1)
+    return np.where(enough, mean, np.nan), np.where(enough, np.sqrt(var), np.nan)
+
+def lag_roll_from_history(hist, gap, lags=LAGS, rolls=ROLLS) -> dict:
+    """Lag/rolling features for rows `gap` days after the end of each history row.
+
+    Positions that would fall after the last observed day are unknown (NaN);
+    for gap == 1 this reproduces `add_lags_rollups` exactly.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    gap = np.asarray(gap, dtype=np.int64)
+    depth = hist.shape[1]
+    rows = np.arange(len(hist))
+    out = {}
+    for L in lags:
+        pos = depth - 1 + gap - L
+        ok = (pos >= 0) & (pos <= depth - 1)
+        out[f"lag_{L}"] = np.where(ok, hist[rows, np.clip(pos, 0, depth - 1)], np.nan)
+    for W in rolls:
+        out[f"roll_mean_{W}"], out[f"roll_std_{W}"] = _window_stats(hist, gap, W)
+    return out
+
+class SeriesStateTable:
+    """In-memory per-series tail of the target, for feature building at serving time.
+
+    `history` is [n_series, depth], right-aligned on each series' last observed
+    day (`last_day`, days since epoch). Next-day lag/rolling features are
+    precomputed at load, so the common one-step-ahead request is a gather.
+    """
+
+    def __init__(self, keys, history, last_day, lags=LAGS, rolls=ROLLS, next_day=None):
+        self.keys = [tuple(k) for k in keys]
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.history = np.asarray(history, dtype=np.float64)
+        self.last_day = np.asarray(last_day, dtype=np.int64)
+        self.lags, self.rolls = tuple(lags), tuple(rolls)
+        if next_day is None:
+            next_day = lag_roll_from_history(self.history, np.ones(len(self.keys), dtype=np.int64), self.lags, self.rolls)
+        self.next_day = next_day
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_tail(cls, tail: pd.DataFrame, key_cols=None, target_col="Sales_Quantity", depth=28):
+        """Build from long rows (keys, Date, target), e.g. `FeatureStore.state()` or raw sales."""
+        key_cols = list(key_cols or SERIES_KEYS)
+        t = tail[key_cols + ["Date", target_col]].copy()
+        t["Date"] = pd.to_datetime(t["Date"])
+        t = t.sort_values(key_cols + ["Date"]).groupby(key_cols, sort=False, observed=True).tail(depth)
+        g = t.groupby(key_cols, sort=False, observed=True)
+        pos = depth - 1 - (g.cumcount(ascending=False)).to_numpy()
+        sid = g.ngroup().to_numpy()
+        hist = np.full((g.ngroups, depth), np.nan)
+        hist[sid, pos] = t[target_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        last = g["Date"].max()
+        keys = [k if isinstance(k, tuple) else (k,) for k in last.index]
+        return cls(keys, hist, to_days(last.values))
+
+    def save(self, path):
+        """Write the table as .npy arrays + keys.json, so `load` can memory-map it."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "history.npy"), self.history)
+        np.save(os.path.join(path, "last_day.npy"), self.last_day)
+        names = sorted(self.next_day)
+        np.save(os.path.join(path, "next_day.npy"), np.stack([self.next_day[k] for k in names]) if names
+                else np.zeros((0, len(self.keys))))
+        with open(os.path.join(path, "keys.json"), "w", encoding="utf-8") as f:
+            json.dump({"keys": [list(map(str, k)) for k in self.keys], "lags": list(self.lags),
+                       "rolls": list(self.rolls), "next_day": names}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a saved table; with `mmap` the arrays are read-only views of the files,
+        so worker processes serving the same snapshot share their pages."""
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "keys.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        nd = np.load(os.path.join(path, "next_day.npy"), mmap_mode=mode)
+        return cls(meta["keys"], np.load(os.path.join(path, "history.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "last_day.npy"), mmap_mode=mode), meta["lags"], meta["rolls"],
+                   next_day={k: nd[i] for i, k in enumerate(meta["next_day"])})
+
+    def lookup(self, *key_arrays) -> np.ndarray:
+        """Row index per request row; -1 for unknown series."""
+        get = self.index.get
+        return np.fromiter((get(k, -1) for k in zip(*key_arrays)), dtype=np.int64, count=len(key_arrays[0]))
+
+    def features(self, sid, days, promo=None) -> dict:
+        """Feature columns (name -> array) for request rows of series `sid` on `days`."""
+        n = len(sid)
+        known = sid >= 0
+        s = np.where(known, sid, 0)
+        gap = np.where(known, days - self.last_day[s], 0) if len(self.keys) else np.zeros(n, dtype=np.int64)
+        cols = calendar_arrays(days)
+        cols["Promo_Flag"] = np.zeros(n) if promo is None else np.asarray(promo, dtype=np.float64)
+        if len(self.keys):
+            one = gap == 1
+            lagged = {k: v[s] for k, v in self.next_day.items()}
+            if not one.all():
+                far = np.flatnonzero(~one)
+                recomputed = lag_roll_from_history(self.history[s[far]], gap[far], self.lags, self.rolls)
+                for k, v in recomputed.items():
+                    lagged[k][far] = v
+        else:
+            lagged = {k: np.full(n, np.nan) for k in self.next_day}
+        for k, v in lagged.items():
+            v[~known] = np.nan
+            cols[k] = v
+        return cols
+
+def feature_matrix(cols: dict, features) -> np.ndarray:
+    missing = [f for f in features if f not in cols]
+    if missing:
+        raise ValueError(f"Fast path cannot build features: {missing}")
+    return np.column_stack([np.asarray(cols[f], dtype=np.float64) for f in features])
@@ -0,0 +1,178 @@
+import datetime as _dt
+import typing
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from .data_schemas import SalesRow, InventoryRow, LeadTimeRow, BOMRow
+
+_KINDS = {str: "str", float: "float", int: "int", bool: "bool", _dt.date: "date", _dt.datetime: "date"}
+_BOUNDS = ("ge", "gt", "le", "lt")
+_CMP = {"ge": np.greater_equal, "gt": np.greater, "le": np.less_equal, "lt": np.less}
+
+@dataclass
+class ColumnRule:
+    name: str
+    kind: str                   # str / float / int / bool / date
+    required: bool = True       # column must be present (no default)
+    nullable: bool = False
+    bounds: Dict[str, float] = field(default_factory=dict)  # ge / gt / le / lt
+
+@dataclass
+class ValidationReport:
+    name: str
+    n_rows: int
+    n_invalid: int = 0
+    missing_columns: List[str] = field(default_factory=list)
+    violations: Dict[str, int] = field(default_factory=dict)   # "<column>: <check>" -> rows
+    samples: List[Dict] = field(default_factory=list)          # first offending rows with reasons
+    invalid: Optional[np.ndarray] = None                       # row mask
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing_columns and self.n_invalid == 0
+
+    def summary(self) -> str:
+        if self.missing_columns:
+            return f"{self.name} missing columns: {self.missing_columns}"
+        checks = ", ".join(f"{k} ({v})" for k, v in self.violations.items())
+        return f"{self.name}: {self.n_invalid} of {self.n_rows} rows invalid: {checks}; e.g. {self.samples[:3]}"
+
+    def raise_for_errors(self):
+        if not self.ok:
+            raise ValueError(self.summary())
+        return self
+
+    def to_dict(self) -> dict:
+        return {"n_rows": self.n_rows, "n_invalid": self.n_invalid, "missing_columns": self.missing_columns,
+                "violations": self.violations, "samples": self.samples}
+
+def _rule(name, info) -> ColumnRule:
+    ann, nullable = info.annotation, False
+    if typing.get_origin(ann) is typing.Union:
+        args = [a for a in typing.get_args(ann) if a is not type(None)]
+        nullable = len(args) < len(typing.get_args(ann))
+        ann = args[0] if len(args) == 1 else ann
+    if ann not in _KINDS:
+        raise ValueError(f"{name}: unsupported field type {ann!r} for columnar validation")
+    bounds = {b: float(getattr(m, b)) for m in info.metadata for b in _BOUNDS if getattr(m, b, None) is not None}
+    return ColumnRule(name, _KINDS[ann], required=info.is_required(), nullable=nullable, bounds=bounds)
+
+class ColumnarValidator:
+    """Whole-column checks equivalent to validating every row with a pydantic model.
+
+    Built from the model's fields: type (str / float / int / bool / date),
+    nullability (Optional[...]), presence (fields without a default) and
+    ge/gt/le/lt bounds. Unknown columns are ignored, as pydantic does.
+    """
+
+    def __init__(self, name: str, rules: List[ColumnRule]):
+        self.name = name
+        self.rules = list(rules)
+
+    @classmethod
+    def from_model(cls, model: type, name: str = None) -> "ColumnarValidator":
+        if not (isinstance(model, type) and issubclass(model, BaseModel)):
+            raise ValueError(f"{model!r} is not a pydantic model")
+        return cls(name or model.__name__, [_rule(n, f) for n, f in model.model_fields.items()])
+
+    def subset(self, columns) -> "ColumnarValidator":
+        return ColumnarValidator(self.name, [r for r in self.rules if r.name in set(columns)])
+
+    def validate(self, df, sample: int = 5) -> ValidationReport:
+        """Check a DataFrame (or mapping of column -> array); never raises for bad rows."""
+        n = len(df) if isinstance(df, pd.DataFrame) else len(next(iter(df.values()), []))
+        report = ValidationReport(self.name, n)
+        invalid = np.zeros(n, dtype=bool)
+        checks = []
+        for rule in self.rules:
+            if rule.name not in df:
+                if rule.required:
+                    report.missing_columns.append(rule.name)
+                continue
+            for check, bad in _check_column(rule, df[rule.name]):
+                if bad.any():
+                    report.violations[f"{rule.name}: {check}"] = int(bad.sum())
+                    checks.append((rule.name, check, bad))
+                    invalid |= bad
+        report.n_invalid = int(invalid.sum())
+        report.invalid = invalid
+        for i in np.flatnonzero(invalid)[:sample]:
+            reasons = [f"{c}: {k}" for c, k, bad in checks if bad[i]]
+            values = {c: _scalar(df[c], i) for c in dict.fromkeys(c for c, _, bad in checks if bad[i])}
+            report.samples.append({"row": int(i), "errors": reasons, "values": values})
+        return report
+
+def _scalar(col, i):
+    v = col.iloc[i] if isinstance(col, pd.Series) else col[i]
+    if pd.isna(v):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    return v if isinstance(v, (int, float, str)) else str(v)
+
+def _check_column(rule: ColumnRule, col):
+    # yields (check name, bad-row mask); null-ness is judged after type coercion
+    s = col if isinstance(col, pd.Series) else pd.Series(col)
+    null = s.isna().to_numpy()
+    values, type_bad = _coerce(rule.kind, s, null)
+    if type_bad is not None:
+        yield f"type {rule.kind}", type_bad
+    if not rule.nullable:
+        yield "not null", null
+    if rule.bounds and values is not None:
+        valid = ~null if type_bad is None else ~null & ~type_bad
+        for b, limit in rule.bounds.items():
+            with np.errstate(invalid="ignore"):
+                yield f"{b} {limit:g}", valid & ~_CMP[b](values, limit)
+
+def _coerce(kind, s, null):
+    """(numeric values or None, mask of non-null values not convertible to `kind` or None)."""
+    dt = s.dtype
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(dt):
+            return None, None
+        if not pd.api.types.is_string_dtype(dt):
+            return None, ~null
+        # YYYY-MM-DD, as pydantic parses dates from strings; each distinct value parsed once
+        codes, uniq = pd.factorize(s)
+        u = pd.Series(uniq, dtype=object)
+        ubad = pd.to_datetime(u, errors="coerce", format="%Y-%m-%d").isna().to_numpy() | (u.str.len() != 10).to_numpy()
+        return None, ~null & ubad[np.maximum(codes, 0)] if len(uniq) else np.zeros(len(s), dtype=bool)
+    if kind == "str":
+        if isinstance(dt, pd.CategoricalDtype):
+            dt = dt.categories.dtype
+            if pd.api.types.infer_dtype(s.cat.categories, skipna=True) == "string":
+                return None, None
+        if pd.api.types.is_string_dtype(dt) and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+            return None, None
+        if dt == object:
+            return None, ~null & ~np.fromiter((isinstance(v, str) for v in s.to_numpy()), dtype=bool, count=len(s))
+        return None, ~null
+    # numeric kinds
+    if pd.api.types.is_bool_dtype(dt):
+        v = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        return v, None
+    if pd.api.types.is_numeric_dtype(dt):
+        v = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        bad = None
+    else:
+        v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        bad = ~null & np.isnan(v)
+    if kind in ("int", "bool"):
+        # pydantic accepts 3.0 as an int, not 3.5
+        frac = ~null & ~np.isnan(v) & (v != np.round(v))
+        if kind == "bool":
+            frac |= ~null & ~np.isnan(v) & ~np.isin(v, (0.0, 1.0))
+        bad = frac if bad is None else bad | frac
+    return v, bad
+
+SALES_VALIDATOR = ColumnarValidator.from_model(SalesRow)
+INVENTORY_VALIDATOR = ColumnarValidator.from_model(InventoryRow)
+LEADTIME_VALIDATOR = ColumnarValidator.from_model(LeadTimeRow)
+BOM_VALIDATOR = ColumnarValidator.from_model(BOMRow)
+
+def validate_frame(df, model, name: str = None, sample: int = 5) -> ValidationReport:
+    """One-off: build the validator for `model` and run it over `df`."""
+    return ColumnarValidator.from_model(model, name).validate(df, sample=sample)
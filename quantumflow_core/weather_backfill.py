@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .dates import day_numbers, day_strings
+from .external_factors import _open_meteo_fetch, parse_open_meteo
+from .weather_store import WeatherStore
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate_per_sec: float):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec and rate_per_sec > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _retryable(exc):
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+class _Fetcher:
+    # rate-limited, retrying Open-Meteo fetch with one requests.Session per thread
+    def __init__(self, limiter, retries=3, backoff=1.0):
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.local = threading.local()
+        self.calls = 0
+
+    def __call__(self, lat, lon, start_date, end_date, timezone="auto"):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            self.calls += 1
+            try:
+                return _open_meteo_fetch(lat, lon, start_date, end_date, timezone=timezone, session=session)
+            except Exception as e:
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+def _next_day(day: str) -> str:
+    return str(np.datetime64(day, "D") + 1)
+
+class Checkpoint:
+    """JSON record of locations whose range is fully cached, so a rerun can skip them."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.done = json.load(f).get("done", {})
+            except (OSError, ValueError):
+                self.done = {}
+
+    def covered(self, key, start, end):
+        d = self.done.get(key)
+        return d is not None and d["start"] <= start and d["end"] >= end
+
+    def mark(self, key, start, end):
+        with self._lock:
+            d = self.done.get(key)
+            # widen only across overlapping or adjacent ranges; a disjoint range replaces the old one
+            if d is not None and start <= _next_day(d["end"]) and d["start"] <= _next_day(end):
+                start, end = min(start, d["start"]), max(end, d["end"])
+            self.done[key] = {"start": start, "end": end}
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"done": self.done}, f)
+                os.replace(tmp, self.path)
+
+def location_ranges(df, sku_location_map=None):
+    """(lat, lon, start, end) per location covering the Dates of its SKUs in `df`."""
+    d = df[["SKU_ID", "Date"]] if sku_location_map is not None else df[["lat", "lon", "Date"]]
+    if sku_location_map is not None:
+        d = d.merge(sku_location_map[["SKU_ID", "lat", "lon"]].drop_duplicates(), on="SKU_ID", how="inner")
+    d = d.dropna(subset=["lat", "lon"])
+    r = pd.DataFrame({"lat": d["lat"].to_numpy(), "lon": d["lon"].to_numpy(), "day": day_numbers(d["Date"])})
+    r = r.groupby(["lat", "lon"])["day"].agg(["min", "max"]).reset_index()
+    r["start"] = day_strings(r["min"])
+    r["end"] = day_strings(r["max"])
+    return r[["lat", "lon", "start", "end"]]
+
+def backfill_weather(locations: pd.DataFrame, cache_dir="data/weather_cache", max_workers=8, rate_per_sec=5.0,
+                     retries=3, backoff=1.0, checkpoint_path=None, grid_deg=0.1) -> dict:
+    """Fill the weather store under `cache_dir` for every (lat, lon, start, end) row.
+
+    Coordinates are snapped to the store grid first, so locations in the same
+    cell are fetched once, over the union of their ranges. See `backfill_store`.
+    """
+    store = WeatherStore(cache_dir, grid_deg)
+    ids = store.location_ids(locations["lat"], locations["lon"], add=True)
+    return backfill_store(store, ids, locations["start"], locations["end"], max_workers=max_workers,
+                          rate_per_sec=rate_per_sec, retries=retries, backoff=backoff, checkpoint_path=checkpoint_path)
+
+def backfill_store(store: WeatherStore, location_ids, starts, ends, max_workers=8, rate_per_sec=5.0,
+                   retries=3, backoff=1.0, checkpoint_path=None, flush_every=32) -> dict:
+    """Fetch the days `store` is missing for every (location_id, start, end) and write them in.
+
+    Locations run concurrently in a bounded thread pool; each fetches only its
+    date gaps. Results are written every `flush_every` locations and
+    checkpointed, so an interrupted backfill resumes where it left off.
+    Failures are reported, not raised, so one bad location does not stop the
+    rest.
+    """
+    r = pd.DataFrame({"loc": np.asarray(location_ids, dtype=np.int64),
+                      "start": day_numbers(starts), "end": day_numbers(ends)})
+    r = r[r["loc"] >= 0].groupby("loc").agg(start=("start", "min"), end=("end", "max"))
+    ckpt = Checkpoint(checkpoint_path)
+    fetch = _Fetcher(RateLimiter(rate_per_sec), retries=retries, backoff=backoff)
+    summary = {"locations": len(r), "skipped": 0, "done": 0, "incomplete": 0, "failed": {}}
+
+    def run(lat, lon, gaps):
+        return pd.concat([parse_open_meteo(fetch(lat, lon, s, e)) for s, e in gaps], ignore_index=True)
+
+    todo = []
+    for (loc, s, e), (lat, lon) in zip(r.itertuples(), store.coords(r.index)):
+        key, (start, end) = f"{lat}_{lon}", day_strings([s, e])
+        gaps = [] if ckpt.covered(key, start, end) else store.missing_ranges(loc, s, e)
+        if gaps:
+            todo.append((loc, key, s, e, float(lat), float(lon), gaps))
+        else:
+            summary["skipped"] += 1
+    pending = []
+
+    def flush():
+        if pending:
+            store.write([(p[0], p[4]) for p in pending])
+            for loc, key, s, e, _ in pending:
+                # days the archive returned empty (not yet published) stay unchecked, so a rerun refetches them
+                full = np.arange(s, e + 1)
+                if np.isin(full, store.known_days(loc)).all():
+                    ckpt.mark(key, *day_strings([s, e]))
+                else:
+                    summary["incomplete"] += 1
+            summary["done"] += len(pending)
+            pending.clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+        futures = {ex.submit(run, *t[4:]): t for t in todo}
+        for fut in as_completed(futures):
+            loc, key, s, e = futures[fut][:4]
+            try:
+                pending.append((loc, key, s, e, fut.result()))
+            except Exception as exc:
+                summary["failed"][key] = str(exc)
+                continue
+            if len(pending) >= flush_every:
+                flush()
+    flush()
+    summary["requests"] = fetch.calls
+    return summary
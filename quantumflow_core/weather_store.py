@@ -0,0 +1,223 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from .dates import day_numbers
+from .external_factors import WEATHER_COLS, weather_flags, gap_ranges
+
+MANIFEST = "manifest.json"
+FLAG_COLS = ["is_rain", "temp_avg", "is_cold", "is_hot"]
+STORE_COLS = WEATHER_COLS + FLAG_COLS
+
+class WeatherStore:
+    """Daily weather of every location as one (location_id, day) grid of memory-mapped columns.
+
+    Coordinates are snapped to a `grid_deg` grid, so nearby or differently
+    rounded SKU coordinates share one location and one fetch. Layout under `root`:
+      grid-<token>/<column>.npy   [location rows, n_days] per WEATHER_COLS and derived flag
+      manifest.json               grid dir, first day, grid_deg and the locations' grid keys
+    `write` fills the touched rows of the current grid in place, or builds a
+    larger grid and swaps the manifest last when the locations or days do not
+    fit; readers keep the grid they opened until `refresh`.
+    One writer at a time: concurrent writers from different processes can lose
+    each other's days.
+    """
+
+    def __init__(self, root, grid_deg: float = 0.1):
+        self.root = root
+        self.grid_deg = float(grid_deg)
+        self._lock = threading.Lock()
+        self._keys = np.zeros((0, 2), dtype=np.int64)
+        self._index = {}
+        self._grid = None
+        self._published = 0   # locations listed in the manifest
+        self.day0, self.n_days = 0, 0
+        self.cols = {}
+        self.refresh()
+
+    # -- manifest / grid -----------------------------------------------------
+    def _manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """Reopen the grid the manifest currently points at."""
+        m = self._manifest()
+        if m is None:
+            return self
+        if abs(m["grid_deg"] - self.grid_deg) > 1e-12:
+            raise ValueError(f"Weather store {self.root} uses a {m['grid_deg']} degree grid, not {self.grid_deg}")
+        with self._lock:
+            keys = [tuple(k) for k in m["keys"]]
+            index = {k: i for i, k in enumerate(keys)}
+            # locations added here since (no weather yet) stay known, after the stored ones
+            for k in map(tuple, self._keys.tolist()):
+                if k not in index:
+                    index[k] = len(keys)
+                    keys.append(k)
+            self._keys = np.asarray(keys, dtype=np.int64).reshape(-1, 2)
+            self._index = index
+            self._published = len(m["keys"])
+            self._grid, self.day0, self.n_days = m["grid"], m["day0"], m["n_days"]
+            d = os.path.join(self.root, self._grid)
+            self.cols = {c: np.load(os.path.join(d, f"{c}.npy"), mmap_mode="r") for c in STORE_COLS}
+        return self
+
+    def __len__(self):
+        return len(self._keys)
+
+    # -- locations -----------------------------------------------------------
+    def grid_keys(self, lat, lon) -> np.ndarray:
+        """[n, 2] integer grid cell of each coordinate."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        return np.column_stack([np.round(lat / self.grid_deg), np.round(lon / self.grid_deg)]).astype(np.int64)
+
+    def coords(self, location_ids) -> np.ndarray:
+        """[n, 2] snapped (lat, lon) of locations; the point weather is fetched for."""
+        return np.round(self._keys[np.asarray(location_ids, dtype=np.int64)] * self.grid_deg, 6)
+
+    def location_ids(self, lat, lon, add: bool = False) -> np.ndarray:
+        """location_id per coordinate pair, -1 where missing or (unless `add`) unknown.
+
+        Each distinct pair is resolved once. Added locations persist with the next `write`.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ok = ~(np.isnan(lat) | np.isnan(lon))
+        out = np.full(len(lat), -1, dtype=np.int64)
+        if not ok.any():
+            return out
+        keys = self.grid_keys(lat[ok], lon[ok])
+        uniq, inv = np.unique(keys, axis=0, return_inverse=True)
+        with self._lock:
+            ids = np.empty(len(uniq), dtype=np.int64)
+            new = []
+            for i, k in enumerate(map(tuple, uniq.tolist())):
+                j = self._index.get(k)
+                if j is None and add:
+                    j = self._index[k] = len(self._keys) + len(new)
+                    new.append(k)
+                ids[i] = -1 if j is None else j
+            if new:
+                self._keys = np.vstack([self._keys, np.asarray(new, dtype=np.int64)])
+        out[ok] = ids[inv.ravel()]
+        return out
+
+    # -- reads ---------------------------------------------------------------
+    def lookup(self, location_ids, days, columns=None) -> dict:
+        """Columns (default all of STORE_COLS) for rows (location_id, day number) with one gather
+        each; NaN / False where the location or day is not stored."""
+        loc = np.asarray(location_ids, dtype=np.int64)
+        off = np.asarray(days, dtype=np.int64) - self.day0
+        rows = self.cols["temp_max"].shape[0] if self.cols else 0
+        ok = (loc >= 0) & (loc < rows) & (off >= 0) & (off < self.n_days)
+        flat = np.where(ok, loc * self.n_days + off, 0)
+        out = {}
+        for c in columns or STORE_COLS:
+            if self.cols:
+                v = self.cols[c].reshape(-1)[flat]
+            else:
+                v = np.zeros(len(loc), dtype=bool if c in ("is_rain", "is_cold", "is_hot") else np.float64)
+            v[~ok] = False if v.dtype == bool else np.nan
+            out[c] = v
+        return out
+
+    def known_days(self, location_id) -> np.ndarray:
+        """Day numbers with any weather value stored for the location."""
+        if not self.cols or not 0 <= location_id < self.cols["temp_max"].shape[0]:
+            return np.zeros(0, dtype=np.int64)
+        have = np.zeros(self.n_days, dtype=bool)
+        for c in WEATHER_COLS:
+            have |= ~np.isnan(self.cols[c][location_id])
+        return np.flatnonzero(have) + self.day0
+
+    def missing_ranges(self, location_id, start_day, end_day, merge_within=7) -> list:
+        """Date-string gaps of the location in start..end; days stored with no values count as gaps."""
+        full = np.arange(int(start_day), int(end_day) + 1)
+        return gap_ranges(full[~np.isin(full, self.known_days(location_id))], merge_within)
+
+    # -- writes --------------------------------------------------------------
+    def write(self, fetched):
+        """Merge (location_id, frame of Date + WEATHER_COLS) pairs into the grid; fetched days win.
+
+        When the locations and days fit the current grid, only the touched
+        location rows are written, in place through memory maps. Otherwise a
+        new grid is built with headroom (more location rows, days past the
+        latest), so a long backfill rebuilds a few times, not on every flush.
+        """
+        fetched = [(int(i), w, day_numbers(w["Date"])) for i, w in fetched if w is not None]
+        with self._lock:
+            spans = [(int(d.min()), int(d.max())) for _, _, d in fetched if len(d)]
+            rows = self.cols["temp_max"].shape[0] if self.cols else 0
+            fits = bool(self.cols) and len(self._keys) <= rows and all(
+                s >= self.day0 and e < self.day0 + self.n_days for s, e in spans)
+            if fits:
+                self._write_rows(fetched)
+                if len(self._keys) > self._published:
+                    self._publish(self._grid, self.day0, self.n_days)
+            else:
+                self._rebuild(fetched, spans, rows)
+        return self.refresh()
+
+    def _write_rows(self, fetched):
+        # caller holds the lock; readers of this grid see the rows change in place
+        d = os.path.join(self.root, self._grid)
+        cols = {c: np.load(os.path.join(d, f"{c}.npy"), mmap_mode="r+") for c in STORE_COLS}
+        for i, w, days in fetched:
+            for c in WEATHER_COLS:
+                cols[c][i, days - self.day0] = w[c].to_numpy(dtype=np.float64)
+        touched = np.unique([i for i, _, _ in fetched])
+        if len(touched):
+            flags = weather_flags({c: cols[c][touched] for c in WEATHER_COLS})
+            for c in FLAG_COLS:
+                cols[c][touched] = flags[c]
+        for m in cols.values():
+            m.flush()
+
+    def _rebuild(self, fetched, spans, old_rows):
+        # caller holds the lock
+        if self.n_days:
+            spans = spans + [(self.day0, self.day0 + self.n_days - 1)]
+        day0 = min(s for s, _ in spans) if spans else 0
+        last = max(e for _, e in spans) if spans else -1
+        # headroom: a quarter of the span (at least a month) of later days, half again as many location rows
+        n_days = last - day0 + 1 + max(31, (last - day0 + 1) // 4) if spans else 0
+        n_rows = max(len(self._keys), old_rows + old_rows // 2)
+        grid = {c: np.full((n_rows, n_days), np.nan) for c in WEATHER_COLS}
+        if self.cols:
+            at = self.day0 - day0
+            for c in WEATHER_COLS:
+                grid[c][:old_rows, at:at + self.n_days] = self.cols[c]
+        for i, w, d in fetched:
+            for c in WEATHER_COLS:
+                grid[c][i, d - day0] = w[c].to_numpy(dtype=np.float64)
+        grid.update(weather_flags(grid))
+        token = f"{pd.Timestamp.now(tz='UTC'):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        rel = f"grid-{token}"
+        os.makedirs(os.path.join(self.root, rel))
+        for c in STORE_COLS:
+            np.save(os.path.join(self.root, rel, f"{c}.npy"), grid[c])
+        del grid
+        self._publish(rel, day0, n_days)
+        # keep the grid just replaced for readers that still have the old manifest
+        for name in os.listdir(self.root):
+            if name.startswith("grid-") and name not in (rel, self._grid):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _publish(self, rel, day0, n_days):
+        manifest = {"grid": rel, "day0": int(day0), "n_days": int(n_days), "grid_deg": self.grid_deg,
+                    "keys": self._keys.tolist()}
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+        self._published = len(self._keys)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+import lightgbm as lgb
+from starlette.testclient import TestClient
+from quantumflow_core.models import TrainedModel, FEATURES_BASE
+from quantumflow_core.serving import SeriesStateTable
+from apps.api import main
+from apps.api.cache import row_keys
+
+def _sales(days=60):
+    dates = pd.date_range("2024-01-01", periods=days).strftime("%Y-%m-%d")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"Date": np.tile(dates, 2), "SKU_ID": np.repeat(["A1", "B2"], days),
+                         "Sales_Channel": "Online", "Sales_Quantity": rng.poisson(50, 2 * days).astype(float)})
+
+@pytest.fixture
+def client(monkeypatch):
+    rng = np.random.default_rng(0)
+    X, y = rng.random((200, len(FEATURES_BASE))), rng.random(200)
+    model = TrainedModel("lgbm", lgb.LGBMRegressor(n_estimators=5, verbose=-1).fit(X, y), list(FEATURES_BASE))
+    monkeypatch.setattr(main, "_model", model)
+    monkeypatch.setattr(main, "_state", SeriesStateTable.from_tail(_sales()))
+    monkeypatch.setattr(main, "BATCH_WINDOW_MS", 0)
+    main._cache.set_model(model, "test")
+    assert main._cache.enabled
+    # no lifespan: the model and state above are used as is
+    return TestClient(main.app)
+
+def test_row_keys_empty():
+    assert row_keys(np.zeros((0, 3)), [[]]) == []
+
+def test_forecast_short_history_returns_no_rows(client):
+    # under 15 days per series: every row is dropped by the lag/roll NaN filter
+    rows = _sales(days=10).to_dict(orient="records")
+    r = client.post("/forecast", json={"rows": rows})
+    assert r.status_code == 200
+    assert r.json() == {"rows": []}
+
+def test_forecast_fast_empty_payload(client):
+    r = client.post("/forecast/fast", json={"SKU_ID": [], "Sales_Channel": [], "Date": []})
+    assert r.status_code == 200
+    assert r.json()["forecast"] == []
+
+def test_forecast_repeat_hits_cache(client):
+    rows = _sales().to_dict(orient="records")
+    first = client.post("/forecast", json={"rows": rows}).json()
+    before = client.get("/forecast/cache").json()["request_hits"]
+    assert client.post("/forecast", json={"rows": rows}).json() == first
+    assert client.get("/forecast/cache").json()["request_hits"] == before + 1
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pytest
+import lightgbm as lgb
+from starlette.testclient import TestClient
+from quantumflow_core.artifacts import save_model
+from quantumflow_core.models import TrainedModel, FEATURES_BASE
+from apps.api import main
+from apps.api.jobs import JobQueue
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    # a queue whose workers are never started: submitted jobs stay queued
+    monkeypatch.setattr(main, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(main, "_jobs", JobQueue(main.JOBS_DIR, on_success=main._on_trained))
+    return TestClient(main.app)
+
+def _cfg(tmp_path, name):
+    p = tmp_path / name
+    p.write_text("data_dir: data\n")
+    return str(p)
+
+def _model(seed):
+    rng = np.random.default_rng(seed)
+    X, y = rng.random((100, len(FEATURES_BASE))), rng.random(100)
+    return TrainedModel("lgbm", lgb.LGBMRegressor(n_estimators=3, verbose=-1).fit(X, y), list(FEATURES_BASE))
+
+def test_configs_train_into_their_own_model_dirs(client, tmp_path):
+    a = client.post("/train", json={"config": _cfg(tmp_path, "a.yaml")}).json()
+    b = client.post("/train", json={"config": _cfg(tmp_path, "b.yaml")}).json()
+    dirs = [main._jobs.get(j["id"]).env["QF_TRAINED_MODEL"] for j in (a, b)]
+    assert dirs[0] != dirs[1] and main.LIVE_MODEL_DIR not in dirs
+    for j, d in zip((a, b), dirs):
+        cmd = main._jobs.get(j["id"]).cmd
+        assert cmd[cmd.index("--model-dir") + 1] == d
+
+def test_success_publishes_the_jobs_model(client, tmp_path, monkeypatch):
+    live = str(tmp_path / "live" / "model")
+    monkeypatch.setattr(main, "LIVE_MODEL_DIR", live)
+    monkeypatch.setattr(main, "_load_state", lambda: None)
+    monkeypatch.setattr(main, "_model", None)
+    jobs = [main._jobs.get(client.post("/train", json={"config": _cfg(tmp_path, f"{n}.yaml")}).json()["id"])
+            for n in ("a", "b")]
+    for seed, job in enumerate(jobs):
+        save_model(_model(seed), job.env["QF_TRAINED_MODEL"])
+    main._on_trained(jobs[1])
+    main._on_trained(jobs[0])
+    # the live dir and the served model are both the last published run
+    X = np.random.default_rng(9).random((5, len(FEATURES_BASE)))
+    np.testing.assert_allclose(main._model.model.predict(X), _model(0).model.predict(X))
+    assert main._model_key(live) == main._model_key(jobs[0].env["QF_TRAINED_MODEL"])
+    assert os.path.isdir(jobs[1].env["QF_TRAINED_MODEL"])
+
+def test_cancel_conflicts_for_every_terminal_state(client, tmp_path):
+    job = client.post("/train", json={"config": _cfg(tmp_path, "a.yaml")}).json()
+    r = client.post(f"/train/jobs/{job['id']}/cancel")
+    assert r.status_code == 200 and r.json()["state"] == "cancelled"
+    assert client.post(f"/train/jobs/{job['id']}/cancel").status_code == 409
+    for state in ("succeeded", "failed"):
+        j = main._jobs.get(client.post("/train", json={"config": _cfg(tmp_path, f"{state}.yaml")}).json()["id"])
+        j.state = state
+        assert client.post(f"/train/jobs/{j.id}/cancel").status_code == 409
+
+def test_cancel_of_a_running_job_returns_at_once(client, tmp_path, monkeypatch):
+    import sys
+    import time
+    q = JobQueue(str(tmp_path / "q"), kill_grace_s=0.5, poll_s=0.05).start()
+    monkeypatch.setattr(main, "_jobs", q)
+    # ignores SIGTERM: only the worker thread's SIGKILL stops it
+    job, _ = q.submit("k", [sys.executable, "-c", "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                                                  "print('up', flush=True); time.sleep(60)"])
+    while "up" not in "".join(job.log_tail()):
+        time.sleep(0.05)
+    t0 = time.perf_counter()
+    r = client.post(f"/train/jobs/{job.id}/cancel")
+    assert time.perf_counter() - t0 < 0.3
+    assert r.status_code == 202 and r.json()["state"] == "cancelling"
+    assert client.post(f"/train/jobs/{job.id}/cancel").status_code == 202
+    deadline = time.time() + 10
+    while job.state != "cancelled" and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.state == "cancelled" and job.returncode == -9
+    assert client.post(f"/train/jobs/{job.id}/cancel").status_code == 409
+    q.shutdown()
+
+def test_live_model_dir_is_never_missing(tmp_path):
+    import threading
+    from quantumflow_core.artifacts import load_model
+    live = str(tmp_path / "model")
+    save_model(_model(0), live)
+    stop, missing = threading.Event(), []
+
+    def watch():
+        while not stop.is_set():
+            if not os.path.exists(os.path.join(live, "manifest.json")):
+                missing.append(1)
+    t = threading.Thread(target=watch)
+    t.start()
+    for seed in range(1, 6):
+        save_model(_model(seed), live)
+    stop.set()
+    t.join()
+    assert not missing and os.path.islink(live)
+    # the new version plus the previous one are kept
+    assert len([d for d in os.listdir(tmp_path) if d.startswith("model.v-")]) == 2
+    X = np.random.default_rng(9).random((5, len(FEATURES_BASE)))
+    np.testing.assert_allclose(load_model(live).model.predict(X), _model(5).model.predict(X))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from quantumflow_core.drift import DriftMonitor, iter_frames
+from pipelines import drift_monitor
+
+def _sales(start, end, level):
+    dates = pd.date_range(start, end)
+    rng = np.random.default_rng(len(dates))
+    return pd.DataFrame({"Date": np.tile(dates.strftime("%Y-%m-%d"), 2), "SKU_ID": "A1",
+                         "Sales_Channel": np.repeat(["Online", "Store"], len(dates)),
+                         "Sales_Quantity": rng.normal(level, 1.0, 2 * len(dates))})
+
+def _drifted(channel="Online"):
+    return pd.DataFrame({"Sales_Channel": [channel], "feature": ["Sales_Quantity"]})
+
+def _monitor(tmp_path):
+    ref, cur = str(tmp_path / "ref.csv"), str(tmp_path / "cur.csv")
+    _sales("2024-01-01", "2024-03-31", 10).to_csv(ref, index=False)
+    pd.concat([_sales("2024-04-01", "2024-04-30", 20), _sales("2024-05-01", "2024-05-31", 30)]).to_csv(cur, index=False)
+    mon = DriftMonitor.fit(lambda: iter_frames(ref), features=["Sales_Quantity"], segment_by=["Sales_Channel"])
+    mon.update(f[pd.to_datetime(f["Date"]) <= "2024-04-30"] for f in iter_frames(cur))
+    mon.rebase()
+    mon.update(iter_frames(cur))
+    return ref, cur, mon
+
+def test_rebased_reference_sample_includes_the_folded_in_rows(tmp_path):
+    ref_path, cur_path, mon = _monitor(tmp_path)
+    assert mon.fit_end == "2024-03-31" and mon.reference_end == "2024-04-30"
+    ref, cur = drift_monitor.report_samples(ref_path, cur_path, mon, _drifted(), sample_rows=10_000)
+    # Online only: 91 reference days in ref.csv + 30 April days folded in from cur.csv
+    assert len(ref) == 91 + 30 and (ref["Date"] > "2024-03-31").sum() == 30
+    assert len(cur) == 31 and cur["Date"].min() == "2024-05-01"
+    assert (ref["Sales_Channel"] == "Online").all()
+
+def test_fit_end_survives_save_and_load(tmp_path):
+    _, _, mon = _monitor(tmp_path)
+    mon.save(str(tmp_path / "state"))
+    assert DriftMonitor.load(str(tmp_path / "state")).fit_end == "2024-03-31"
+
+def test_report_is_skipped_for_empty_samples(tmp_path, monkeypatch):
+    ref_path, cur_path, mon = _monitor(tmp_path)
+    monkeypatch.setattr(drift_monitor, "HAS_EVIDENTLY", True)
+    out = drift_monitor.run_report(ref_path, cur_path, mon, _drifted("Wholesale"), str(tmp_path / "r.html"))
+    assert out is None
@@ -0,0 +1,75 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from quantumflow_core.feature_store import FeatureStore, feature_settings, features_from_config
+from quantumflow_core.features import prepare_features
+
+def _sales(days=90):
+    dates = pd.date_range("2024-01-01", periods=days)
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"Date": np.tile(dates, 2), "SKU_ID": np.repeat(["A1", "B2"], days),
+                         "Sales_Channel": "Online", "Sales_Quantity": rng.poisson(50, 2 * days).astype(float)})
+
+def _cfg(tmp_path, **kw):
+    return dict(data_dir=str(tmp_path / "data"), feature_store_dir=str(tmp_path / "fs"), country_holidays="IN", **kw)
+
+def test_config_features_append_only_new_days(tmp_path):
+    sales = _sales()
+    cfg = _cfg(tmp_path)
+    features_from_config(sales[sales["Date"] < "2024-03-01"], cfg)
+    feats = features_from_config(sales, cfg)
+    store = FeatureStore(cfg["feature_store_dir"], settings=feature_settings("IN", "country"))
+    assert len(store._manifest()["parts"]) > 1 and not store.stale()
+    full = prepare_features(sales, country_code="IN", country_col="country")
+    key = ["SKU_ID", "Date"]
+    pd.testing.assert_frame_equal(feats.sort_values(key).reset_index(drop=True)[full.columns],
+                                  full.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+def test_changed_settings_rebuild_the_store(tmp_path):
+    root = str(tmp_path / "fs")
+    sales = _sales()
+    us = FeatureStore(root, settings=feature_settings("US"))
+    us.update(sales, country_code="US")
+    old_parts = us._manifest()["parts"]
+    india = FeatureStore(root, settings=feature_settings("IN"))
+    assert india.stale() and len(india.pending(sales)) == len(sales)
+    with pytest.raises(ValueError):
+        india.update(sales, country_code="US")
+    india.update(sales, country_code="IN")
+    assert not india.stale() and us.stale()
+    assert not any(os.path.exists(os.path.join(root, p)) for p in old_parts)
+    got = india.load().sort_values(["SKU_ID", "Date"]).reset_index(drop=True)
+    want = prepare_features(sales, country_code="IN").sort_values(["SKU_ID", "Date"]).reset_index(drop=True)
+    np.testing.assert_array_equal(got["Holiday_Flag"], want["Holiday_Flag"])
+    assert not len(india.pending(sales))
+
+def test_store_without_fingerprint_is_stale(tmp_path):
+    root = str(tmp_path / "fs")
+    store = FeatureStore(root, settings=feature_settings("US"))
+    store.update(_sales(), country_code="US")
+    path = os.path.join(root, "manifest.json")
+    with open(path) as f:
+        m = json.load(f)
+    del m["fingerprint"]
+    with open(path, "w") as f:
+        json.dump(m, f)
+    assert store.stale()
+
+def test_extend_features_in_parallel_matches_serial():
+    from quantumflow_core.features import extend_features
+    rng = np.random.default_rng(1)
+    dates = pd.date_range("2024-01-01", periods=80)
+    skus = [f"S{i}" for i in range(12)]
+    sales = pd.DataFrame({"Date": np.tile(dates, len(skus)), "SKU_ID": np.repeat(skus, len(dates)),
+                          "Sales_Channel": "Online", "Sales_Quantity": rng.poisson(20, len(skus) * len(dates)).astype(float)})
+    old = sales["Date"] < "2024-02-15"
+    tail = sales[old].groupby(["SKU_ID", "Sales_Channel"]).tail(28)
+    serial = extend_features(sales[~old], tail, country_code="IN")
+    parallel = extend_features(sales[~old], tail, country_code="IN", n_jobs=3, min_partition_rows=10)
+    key = ["SKU_ID", "Date"]
+    pd.testing.assert_frame_equal(parallel.sort_values(key).reset_index(drop=True),
+                                  serial.sort_values(key).reset_index(drop=True))
+    # seeded from the tail: the first new day already has all lags
+    assert len(serial) == (~old).sum()
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from quantumflow_core.features import add_lags_rollups
+
+KEYS = ["SKU_ID", "Sales_Channel"]
+
+def _reference(df, W):
+    # grouped pandas shift(1).rolling per series
+    df = df.sort_values(KEYS + ["Date"]).copy()
+    r = df.groupby(KEYS)["Sales_Quantity"].shift(1).groupby([df[k] for k in KEYS]).rolling(W, min_periods=max(2, W // 2))
+    df[f"roll_mean_{W}"] = r.mean().reset_index(level=[0, 1], drop=True)
+    df[f"roll_std_{W}"] = r.std().reset_index(level=[0, 1], drop=True)
+    return df
+
+def test_roll_std_small_series_after_noisy_ones():
+    # a low-variance series sorting after high-variance ones keeps full precision
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2023-01-01", periods=120).strftime("%Y-%m-%d")
+    frames = [pd.DataFrame({"Date": days, "SKU_ID": f"S{i:03d}", "Sales_Channel": "Online",
+                            "Sales_Quantity": rng.normal(1e5, 3e4, len(days))}) for i in range(100)]
+    frames.append(pd.DataFrame({"Date": days, "SKU_ID": "Z999", "Sales_Channel": "Online",
+                                "Sales_Quantity": rng.normal(5.0, 0.01, len(days))}))
+    df = pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=0)
+    out = add_lags_rollups(df, KEYS).sort_values(KEYS + ["Date"])
+    for W in (7, 28):
+        ref = _reference(df, W)
+        for c in (f"roll_mean_{W}", f"roll_std_{W}"):
+            np.testing.assert_allclose(out[c].to_numpy(), ref[c].to_numpy(), rtol=1e-9, err_msg=c)
+
+def test_uneven_series_lengths():
+    rng = np.random.default_rng(1)
+    frames = []
+    for i, n in enumerate([3, 40, 1, 17, 60]):
+        days = pd.date_range("2024-01-01", periods=n).strftime("%Y-%m-%d")
+        frames.append(pd.DataFrame({"Date": days, "SKU_ID": f"S{i}", "Sales_Channel": "Retail",
+                                    "Sales_Quantity": rng.poisson(20, n).astype(float)}))
+    df = pd.concat(frames, ignore_index=True)
+    out = add_lags_rollups(df, KEYS).sort_values(KEYS + ["Date"])
+    ref = _reference(df, 7)
+    np.testing.assert_allclose(out["roll_std_7"].to_numpy(), ref["roll_std_7"].to_numpy(), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(out["lag_1"].to_numpy(), ref.groupby(KEYS)["Sales_Quantity"].shift(1).to_numpy())
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from quantumflow_core.models import FEATURES_BASE
+
+optuna = pytest.importorskip("optuna")
+from quantumflow_core.hpo import tune_segments
+
+def _frame(seed, n=300):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((n, len(FEATURES_BASE))), columns=FEATURES_BASE)
+    df["Sales_Quantity"] = df["lag_1"] * 10 + rng.normal(0, 0.1, n)
+    return df
+
+def test_rerun_resumes_only_on_the_same_data(tmp_path):
+    storage = str(tmp_path / "optuna.journal")
+    kw = dict(n_trials=2, storage=storage, min_rows=0)
+    first = tune_segments(_frame(0), **kw)["ALL"]
+    assert first["resumed_trials"] == 0 and first["trials"] + first["pruned"] == 2
+
+    again = tune_segments(_frame(0), **kw)["ALL"]
+    assert again["study"] == first["study"] and again["resumed_trials"] == 2
+    assert again["trials"] + again["pruned"] == 2 and again["best_params"] == first["best_params"]
+
+    # new data: a new study, tuned from scratch
+    fresh = tune_segments(_frame(1), **kw)["ALL"]
+    assert fresh["study"] != first["study"] and fresh["resumed_trials"] == 0
+    assert fresh["trials"] + fresh["pruned"] == 2
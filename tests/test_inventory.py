@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from quantumflow_core.inventory import lead_time_quantile_demand, plan_orders
+
+def test_moq_over_the_shelf_life_cap_is_reported_as_the_binding_constraint():
+    # cap = 2/day * 5 days - 0 = 10 units; MOQ 25 lifts the order past it
+    out = plan_orders([2.0, 2.0], 1.0, 10, 0, moq=[1, 25], shelf_life_days=5)
+    np.testing.assert_array_equal(out["suggested_order"], [10.0, 25.0])
+    assert list(out["bound_reason"]) == ["shelf_life_cap", "moq_over_shelf_life"]
+    # MOQ within the cap is still an ordinary rounding
+    out = plan_orders(2.0, 0.0, 1, 0, moq=5, shelf_life_days=30)
+    assert out["suggested_order"] == 5.0 and out["bound_reason"] == "multiple/moq_applied"
+
+def test_quantile_planning_refuses_a_service_level_above_the_trained_quantiles():
+    trained = SimpleNamespace(quantile_models={0.5: None, 0.9: None})
+    future = pd.DataFrame({"SKU_ID": ["A"], "Date": ["2024-01-02"]})
+    lead_times = pd.DataFrame({"SKU_ID": ["A"], "Lead_Time_Days": [3]})
+    with pytest.raises(ValueError, match="0.95"):
+        lead_time_quantile_demand(trained, future, lead_times, service_level=0.95)
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+import pytest
+from quantumflow_core.external_factors import add_weather_features
+from quantumflow_core.weather_backfill import backfill_weather
+from quantumflow_core.weather_store import WeatherStore
+
+def _temp(lat, day):
+    # deterministic archive value per location and day
+    return round(float(lat) + day % 10, 1)
+
+class _Archive(BaseHTTPRequestHandler):
+    """Open-Meteo-shaped /v1/archive stand-in.
+
+    `server.failures` holds statuses to return first, `server.bad` latitudes that
+    always fail, `server.published_until` the last day returned with values.
+    """
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        srv = self.server
+        with srv.lock:
+            srv.calls.append((float(q["latitude"]), q["start_date"], q["end_date"]))
+            status = srv.failures.pop(0) if srv.failures else 200
+        if float(q["latitude"]) in srv.bad:
+            status = 400
+        if status != 200:
+            self.send_response(status)
+            self.end_headers()
+            return
+        days = pd.date_range(q["start_date"], q["end_date"])
+        dn = days.values.astype("datetime64[D]").astype(np.int64)
+        cut = np.datetime64(srv.published_until or "9999-12-31", "D").astype(np.int64)
+        body = {"latitude": float(q["latitude"]), "longitude": float(q["longitude"]),
+                "daily": {"time": list(days.strftime("%Y-%m-%d")),
+                          "temperature_2m_max": [_temp(q["latitude"], d) if d <= cut else None for d in dn],
+                          "temperature_2m_min": [_temp(q["latitude"], d) - 8 if d <= cut else None for d in dn],
+                          "precipitation_sum": [0.0 if d <= cut else None for d in dn],
+                          "weathercode": [1 if d <= cut else None for d in dn]}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def archive(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Archive)
+    srv.lock, srv.calls, srv.failures, srv.bad = threading.Lock(), [], [], set()
+    srv.published_until = None
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    monkeypatch.setenv("QF_OPEN_METEO_URL", f"http://127.0.0.1:{srv.server_address[1]}/v1/archive")
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def _locations(*rows):
+    return pd.DataFrame(rows, columns=["lat", "lon", "start", "end"])
+
+def _kw(tmp_path, **kw):
+    return dict(cache_dir=str(tmp_path / "weather"), max_workers=2, rate_per_sec=0, backoff=0.0, **kw)
+
+def _stored(tmp_path, lat, lon, start, end):
+    store = WeatherStore(str(tmp_path / "weather"))
+    loc = store.location_ids([lat], [lon])
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1).astype(np.int64)
+    return store.lookup(np.repeat(loc, len(days)), days)["temp_max"]
+
+def test_backfill_fetches_only_gaps_and_keeps_history(archive, tmp_path):
+    s = backfill_weather(_locations((28.6, 77.2, "2024-01-01", "2024-01-10")), **_kw(tmp_path))
+    assert s["done"] == 1 and archive.calls == [(28.6, "2024-01-01", "2024-01-10")]
+    first = _stored(tmp_path, 28.6, 77.2, "2024-01-01", "2024-01-10")
+
+    # a wider range fetches only the days after the stored ones
+    archive.calls.clear()
+    backfill_weather(_locations((28.6, 77.2, "2024-01-01", "2024-01-31")), **_kw(tmp_path))
+    assert archive.calls == [(28.6, "2024-01-11", "2024-01-31")]
+    full = _stored(tmp_path, 28.6, 77.2, "2024-01-01", "2024-01-31")
+    np.testing.assert_array_equal(full[:10], first)
+    assert not np.isnan(full).any()
+
+    # everything stored: no requests
+    archive.calls.clear()
+    s = backfill_weather(_locations((28.6, 77.2, "2024-01-05", "2024-01-20")), **_kw(tmp_path))
+    assert archive.calls == [] and s["skipped"] == 1
+
+def test_backfill_retries_429_and_503(archive, tmp_path):
+    archive.failures = [429, 503]
+    s = backfill_weather(_locations((19.1, 72.9, "2024-02-01", "2024-02-05")), **_kw(tmp_path, retries=3))
+    assert s["done"] == 1 and not s["failed"]
+    assert s["requests"] == 3 and len(archive.calls) == 3
+    assert not np.isnan(_stored(tmp_path, 19.1, 72.9, "2024-02-01", "2024-02-05")).any()
+
+def test_backfill_gives_up_after_retries(archive, tmp_path):
+    archive.failures = [503] * 3
+    s = backfill_weather(_locations((19.1, 72.9, "2024-02-01", "2024-02-05")), **_kw(tmp_path, retries=2))
+    assert s["done"] == 0 and len(s["failed"]) == 1 and len(archive.calls) == 3
+
+def test_backfill_resumes_from_checkpoint(archive, tmp_path):
+    ckpt = str(tmp_path / "ckpt.json")
+    locs = _locations((28.6, 77.2, "2024-03-01", "2024-03-10"), (12.9, 77.6, "2024-03-01", "2024-03-10"))
+    archive.bad = {12.9}
+    s = backfill_weather(locs, **_kw(tmp_path, checkpoint_path=ckpt, retries=0))
+    assert s["done"] == 1 and len(s["failed"]) == 1
+    with open(ckpt) as f:
+        assert list(json.load(f)["done"]) == ["28.6_77.2"]
+
+    # rerun: the checkpointed location is skipped, only the failed one is fetched
+    archive.bad, archive.calls = set(), []
+    s = backfill_weather(locs, **_kw(tmp_path, checkpoint_path=ckpt))
+    assert s["skipped"] == 1 and s["done"] == 1
+    assert archive.calls == [(12.9, "2024-03-01", "2024-03-10")]
+
+def test_add_weather_features_uses_the_store(archive, tmp_path):
+    cache = str(tmp_path / "weather")
+
+    def sales(start, end):
+        return pd.DataFrame({"Date": pd.date_range(start, end), "Sales_Quantity": 1.0})
+    w1 = add_weather_features(sales("2024-01-01", "2024-01-10"), 28.6, 77.2, cache_dir=cache)
+    assert archive.calls == [(28.6, "2024-01-01", "2024-01-10")]
+    # same store as batch_enrich_weather and the backfill: a wider range fetches only the gap
+    archive.calls.clear()
+    w2 = add_weather_features(sales("2024-01-01", "2024-01-20"), 28.6, 77.2, cache_dir=cache)
+    assert archive.calls == [(28.6, "2024-01-11", "2024-01-20")]
+    pd.testing.assert_frame_equal(w2.iloc[:10].reset_index(drop=True), w1)
+    assert not w2["temp_max"].isna().any() and "is_hot" in w2
+    np.testing.assert_array_equal(w2["temp_max"], _stored(tmp_path, 28.6, 77.2, "2024-01-01", "2024-01-20"))
+    assert [f for f in os.listdir(cache) if f.endswith(".parquet")] == []
+
+def test_store_writes_in_place_until_the_grid_is_full(tmp_path):
+    store = WeatherStore(str(tmp_path / "weather"))
+    ids = store.location_ids([10.0, 11.0], [70.0, 71.0], add=True)
+    days = pd.date_range("2024-01-01", "2024-01-31")
+
+    def frame(v, d=days):
+        return pd.DataFrame({"Date": d, "temp_max": v, "temp_min": v - 8.0, "precip_mm": 0.0, "weathercode": 1.0})
+
+    store.write([(ids[0], frame(20.0))])
+    grid = store._grid
+    # in the grid's rows and days: same grid, only that row changes
+    store.write([(ids[1], frame(35.0))])
+    assert store._grid == grid
+    got = store.lookup(np.repeat(ids, 31), np.tile(days.values.astype("datetime64[D]").astype(np.int64), 2))
+    np.testing.assert_array_equal(got["temp_max"], np.repeat([20.0, 35.0], 31))
+    np.testing.assert_array_equal(got["is_hot"], np.repeat([False, True], 31))
+    # a new location past the spare rows, or days past the spare days, rebuild
+    more = store.location_ids(np.arange(20.0, 30.0), np.full(10, 80.0), add=True)
+    store.write([(more[-1], frame(5.0, pd.date_range("2025-06-01", periods=3)))])
+    assert store._grid != grid
+    assert WeatherStore(store.root).known_days(ids[0]).size == 31
+
+def test_checkpoint_skips_locations_with_unpublished_days(archive, tmp_path):
+    ckpt = str(tmp_path / "ckpt.json")
+    # archive lag: days after 2024-04-08 come back without values
+    archive.published_until = "2024-04-08"
+    locs = _locations((28.6, 77.2, "2024-04-01", "2024-04-10"))
+    s = backfill_weather(locs, **_kw(tmp_path, checkpoint_path=ckpt))
+    assert s["done"] == 1 and s["incomplete"] == 1
+    assert not os.path.exists(ckpt)
+
+    archive.published_until, archive.calls = None, []
+    s = backfill_weather(locs, **_kw(tmp_path, checkpoint_path=ckpt))
+    assert archive.calls == [(28.6, "2024-04-09", "2024-04-10")] and s["incomplete"] == 0
+    with open(ckpt) as f:
+        assert list(json.load(f)["done"]) == ["28.6_77.2"]
+    assert not np.isnan(_stored(tmp_path, 28.6, 77.2, "2024-04-01", "2024-04-10")).any()